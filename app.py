@@ -1,13 +1,28 @@
 import cv2
-import mediapipe as mp
 import numpy as np
+import os
 import time
-import pyttsx3
+try:
+    import pyttsx3
+    PYTTSX3_AVAILABLE = True
+except ImportError:
+    PYTTSX3_AVAILABLE = False
 import threading
+import json
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-import base64
-import re
+try:
+    from flask_sock import Sock
+    SOCK_AVAILABLE = True
+except ImportError:
+    SOCK_AVAILABLE = False
+from gaze_tracking.frames import decode_frame, frame_from_request
+from gaze_tracking.backends import BACKENDS
+from gaze_tracking.inference import InferencePool
+from gaze_tracking.landmarks import pixel_landmarks, eye_features
+from gaze_tracking.scheduler import LatestFrameScheduler, FrameDropped
+from gaze_tracking.predictor import WordPredictor
+from gaze_tracking.sessions import SessionRegistry
 
 app = Flask(__name__)
 CORS(app)
@@ -15,22 +30,26 @@ CORS(app)
 
 
 
-# Initialize TTS engine
-engine = pyttsx3.init()
+# The inference workers import this script again as __mp_main__ (see InferencePool).
+# They only need the landmark backend, not the language model or the TTS engine.
+SERVING = __name__ != '__mp_main__'
 
-# MediaPipe face mesh
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(refine_landmarks=True, max_num_faces=1)
+# Initialize TTS engine, text is not spoken without pyttsx3
+engine = pyttsx3.init() if PYTTSX3_AVAILABLE and SERVING else None
 
-# App state
-text = ""
-letter_index = 0
-last_action = time.time()
+# Face landmarks backend, the MediaPipe face mesh unless GAZE_BACKEND names
+# another one (see gaze_tracking.backends)
+landmark_backend = BACKENDS[os.environ.get('GAZE_BACKEND', 'mediapipe')]
+# Run in worker processes (one per core) so that clients are processed in
+# parallel; each session always uses the same worker, which only searches the
+# full frame when the face leaves the crop it is tracked in
+inference_pool = InferencePool(detector_factory=landmark_backend, track_roi=True)
+# Only the newest frame of a session waits for inference, stale ones are dropped
+frame_scheduler = LatestFrameScheduler()
+
+# App state, one keyboard session per client (see current_session)
+sessions = SessionRegistry()
 cooldown = 0.4
-suggest_active = False
-force_suggest_mode = False
-tracking_active = False
-gaze_sensitivity = 0.7  # Default sensitivity
 
 # Keyboard layout
 keys_set = [
@@ -40,54 +59,14 @@ keys_set = [
     "Z", "X", "C", "V", "B", "N", "M", "←", "💬", "🔊"
 ]
 
-# Mock word predictor class (replace with actual implementation later)
-class WordPredictor:
-    def suggest(self, current_word, context=""):
-        # Simple mock suggestions based on the current word
-        if not current_word:
-            return ["the", "and", "you"]
-        
-        common_words = {
-            't': ["the", "to", "that"],
-            'a': ["and", "at", "all"],
-            'i': ["in", "it", "is"],
-            'y': ["you", "your", "yes"],
-            'h': ["have", "has", "how"],
-            'w': ["with", "what", "when"],
-            'th': ["the", "this", "that"],
-            'an': ["and", "any", "another"],
-            'be': ["be", "been", "because"],
-            'wh': ["what", "when", "where"]
-        }
-        
-        # Check if we have suggestions for this prefix
-        for prefix, words in common_words.items():
-            if current_word.lower().startswith(prefix):
-                return [word for word in words if word.startswith(current_word.lower())] or [current_word + suffix for suffix in ["ing", "ed", "s"]]
-        
-        # Default suggestions
-        return [current_word + suffix for suffix in ["ing", "ed", "s"]]
-
-predictor = WordPredictor()
-
-def calculate_ear(landmarks, indices):
-    p = [np.array([landmarks[i][0], landmarks[i][1]]) for i in indices]
-    A = np.linalg.norm(p[1] - p[5])
-    B = np.linalg.norm(p[2] - p[4])
-    C = np.linalg.norm(p[0] - p[3])
-    return (A + B) / (2.0 * C)
+# One predictor, and one personal dictionary, for the whole server: the app is
+# a keyboard for a single user, so the words committed from every session
+# (e.g. the demo page and the HTTP fallback, or two tabs) personalize the same
+# suggestions. Sessions only keep the keyboard state of each client apart.
+predictor = WordPredictor() if SERVING else None
 
-def get_gaze(landmarks):
-    left = [landmarks[i] for i in [33, 133]]
-    right = [landmarks[i] for i in [362, 263]]
-    left_iris = landmarks[468]
-    right_iris = landmarks[473]
-    
-    # Apply sensitivity
-    global gaze_sensitivity
-    pos = lambda eye, iris: (iris[0] - eye[0][0]) / (eye[1][0] - eye[0][0] + 1e-6)
-    avg = (pos(left, left_iris) + pos(right, right_iris)) / 2
-    
+def get_gaze(avg, gaze_sensitivity):
+    """Gaze direction from the mean iris position of both eyes (see eye_features)"""
     # Adjust thresholds based on sensitivity
     left_threshold = 0.5 - (0.1 * gaze_sensitivity)
     right_threshold = 0.5 + (0.1 * gaze_sensitivity)
@@ -98,9 +77,21 @@ def get_gaze(landmarks):
         return "RIGHT"
     return "CENTER"
 
+def commit_last_word(session):
+    """Record the last word of the session's text, and the word before it, in the personal
+    dictionary, unless it was recorded already, e.g. a picked suggestion followed by a space.
+    The personal dictionary is shared by all sessions (see predictor)."""
+    text = session.text.rstrip()
+    if text == session.last_committed:
+        return
+    words = text.split()
+    if words:
+        predictor.add_to_dictionary(words[-1], words[-2] if len(words) >= 2 else None)
+        session.last_committed = text
+
 def speak_text(text_to_speak):
     """Speak text in a separate thread to avoid blocking the server"""
-    if not text_to_speak:
+    if not text_to_speak or engine is None:
         return
     
     engine.stop()  # Stop any current speech
@@ -113,128 +104,146 @@ def speak_async(text_to_speak):
     speech_thread.daemon = True  # Thread will close when main program exits
     speech_thread.start()
 
+def session_token():
+    """Token of the client, from the X-Session-Token header or the session query parameter"""
+    return request.headers.get('X-Session-Token') or request.args.get('session')
+
+def current_session():
+    """Keyboard session of the client"""
+    return sessions.get(session_token())
+
 @app.route('/api/keyboard-layout', methods=['GET'])
 def get_keyboard_layout():
     return jsonify({'keys': keys_set})
 
 @app.route('/api/toggle-tracking', methods=['POST'])
 def toggle_tracking():
-    global tracking_active
-    tracking_active = not tracking_active
-    return jsonify({'tracking': tracking_active})
+    session = current_session()
+    with session.lock:
+        session.tracking_active = not session.tracking_active
+        return jsonify({'tracking': session.tracking_active})
 
 @app.route('/api/clear-text', methods=['POST'])
 def clear_text():
-    global text, letter_index, suggest_active, force_suggest_mode
-    text = ""
-    letter_index = 0
-    suggest_active = False
-    force_suggest_mode = False
+    session = current_session()
+    with session.lock:
+        session.text = ""
+        session.letter_index = 0
+        session.suggest_active = False
+        session.force_suggest_mode = False
     return jsonify({
-        'text': text,
-        'letter_index': letter_index,
-        'suggest_active': suggest_active,
-        'force_suggest_mode': force_suggest_mode,
+        'text': "",
+        'letter_index': 0,
+        'suggest_active': False,
+        'force_suggest_mode': False,
         'suggestions': ["", "", ""]
     })
 
 @app.route('/api/update-sensitivity', methods=['POST'])
 def update_sensitivity():
-    global gaze_sensitivity
+    session = current_session()
     data = request.json
-    if 'sensitivity' in data:
-        gaze_sensitivity = float(data['sensitivity'])
-    return jsonify({'sensitivity': gaze_sensitivity})
+    with session.lock:
+        if 'sensitivity' in data:
+            try:
+                session.gaze_sensitivity = float(data['sensitivity'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Sensitivity must be a number'}), 400
+        return jsonify({'sensitivity': session.gaze_sensitivity})
 
 @app.route('/api/type', methods=['POST'])
 def type_action():
-    global text, letter_index, suggest_active, force_suggest_mode, last_action, cooldown
-    
+    session = current_session()
     data = request.json
-    action = data.get('action', '')
-    
-    if action == "BLINK" and time.time() - last_action > cooldown:
-        if suggest_active or force_suggest_mode:
+    with session.lock:
+        apply_action(session, data.get('action', ''))
+        return jsonify(keyboard_state(session))
+
+def apply_action(session, action):
+    """Apply a gaze command (BLINK, LEFT, RIGHT or RESET_CURSOR) to the keyboard state of a session"""
+    if action == "BLINK" and time.time() - session.last_action > cooldown:
+        if session.suggest_active or session.force_suggest_mode:
             # Handle suggestion selection
-            suggestions = get_suggestions()
-            if letter_index < len(suggestions) and suggestions[letter_index]:
-                if force_suggest_mode and text:
+            suggestions = get_suggestions(session)
+            if session.letter_index < len(suggestions) and suggestions[session.letter_index]:
+                if session.force_suggest_mode and session.text:
                     # Split text into words
-                    words = text.split(' ')
+                    words = session.text.split(' ')
                     # If there's at least one word and it's not just a space
                     if words and words[-1]:
                         # Replace the last word with the suggestion
-                        words[-1] = suggestions[letter_index]
-                        text = ' '.join(words)
+                        words[-1] = suggestions[session.letter_index]
+                        session.text = ' '.join(words)
                     else:
                         # Just add the suggestion if there's no current word
-                        text += suggestions[letter_index]
+                        session.text += suggestions[session.letter_index]
                     
                     # Disable force suggest mode after selection
-                    force_suggest_mode = False
+                    session.force_suggest_mode = False
                 else:
                     # Regular space-triggered suggestion mode
-                    text += " " + suggestions[letter_index % 3]
+                    session.text += " " + suggestions[session.letter_index % 3]
+                commit_last_word(session)
         else:
-            key = keys_set[letter_index]
+            key = keys_set[session.letter_index]
             if key == "←":
-                text = text[:-1]
+                session.text = session.text[:-1]
             elif key == "_":
-                text += " "
+                commit_last_word(session)
+                session.text += " "
             elif key == "🔊":
-                speak_async(text.strip())
+                speak_async(session.text.strip())
             elif key == "💬":  # Direct suggest button
-                if text:  # Only activate if there's text
-                    force_suggest_mode = True
+                if session.text:  # Only activate if there's text
+                    session.force_suggest_mode = True
             else:
-                text += key
+                session.text += key
         
-        last_action = time.time()
+        session.last_action = time.time()
     
-    elif action == "LEFT" and time.time() - last_action > 0.3:
-        letter_index = max(letter_index - 1, 0)
-        last_action = time.time()
+    elif action == "LEFT" and time.time() - session.last_action > 0.3:
+        session.letter_index = max(session.letter_index - 1, 0)
+        session.last_action = time.time()
         
-    elif action == "RIGHT" and time.time() - last_action > 0.3:
-        max_index = 2 if (suggest_active or force_suggest_mode) else len(keys_set) - 1
-        letter_index = min(letter_index + 1, max_index)
-        last_action = time.time()
+    elif action == "RIGHT" and time.time() - session.last_action > 0.3:
+        max_index = 2 if (session.suggest_active or session.force_suggest_mode) else len(keys_set) - 1
+        session.letter_index = min(session.letter_index + 1, max_index)
+        session.last_action = time.time()
     
     elif action == "RESET_CURSOR":
-        letter_index = 0
+        session.letter_index = 0
     
     # Check if we should activate suggestion mode (after space)
-    suggest_active = text and text[-1] == " "
-    
-    # Get updated suggestions
-    suggestions = get_suggestions()
-    
-    return jsonify({
-        'text': text,
-        'letter_index': letter_index,
-        'suggest_active': suggest_active,
-        'force_suggest_mode': force_suggest_mode,
-        'suggestions': suggestions
-    })
+    session.suggest_active = session.text and session.text[-1] == " "
 
-def get_suggestions():
+def keyboard_state(session):
+    """Current text, cursor and suggestions of a session, as returned by /api/type"""
+    return {
+        'text': session.text,
+        'letter_index': session.letter_index,
+        'suggest_active': session.suggest_active,
+        'force_suggest_mode': session.force_suggest_mode,
+        'suggestions': get_suggestions(session)
+    }
+
+def get_suggestions(session):
     # Get word suggestions - either for space-triggered or forced suggestion mode
-    if suggest_active or force_suggest_mode:
+    if session.suggest_active or session.force_suggest_mode:
         # Get the relevant words for suggestions
-        words = text.strip().split(" ")
+        words = session.text.strip().split(" ")
         
-        if force_suggest_mode and words:
+        if session.force_suggest_mode and words:
             # In direct suggestion mode, get the current partial word being typed
             current_partial = words[-1] if words else ""
             context = words[-2] if len(words) >= 2 else ""
             
             # Get suggestions for the current partial word
-            suggestions = predictor.suggest(current_partial, context)
+            suggestions = predictor.predict(current_partial, context)
         else:
             # Regular space-triggered suggestion mode
             context = words[-2] if len(words) >= 2 else ""
             current_word = words[-1] if words else ""
-            suggestions = predictor.suggest(current_word, context)
+            suggestions = predictor.predict(current_word, context)
         
         # Ensure we have 3 suggestions
         suggestions += [""] * (3 - len(suggestions))
@@ -242,85 +251,167 @@ def get_suggestions():
     else:
         return ["", "", ""]
 
+def analyze_frame(frame, gaze_sensitivity, token=None):
+    """Detect blinks and gaze direction in an RGB frame and derive the resulting command"""
+    # Process the frame, mirrored for webcam
+    landmarks = inference_pool.detect(frame, token, flip=True)
+    
+    eye_position = None
+    eye_direction = "CENTER"
+    is_blinking = False
+    ear_value = 0
+    command = None
+    
+    if landmarks is not None:
+        frame_h, frame_w = frame.shape[:2]
+        points = pixel_landmarks(landmarks, frame_w, frame_h)
+        
+        # Calculate EAR and the iris position of both eyes at once
+        ear, iris_ratio = eye_features(points, landmark_backend.layout)
+        ear_value = ear
+        
+        # Detect blink
+        if ear < 0.23:
+            is_blinking = True
+            command = "BLINK"
+        else:
+            # Detect gaze direction
+            gaze = get_gaze(iris_ratio, gaze_sensitivity)
+            eye_direction = gaze
+            if gaze != "CENTER":
+                command = gaze
+        
+        # Get eye position for UI visualization
+        left_index, right_index = landmark_backend.layout.irises
+        left_iris = landmarks[left_index].tolist()
+        right_iris = landmarks[right_index].tolist()
+        avg_x = (left_iris[0] + right_iris[0]) / 2
+        avg_y = (left_iris[1] + right_iris[1]) / 2
+        eye_position = [avg_x * 100, avg_y * 100]  # Convert to percentage
+    
+    return {
+        'eye_position': eye_position,
+        'eye_direction': eye_direction,
+        'is_blinking': is_blinking,
+        'ear_value': ear_value,
+        'command': command
+    }
+
 @app.route('/api/process-frame', methods=['POST'])
 def process_frame():
-    global text, letter_index, suggest_active, force_suggest_mode, last_action
-    
-    if not tracking_active:
+    session = current_session()
+    if not session.tracking_active:
         return jsonify({'status': 'Tracking not active'})
     
     try:
-        data = request.json
-        image_data = data['image']
-        # Extract the base64 encoded image
-        image_data = re.sub('^data:image/.+;base64,', '', image_data)
-        image_bytes = base64.b64decode(image_data)
-        
-        # Convert to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # JSON with a base64 data URL, or the raw frame bytes (see frame_from_request)
+        frame = frame_from_request(request)
         
         if frame is None:
             return jsonify({'error': 'Failed to decode image'})
         
-        # Process the frame
-        frame = cv2.flip(frame, 1)  # Mirror for webcam
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb)
-        
-        eye_position = None
-        eye_direction = "CENTER"
-        is_blinking = False
-        ear_value = 0
-        command = None
-        
-        if results.multi_face_landmarks:
-            landmarks = results.multi_face_landmarks[0]
-            frame_h, frame_w = frame.shape[:2]
-            coords = [(int(p.x * frame_w), int(p.y * frame_h)) for p in landmarks.landmark]
-            
-            # Calculate EAR
-            left_ear = calculate_ear(coords, [362, 385, 387, 263, 373, 380])
-            right_ear = calculate_ear(coords, [33, 160, 158, 133, 153, 144])
-            ear = (left_ear + right_ear) / 2
-            ear_value = ear
-            
-            # Detect blink
-            if ear < 0.23:
-                is_blinking = True
-                command = "BLINK"
-            else:
-                # Detect gaze direction
-                gaze = get_gaze(coords)
-                eye_direction = gaze
-                if gaze != "CENTER":
-                    command = gaze
-            
-            # Get eye position for UI visualization
-            left_iris = landmarks.landmark[468]
-            right_iris = landmarks.landmark[473]
-            avg_x = (left_iris.x + right_iris.x) / 2
-            avg_y = (left_iris.y + right_iris.y) / 2
-            eye_position = [avg_x * 100, avg_y * 100]  # Convert to percentage
-        
-        # Process command here if needed
-        response_data = {
-            'eye_position': eye_position,
-            'eye_direction': eye_direction,
-            'is_blinking': is_blinking,
-            'ear_value': ear_value,
-            'command': command,
-            'typed_text': text,
-            'letter_index': letter_index,
-            'suggest_active': suggest_active,
-            'force_suggest_mode': force_suggest_mode,
-            'suggestions': get_suggestions()
-        }
+        token = session_token()
+        try:
+            response_data, frame_age = frame_scheduler.run(
+                session, frame, lambda frame: analyze_frame(frame, session.gaze_sensitivity, token))
+        except FrameDropped:
+            return jsonify({'status': 'Frame dropped'})
+        with session.lock:
+            response_data.update({
+                'typed_text': session.text,
+                'letter_index': session.letter_index,
+                'suggest_active': session.suggest_active,
+                'force_suggest_mode': session.force_suggest_mode,
+                'suggestions': get_suggestions(session),
+                'frame_age': round(frame_age * 1000, 1),
+                'dropped_frames': frame_scheduler.stats(session)['dropped']
+            })
         
         return jsonify(response_data)
     
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/frame-stats', methods=['GET'])
+def frame_stats():
+    """Frames processed and dropped by the scheduler, frames waiting (depth) and the largest frame age in seconds"""
+    return jsonify(frame_scheduler.stats())
+
+if SOCK_AVAILABLE:
+    sock = Sock(app)
+
+    @sock.route('/ws/stream')
+    def stream(ws):
+        """
+        Persistent alternative to polling /api/process-frame and /api/type.
+        Binary messages are frames, JPEG unless a text message sets another
+        format. Text messages are JSON: "format", "width" and "height" describe
+        the following frames and "action" applies a command like /api/type.
+        The session is chosen by the session query parameter of the URL.
+        Commands detected in frames are applied here, and every message gets
+        one reply holding only the values that changed since the last reply.
+        """
+        frame_info = {'frame_format': 'jpeg', 'width': None, 'height': None}
+        sent = {}
+        pending = None
+        while True:
+            message = pending if pending is not None else ws.receive()
+            pending = None
+            # Looked up per message so the session stays alive while streaming
+            session = current_session()
+            if isinstance(message, bytes):
+                # Frames that arrived while the last one was analyzed are stale: skip to the
+                # newest one, stopping at a text message so that it is still handled in order
+                frame_scheduler.submit(session, message)
+                pending = ws.receive(timeout=0)
+                while isinstance(pending, bytes):
+                    frame_scheduler.submit(session, pending)
+                    pending = ws.receive(timeout=0)
+            try:
+                if isinstance(message, str):
+                    data = json.loads(message)
+                    frame_info['frame_format'] = data.get('format', frame_info['frame_format'])
+                    frame_info['width'] = data.get('width', frame_info['width'])
+                    frame_info['height'] = data.get('height', frame_info['height'])
+                    with session.lock:
+                        if data.get('action'):
+                            apply_action(session, data['action'])
+                        update = keyboard_state(session)
+                else:
+                    # Waits for a frame of the session being analyzed for /api/process-frame
+                    with frame_scheduler.taking(session, timeout=0) as job:
+                        if job is None:
+                            # A request for the same session took the frame. Reply anyway,
+                            # as the client only sends its next frame on a reply
+                            update = {'status': 'Frame dropped'}
+                        elif not session.tracking_active:
+                            update = {'status': 'Tracking not active'}
+                        else:
+                            # Frames handed to run() by /api/process-frame are already decoded
+                            frame = job.frame
+                            if isinstance(frame, bytes):
+                                frame = decode_frame(frame, **frame_info)
+                            if frame is None:
+                                raise ValueError('Failed to decode image')
+                            update = analyze_frame(frame, session.gaze_sensitivity, session_token())
+                            with session.lock:
+                                if update['command']:
+                                    apply_action(session, update['command'])
+                                update.update(keyboard_state(session))
+                            update['status'] = 'Tracking'
+                    update['dropped_frames'] = frame_scheduler.stats(session)['dropped']
+            except Exception as e:
+                ws.send(json.dumps({'error': str(e)}))
+                continue
+            
+            delta = {key: value for key, value in update.items() if key not in sent or sent[key] != value}
+            sent.update(delta)
+            ws.send(json.dumps(delta))
+
 if __name__ == '__main__':
+    # Start the inference workers before serving, in the reloader's child process
+    # which is the one serving requests. Servers importing app start them on the
+    # first frame, which is safe as they are not forked from the server process.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        inference_pool.start()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -37,6 +37,9 @@ export default function GazeKeyboard() {
   const videoRef = useRef<HTMLVideoElement>(null)
   const canvasRef = useRef<HTMLCanvasElement>(null)
   const processFrameTimeoutRef = useRef<NodeJS.Timeout | null>(null)
+  const socketRef = useRef<WebSocket | null>(null)
+  // Identifies this page's keyboard session to the server
+  const sessionTokenRef = useRef(Math.random().toString(36).slice(2) + Date.now().toString(36))
   
   // Setup keyboard layout
   useEffect(() => {
@@ -105,12 +108,16 @@ export default function GazeKeyboard() {
       
       if (ctx) {
         ctx.drawImage(video, 0, 0, canvas.width, canvas.height)
-        const imageData = canvas.toDataURL("image/jpeg", 0.7)
-        
+        const imageBlob = await new Promise<Blob | null>((resolve) => canvas.toBlob(resolve, "image/jpeg", 0.7))
+        if (!imageBlob) {
+          throw new Error("Failed to encode frame")
+        }
+
+        // Send the JPEG bytes as is rather than as base64 inside JSON
         const response = await fetch('http://localhost:5000/api/process-frame', {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ image: imageData })
+          headers: { 'Content-Type': 'application/octet-stream', 'X-Frame-Format': 'jpeg', 'X-Session-Token': sessionTokenRef.current },
+          body: imageBlob
         })
         
         const data = await response.json()
@@ -163,12 +170,81 @@ export default function GazeKeyboard() {
     processFrameTimeoutRef.current = setTimeout(processFrame, 100)
   }
   
+  // Apply a state update pushed by the stream; only changed values are present
+  const applyUpdate = (data: any) => {
+    if (data.error) {
+      console.error("Processing error:", data.error)
+      return
+    }
+    if (data.eye_position !== undefined) {
+      setEyePosition(data.eye_position ? { x: data.eye_position[0], y: data.eye_position[1] } : null)
+    }
+    if (data.eye_direction !== undefined) setEyeDirection(data.eye_direction)
+    if (data.is_blinking !== undefined) setBlinking(data.is_blinking)
+    if (data.ear_value !== undefined) setEarValue(data.ear_value)
+    if (data.text !== undefined) setTypedText(data.text)
+    if (data.letter_index !== undefined) setLetterIndex(data.letter_index)
+    if (data.suggestions !== undefined) setSuggestions(data.suggestions)
+    if (data.suggest_active !== undefined) setSuggestionMode(data.suggest_active)
+    if (data.force_suggest_mode !== undefined) setForceSuggestMode(data.force_suggest_mode)
+  }
+
+  // Push the current frame over the stream; the next one is sent when the server replies
+  const sendFrame = (socket: WebSocket) => {
+    const video = videoRef.current
+    const canvas = canvasRef.current
+    const ctx = canvas?.getContext("2d")
+    if (socket.readyState !== WebSocket.OPEN) {
+      return
+    }
+    if (!video || !canvas || !ctx || !video.videoWidth) {
+      processFrameTimeoutRef.current = setTimeout(() => sendFrame(socket), 100)
+      return
+    }
+
+    canvas.width = video.videoWidth
+    canvas.height = video.videoHeight
+    ctx.drawImage(video, 0, 0, canvas.width, canvas.height)
+    canvas.toBlob((blob) => {
+      if (blob && socket.readyState === WebSocket.OPEN) {
+        socket.send(blob)
+      } else if (!blob) {
+        processFrameTimeoutRef.current = setTimeout(() => sendFrame(socket), 100)
+      }
+    }, "image/jpeg", 0.7)
+  }
+
+  // Stream frames over a WebSocket; commands are applied by the server.
+  // Falls back to polling /api/process-frame if the stream is unavailable.
+  const startStream = () => {
+    const socket = new WebSocket(`ws://localhost:5000/ws/stream?session=${sessionTokenRef.current}`)
+    let opened = false
+
+    socket.onopen = () => {
+      opened = true
+      socketRef.current = socket
+      sendFrame(socket)
+    }
+    socket.onmessage = (event) => {
+      applyUpdate(JSON.parse(event.data))
+      sendFrame(socket)
+    }
+    socket.onclose = () => {
+      if (socketRef.current === socket) {
+        socketRef.current = null
+      }
+      if (!opened) {
+        processFrame()
+      }
+    }
+  }
+
   // Handle eye tracking commands
   const handleCommand = async (command: string) => {
     try {
       const response = await fetch('http://localhost:5000/api/type', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', 'X-Session-Token': sessionTokenRef.current },
         body: JSON.stringify({ action: command })
       })
       
@@ -191,21 +267,22 @@ export default function GazeKeyboard() {
       // Toggle tracking on backend
       fetch('http://localhost:5000/api/toggle-tracking', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' }
+        headers: { 'Content-Type': 'application/json', 'X-Session-Token': sessionTokenRef.current }
       }).catch(err => console.error("Error toggling tracking:", err))
       
       // Start processing frames
-      processFrame()
+      startStream()
     } else {
       // Stop processing frames
       if (processFrameTimeoutRef.current) {
         clearTimeout(processFrameTimeoutRef.current)
       }
+      socketRef.current?.close()
       
       // Toggle tracking off on backend
       fetch('http://localhost:5000/api/toggle-tracking', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' }
+        headers: { 'Content-Type': 'application/json', 'X-Session-Token': sessionTokenRef.current }
       }).catch(err => console.error("Error toggling tracking:", err))
     }
     
@@ -213,6 +290,7 @@ export default function GazeKeyboard() {
       if (processFrameTimeoutRef.current) {
         clearTimeout(processFrameTimeoutRef.current)
       }
+      socketRef.current?.close()
     }
   }, [trackingActive])
   
@@ -226,7 +304,7 @@ export default function GazeKeyboard() {
     try {
       const response = await fetch('http://localhost:5000/api/clear-text', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' }
+        headers: { 'Content-Type': 'application/json', 'X-Session-Token': sessionTokenRef.current }
       })
       
       const data = await response.json()
@@ -246,7 +324,7 @@ export default function GazeKeyboard() {
     setGazeSensitivity(value)
     fetch('http://localhost:5000/api/update-sensitivity', {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', 'X-Session-Token': sessionTokenRef.current },
       body: JSON.stringify({ sensitivity: value })
     })
     .catch(err => console.error("Error updating sensitivity:", err))
@@ -265,7 +343,7 @@ export default function GazeKeyboard() {
     try {
       const response = await fetch('http://localhost:5000/api/type', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', 'X-Session-Token': sessionTokenRef.current },
         body: JSON.stringify({ action: "RESET_CURSOR" })
       })
       
@@ -0,0 +1,212 @@
+"""Per-frame cost and accuracy of each landmark backend on recorded clips,
+to pick the cheapest backend that meets a latency budget.
+
+Every backend of gaze_tracking.backends.BACKENDS runs on the full frames
+and through RoiTracker, as ppp.py and app.py run it. Backends that cannot
+start here (mediapipe or dlib not installed, or the shape predictor model
+missing) are skipped. Frames are mirrored and converted to RGB as ppp.py
+does, and their eye features computed by landmarks.eye_features with the
+layout of the backend.
+
+Accuracy is the share of frames on which the keyboard would take the same
+decision: BLINK when the eye aspect ratio is below BLINK_EAR, otherwise
+the gaze direction of ppp.get_gaze, or None without a face. Decisions are
+compared with the labels of the clip if there is a CLIP.labels.json file
+next to it, a JSON list holding for each frame one of "BLINK", "LEFT",
+"CENTER", "RIGHT" or null; otherwise with the decisions of the reference,
+mediapipe on the full frames.
+
+Without clips, a synthetic clip is used: a drawn face looking to the
+center, right and left, and blinking, labelled as it is drawn. It is no
+substitute for recordings of real faces, but checks that every backend
+gives the keyboard decisions of the clip.
+
+The cheapest backend whose p95 cost fits the budget and whose accuracy is
+at least the minimum is recommended. Exits with 1 if none qualifies.
+
+Run from the repository root:
+    python -m benchmarks.bench_backends [--budget-ms 33] [--min-accuracy 0.9] [clip.mp4 ...]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from gaze_tracking.backends import BACKENDS
+from gaze_tracking.landmarks import pixel_landmarks, eye_features
+from gaze_tracking.pipeline import TimingHistogram
+from gaze_tracking.roi import RoiTracker
+from ppp import get_gaze
+
+BLINK_EAR = 0.23
+REFERENCE = "mediapipe"
+# Decisions of the synthetic clip, each held for SYNTHETIC_HOLD frames
+SYNTHETIC_SCRIPT = ["CENTER", "RIGHT", "CENTER", "LEFT", "BLINK"]
+SYNTHETIC_HOLD = 12
+
+
+def clip_frames(path, max_frames=None):
+    """Returns the frames of a clip, mirrored and in RGB, as ppp.py analyzes them."""
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB))
+    capture.release()
+    return frames
+
+
+def synthetic_frame(decision, shift, width=640, height=480):
+    """Draws a face looking in the direction of a keyboard decision, or blinking.
+
+    The frame is mirrored already, as clip_frames returns them: the iris
+    of an eye looking RIGHT is near the corner of the eye with the lower x.
+    """
+    frame = np.full((height, width, 3), (96, 110, 120), np.uint8)
+    cx, cy = width // 2 + shift, height // 2
+    skin = (205, 160, 135)
+    cv2.ellipse(frame, (cx, cy), (110, 145), 0, 0, 360, skin, -1, cv2.LINE_AA)
+    cv2.line(frame, (cx, cy - 10), (cx - 8, cy + 35), (170, 125, 105), 3, cv2.LINE_AA)
+    cv2.ellipse(frame, (cx, cy + 75), (38, 12), 0, 0, 180, (150, 70, 70), 4, cv2.LINE_AA)
+    offset = {"RIGHT": -11, "LEFT": 11}.get(decision, 0)
+    for ex in (cx - 45, cx + 45):
+        ey = cy - 35
+        cv2.line(frame, (ex - 30, ey - 28), (ex + 30, ey - 30), (80, 55, 45), 5, cv2.LINE_AA)
+        if decision == "BLINK":
+            cv2.ellipse(frame, (ex, ey), (28, 5), 0, 0, 180, (120, 80, 70), 3, cv2.LINE_AA)
+            continue
+        cv2.ellipse(frame, (ex, ey), (28, 13), 0, 0, 360, (245, 245, 240), -1, cv2.LINE_AA)
+        cv2.circle(frame, (ex + offset, ey), 10, (70, 50, 35), -1, cv2.LINE_AA)
+        cv2.circle(frame, (ex + offset, ey), 4, (10, 10, 10), -1, cv2.LINE_AA)
+        cv2.ellipse(frame, (ex, ey), (28, 13), 0, 0, 360, (60, 40, 35), 2, cv2.LINE_AA)
+    return frame
+
+
+def synthetic_clip():
+    """Returns the frames of the synthetic clip, in RGB, and their labels."""
+    labels = [decision for decision in SYNTHETIC_SCRIPT for _ in range(SYNTHETIC_HOLD)]
+    # The head drifts a little, so the crop of RoiTracker has to follow it
+    frames = [synthetic_frame(label, int(20 * np.sin(i / 10))) for i, label in enumerate(labels)]
+    return frames, labels
+
+
+def clip_labels(path):
+    """Returns the labels of a clip, or None if it has none."""
+    labels_path = path + ".labels.json"
+    if not os.path.exists(labels_path):
+        return None
+    with open(labels_path) as f:
+        return json.load(f)
+
+
+def decision(landmarks, layout, width, height):
+    """The keyboard decision for the landmarks of a frame."""
+    if landmarks is None:
+        return None
+    ear, iris_ratio = eye_features(pixel_landmarks(landmarks, width, height), layout)
+    return "BLINK" if ear < BLINK_EAR else get_gaze(iris_ratio)
+
+
+def variants():
+    """Yields (name, factory, layout) for each backend, on the full frame and through RoiTracker."""
+    for name, backend in BACKENDS.items():
+        yield name, backend, backend.layout
+        yield f"{name}+roi", lambda backend=backend: RoiTracker(backend()), backend.layout
+
+
+def run_backend(detector, layout, frames):
+    """Returns the decisions on the frames and the seconds the detector took on each."""
+    decisions, durations = [], []
+    height, width = frames[0].shape[:2]
+    for frame in frames:
+        start = time.perf_counter()
+        landmarks = detector.process(frame)
+        durations.append(time.perf_counter() - start)
+        decisions.append(decision(landmarks, layout, width, height))
+    return decisions, durations
+
+
+def histogram(durations):
+    timings = TimingHistogram()
+    for seconds in durations:
+        timings.add(seconds)
+    return timings
+
+
+def agreement(decisions, expected):
+    pairs = list(zip(decisions, expected))
+    return sum(a == b for a, b in pairs) / len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("clips", nargs="*", help="recorded videos, the synthetic clip without any")
+    parser.add_argument("--budget-ms", type=float, default=33.0, help="p95 cost allowed per frame")
+    parser.add_argument("--min-accuracy", type=float, default=0.9, help="share of frames that must agree")
+    parser.add_argument("--frames", type=int, help="frames used from each clip")
+    args = parser.parse_args()
+
+    results = {}
+    for path in args.clips or [None]:
+        if path is None:
+            path = "synthetic clip"
+            frames, labels = synthetic_clip()
+            frames = frames[:args.frames]
+        else:
+            frames = clip_frames(path, args.frames)
+            labels = clip_labels(path)
+        if not frames:
+            print(f"{path}: no frames")
+            continue
+        print(f"{path}: {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, "
+              f"compared with {'its labels' if labels is not None else REFERENCE}")
+        decided = {}
+        for name, factory, layout in variants():
+            try:
+                detector = factory()
+            except (ImportError, RuntimeError) as e:
+                print(f"  {name:16s} skipped: {e}")
+                continue
+            decided[name] = run_backend(detector, layout, frames)
+        if labels is None:
+            if REFERENCE not in decided:
+                print(f"  no labels and no {REFERENCE} reference, accuracy not measured")
+                continue
+            labels = decided[REFERENCE][0]
+
+        for name, (decisions, durations) in decided.items():
+            found = sum(d is not None for d in decisions) / len(decisions)
+            accuracy = agreement(decisions, labels)
+            results.setdefault(name, []).append((accuracy, durations))
+            timings = histogram(durations)
+            print(f"  {name:16s} p50 {timings.percentile(50) * 1e3:7.2f} ms   p95 {timings.percentile(95) * 1e3:7.2f} ms   "
+                  f"face {found:6.1%}   accuracy {accuracy:6.1%}")
+
+    if not results:
+        print("No backend could run")
+        return 1
+
+    print(f"Over all clips, budget {args.budget_ms:.1f} ms at p95, accuracy at least {args.min_accuracy:.0%}:")
+    qualified = []
+    for name, clips in results.items():
+        p95 = histogram([seconds for _, durations in clips for seconds in durations]).percentile(95) * 1e3
+        accuracy = min(clip_accuracy for clip_accuracy, _ in clips)
+        ok = p95 <= args.budget_ms and accuracy >= args.min_accuracy
+        if ok:
+            qualified.append((p95, name))
+        print(f"  {name:16s} p95 {p95:7.2f} ms   worst clip accuracy {accuracy:6.1%}   {'ok' if ok else '-'}")
+    if not qualified:
+        print("No backend meets the budget")
+        return 1
+    print(f"Cheapest backend within budget: {min(qualified)[1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
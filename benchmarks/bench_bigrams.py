@@ -0,0 +1,111 @@
+"""Compares the dict-of-Counters bigram model with the CSR BigramTable,
+both for memory and lookup cost and for build time.
+
+Run from the repository root:
+    python -m benchmarks.bench_bigrams
+
+Exits with status 1 if pair lookups are slower than in the dict of Counters.
+"""
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+import numpy as np
+
+from gaze_tracking.ngrams import BigramTable, intern_tokens
+from benchmarks.corpus import load_tokens
+
+
+def build_counters(tokens):
+    bigrams = {}
+    for i in range(len(tokens) - 1):
+        if tokens[i] not in bigrams:
+            bigrams[tokens[i]] = Counter()
+        bigrams[tokens[i]][tokens[i + 1]] += 1
+    return bigrams
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def build_vectorised(tokens):
+    vocab, ids = intern_tokens(tokens)
+    return BigramTable.from_token_ids(vocab, ids)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def time_lookups(fn, queries, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            fn(*query)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries) * 1e6
+
+
+def main():
+    tokens, source = load_tokens()
+    vocab = list(Counter(tokens))
+    print(f"corpus: {source}, {len(tokens)} tokens, {len(vocab)} words")
+
+    counters, counters_size = measure(lambda: build_counters(tokens))
+    table, table_size = measure(lambda: BigramTable.from_counters(vocab, counters))
+    pairs = sum(len(row) for row in counters.values())
+    print(f"bigram pairs: {pairs}")
+    print(f"dict of Counters: {counters_size / 2**20:8.1f} MiB")
+    print(f"BigramTable:      {table_size / 2**20:8.1f} MiB "
+          f"(arrays {table.nbytes / 2**20:.1f} MiB, {counters_size / table_size:.1f}x smaller)")
+
+    _, loop_time = timed(lambda: BigramTable.from_counters(vocab, build_counters(tokens)))
+    vectorised, vectorised_time = timed(lambda: build_vectorised(tokens))
+    assert vectorised.vocab == table.vocab
+    for name, array in table.to_arrays().items():
+        assert np.array_equal(array, vectorised.to_arrays()[name]), name
+    print(f"build: Python loop {loop_time:6.2f} s, vectorised {vectorised_time:6.2f} s (identical tables)")
+
+    rng = random.Random(0)
+    contexts = rng.choices(tokens, k=20000)
+    pair_queries = [(a, rng.choice(tokens)) for a in contexts]
+    top_queries = [(a,) for a in contexts]
+
+    counter_top = time_lookups(lambda w: counters[w].most_common(3) if w in counters else [], top_queries)
+    table_top = time_lookups(lambda w: table.most_common(w, 3), top_queries)
+    counter_pair = time_lookups(lambda a, b: counters[a][b] if a in counters and b in counters[a] else 0, pair_queries)
+    gc.collect()
+    tracemalloc.start()
+    table_pair = time_lookups(table.count, pair_queries)
+    rows_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    batch_queries = [(a, [b for _, b in pair_queries[i:i + 10]]) for i, (a, _) in enumerate(pair_queries[::10])]
+    counter_batch = time_lookups(lambda a, bs: [counters[a][b] if a in counters and b in counters[a] else 0 for b in bs], batch_queries)
+    table_batch = time_lookups(table.count_many, batch_queries)
+    print(f"most_common(3): Counter {counter_top:6.2f} us, BigramTable {table_top:6.2f} us")
+    print(f"pair count:     Counter {counter_pair:6.2f} us, BigramTable {table_pair:6.2f} us")
+    print(f"10 pair counts: Counter {counter_batch:6.2f} us, BigramTable {table_batch:6.2f} us")
+    print(f"rows expanded for pair counts: {len(table._rows)}, {rows_size / 2**20:.1f} MiB")
+
+    for (a, b), expected in zip(pair_queries, [counters[a][b] if a in counters else 0 for a, b in pair_queries]):
+        assert table.count(a, b) == expected, (a, b)
+    # Pair counts are on the ranking path of every suggestion, so they must not get slower
+    ok = table_pair <= counter_pair and table_batch <= counter_batch
+    print("pair lookups ok" if ok else "FAIL: pair lookups slower than the dict of Counters")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Cost of Calibration.find_best_threshold per eye frame, binarizing the
+frame at every threshold as before against one pass over its histogram.
+
+Before, each of the 19 thresholds from 5 to 95 ran Pupil.image_processing:
+the bilateral filter and three erosions again, then the binarization and a
+count of the black pixels. Now the frame is filtered once, and the share of
+black pixels at every threshold is read from the cumulative histogram of
+the filtered frame, since binarization turns black the pixels at or below
+the threshold.
+
+The eye frames are synthetic patches of random size and iris position, and
+the same patches scaled up for larger eyes. Both versions are checked to
+choose the same threshold for every patch, and to give the same thresholds
+to a Calibration fed a whole calibration run. Eye frames of 10 pixels or
+less on a side, which have no pixels left once the border is cut off, must
+be skipped by the calibration instead of giving it a threshold.
+
+Run from the repository root:
+    python -m benchmarks.bench_calibration
+"""
+import sys
+import time
+
+import cv2
+
+from benchmarks.eyes import synthetic_eyes
+from gaze_tracking.calibration import Calibration
+from gaze_tracking.pupil import Pupil
+
+EYES = 200
+SCALES = [1, 2, 4]
+
+
+def iris_size_before(frame):
+    frame = frame[5:-5, 5:-5]
+    height, width = frame.shape[:2]
+    nb_pixels = height * width
+    nb_blacks = nb_pixels - cv2.countNonZero(frame)
+    return nb_blacks / nb_pixels
+
+
+def find_best_threshold_before(eye_frame):
+    """Calibration.find_best_threshold before the histogram pass."""
+    average_iris_size = 0.48
+    trials = {}
+    for threshold in range(5, 100, 5):
+        iris_frame = Pupil.image_processing(eye_frame, threshold)
+        trials[threshold] = iris_size_before(iris_frame)
+    best_threshold, iris_size = min(trials.items(), key=(lambda p: abs(p[1] - average_iris_size)))
+    return best_threshold
+
+
+def per_frame(function, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        function(frame)
+    return (time.perf_counter() - start) / len(frames) * 1e6
+
+
+def main():
+    mismatches = 0
+    eyes = [patch for patch, _ in synthetic_eyes(EYES)]
+    print(f"{EYES} eye frames")
+    for scale in SCALES:
+        frames = [cv2.resize(patch, None, fx=scale, fy=scale) for patch in eyes]
+        mismatches += sum(find_best_threshold_before(frame) != Calibration.find_best_threshold(frame)
+                          for frame in frames)
+        old = per_frame(find_best_threshold_before, frames)
+        new = per_frame(Calibration.find_best_threshold, frames)
+        height, width = frames[0].shape
+        print(f"  eye x{scale} {f'(e.g. {width}x{height})':16s} before {old:8.1f} us   after {new:6.1f} us   {old / new:5.1f}x")
+
+    calibration = Calibration()
+    for i, frame in enumerate(eyes[:2 * calibration.nb_frames]):
+        calibration.evaluate(frame, i % 2)
+    expected = [find_best_threshold_before(frame) for frame in eyes[:2 * calibration.nb_frames]]
+    same = calibration.thresholds_left == expected[0::2] and calibration.thresholds_right == expected[1::2]
+    print(f"Calibration run: thresholds {calibration.threshold(0)} and {calibration.threshold(1)}, "
+          f"{'same' if same else 'DIFFERENT'} as before")
+    print(f"{mismatches} mismatching thresholds")
+
+    skipped = True
+    for shape in [(10, 30), (30, 10), (8, 8)]:
+        frame = cv2.resize(eyes[0], shape[::-1])
+        before = calibration.thresholds_left
+        calibration.evaluate(frame, 0)
+        skipped &= Calibration.find_best_threshold(frame) is None and calibration.thresholds_left == before
+    print(f"Eye frames of 10 pixels or less: {'skipped' if skipped else 'NOT skipped'}")
+    return 1 if mismatches or not same or not skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
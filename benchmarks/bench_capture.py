@@ -0,0 +1,115 @@
+"""Loop rate and capture-to-display latency of the ppp.py main loop with
+three ways of getting camera frames:
+
+- sync: cap.read() at the top of the loop, as ppp.py first did. A camera
+  driver keeps a few frames queued, so a loop slower than the camera
+  displays frames that waited in that queue.
+- scheduler: a capture thread reading a new array per frame into the
+  LatestFrameScheduler, as ppp.py did before FrameCapture.
+- ring: FrameCapture, reading into the preallocated buffers of a FrameRing
+  and handing the loop a view of the newest one.
+
+The camera is a SyntheticSource at CAMERA_FPS that queues up to BUFFERED
+frames like a driver. The loop body stands in for inference and drawing and
+takes WORK_MS, longer than a camera frame. The last section reads an
+unpaced source as fast as possible to show the cost of the frame handoff.
+
+Run from the repository root:
+    python -m benchmarks.bench_capture
+"""
+import sys
+import threading
+import time
+
+import numpy as np
+
+from gaze_tracking.capture import SyntheticSource, FrameCapture
+from gaze_tracking.scheduler import LatestFrameScheduler
+
+CAMERA_FPS = 30
+BUFFERED = 4
+WORK_MS = 45
+SECONDS = 4
+WIDTH, HEIGHT = 1280, 720
+
+
+def camera(fps=CAMERA_FPS, frames=None):
+    return SyntheticSource(WIDTH, HEIGHT, fps, frames=frames, buffered=BUFFERED)
+
+
+def run_sync(source, work):
+    timestamps = []
+    while True:
+        frame = np.empty(source.shape, np.uint8)
+        captured = source.read(frame)
+        if captured is None:
+            break
+        work(frame)
+        timestamps.append((captured, time.monotonic()))
+    return timestamps
+
+
+def run_scheduler(source, work):
+    scheduler = LatestFrameScheduler()
+
+    def capture_frames():
+        while True:
+            frame = np.empty(source.shape, np.uint8)
+            captured = source.read(frame)
+            scheduler.submit("camera", None if captured is None else (frame, captured))
+            if captured is None:
+                break
+
+    threading.Thread(target=capture_frames, daemon=True).start()
+    timestamps = []
+    while True:
+        scheduled = scheduler.take("camera")
+        if scheduled.frame is None:
+            break
+        frame, captured = scheduled.frame
+        work(frame)
+        timestamps.append((captured, time.monotonic()))
+    return timestamps
+
+
+def run_ring(source, work):
+    capture = FrameCapture(source).start()
+    timestamps = []
+    while True:
+        captured = capture.ring.latest()
+        if captured is None:
+            break
+        work(captured.frame)
+        capture.ring.release()
+        timestamps.append((captured.timestamp, time.monotonic()))
+    capture.stop()
+    return timestamps
+
+
+def report(name, source, timestamps):
+    captured, displayed = np.array(timestamps).T
+    fps = (len(displayed) - 1) / (displayed[-1] - displayed[0])
+    p50, p99 = np.percentile(displayed - captured, [50, 99]) * 1e3
+    print(f"  {name:10s} {fps:5.1f} fps   latency p50 {p50:6.1f} ms  p99 {p99:6.1f} ms   "
+          f"{len(displayed)} frames shown, {source.count - len(displayed)} skipped")
+
+
+def main():
+    work = lambda frame: time.sleep(WORK_MS / 1e3)
+    print(f"Camera {WIDTH}x{HEIGHT} at {CAMERA_FPS} fps with {BUFFERED} queued frames, {WORK_MS} ms per loop")
+    for name, run in (("sync", run_sync), ("scheduler", run_scheduler), ("ring", run_ring)):
+        source = camera(frames=SECONDS * CAMERA_FPS)
+        report(name, source, run(source, work))
+
+    frames = 300
+    print(f"Unpaced source, {frames} frames handed to an idle loop")
+    for name, run in (("scheduler", run_scheduler), ("ring", run_ring)):
+        start = time.perf_counter()
+        timestamps = run(camera(fps=None, frames=frames), lambda frame: None)
+        elapsed = time.perf_counter() - start
+        print(f"  {name:10s} {elapsed / frames * 1e3:6.2f} ms per captured frame, {len(timestamps)} shown")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
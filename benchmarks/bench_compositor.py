@@ -0,0 +1,90 @@
+"""Memory allocated per frame by the ppp.py compositor, measured with
+tracemalloc, and its drawing time.
+
+Before, every frame allocated the webcam panel, the keyboard and the text
+area with np.zeros, the resized webcam image, and the screen itself with
+np.vstack: twice the size of the screen per frame, over 45 MB at 4K.
+KeyboardRenderer now draws into one preallocated canvas whose three parts
+are views, and resizes the webcam image straight into it. Once warmed up,
+a frame should allocate no image memory at all: the peak of traced memory
+while drawing may only hold the small Python objects of a frame (state
+tuples, formatted strings), and no more than MAX_LEFT bytes may be left
+over afterwards.
+
+The views mix the scenarios of bench_render: idle frames, navigation,
+typing and suggestions. numpy reports its array allocations to
+tracemalloc, so any frame-sized array would show up in the peak.
+
+Drawing over the canvas of the previous frame is checked to give the same
+screen as the full redraw for every view of the sequence. Exits with 1 if
+a frame differs, or if a steady-state frame allocates more than MAX_PEAK
+bytes or leaves memory behind.
+
+Run from the repository root:
+    python -m benchmarks.bench_compositor
+"""
+import sys
+import time
+import tracemalloc
+
+import ppp
+from benchmarks.bench_render import mismatching_frames, render_before, scenario
+
+SCREEN_SIZES = [(1280, 720), (1920, 1080), (3840, 2160)]
+FRAMES = 40
+WARMUP = 10
+MAX_PEAK = 64 * 1024
+MAX_LEFT = 4 * 1024
+
+
+def views():
+    frames = []
+    for name in ("idle", "navigating", "typing", "suggestions", "navigating"):
+        frames += scenario(name, FRAMES)
+    return frames
+
+
+def traced(render, views):
+    """Peak and leftover traced memory in bytes while rendering views, after a warm-up."""
+    for view in views[:WARMUP]:
+        render(view)
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        for view in views:
+            render(view)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - base, current - base
+
+
+def per_frame(render, views):
+    start = time.perf_counter()
+    for view in views:
+        render(view)
+    return (time.perf_counter() - start) / len(views) * 1e3
+
+
+def main():
+    failures = 0
+    sequence = views()
+    for width, height in SCREEN_SIZES:
+        before = ppp.KeyboardRenderer(width, height)
+        after = ppp.KeyboardRenderer(width, height)
+        render_old = lambda view: render_before(before, view)
+        old_peak, _ = traced(render_old, sequence)
+        new_peak, new_left = traced(after.render, sequence)
+        old_ms, new_ms = per_frame(render_old, sequence), per_frame(after.render, sequence)
+        mismatches = mismatching_frames(width, height, sequence)
+        ok = new_peak <= MAX_PEAK and new_left <= MAX_LEFT and not mismatches
+        failures += not ok
+        print(f"Screen {width}x{height}: {len(sequence)} frames, canvas {after.canvas.nbytes / 2**20:.1f} MB")
+        print(f"  before  peak {old_peak / 2**20:8.2f} MB   {old_ms:6.2f} ms/frame")
+        print(f"  after   peak {new_peak / 2**10:8.2f} KB   {new_ms:6.2f} ms/frame   "
+              f"left over {new_left} bytes   {mismatches} frames differ   {'ok' if ok else 'FAIL'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Cost of isolating both eyes of a frame in gaze_tracking.eye.Eye, before
+and after cropping first, at several camera resolutions.
+
+Before, each eye allocated two full-frame arrays, copied the whole frame
+and ran fillPoly and bitwise_not over all of it, then cropped the ~40x20
+patch around the eye. Now only the box around the eye is read, the polygon
+mask is drawn in the coordinates of the box, and both go into scratch
+buffers reused from frame to frame, so the cost does not grow with the
+resolution.
+
+The landmarks are the 68-point layout used by GazeTracking, with the eyes
+of a face of fixed size in the middle of the frame. Both versions are
+checked to give the same patches and origins. An eye at the frame border,
+where the negative start of the old crop wrapped around and gave an empty
+patch, checks that the box is clamped. Exits with 1 if a patch or origin
+differs or the box is not clamped.
+
+Run from the repository root:
+    python -m benchmarks.bench_eye
+"""
+import sys
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from gaze_tracking.eye import Eye, EyeBuffers
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+REPEATS = 300
+
+
+class Landmarks(object):
+    """dlib.full_object_detection stand-in: part(i) of 68 points."""
+
+    def __init__(self, points):
+        self.points = [SimpleNamespace(x=int(x), y=int(y)) for x, y in points]
+
+    def part(self, index):
+        return self.points[index]
+
+
+def face_landmarks(center_x, center_y):
+    points = np.zeros((68, 2), int)
+    outline = np.array([(-18, 0), (-8, -7), (8, -7), (18, 0), (8, 6), (-8, 6)])
+    points[36:42] = outline + (center_x - 40, center_y)
+    points[42:48] = outline + (center_x + 40, center_y)
+    return Landmarks(points)
+
+
+def isolate_before(frame, landmarks, points):
+    """Eye._isolate before cropping first: (patch, origin)."""
+    region = np.array([(landmarks.part(point).x, landmarks.part(point).y) for point in points])
+    region = region.astype(np.int32)
+    height, width = frame.shape[:2]
+    black_frame = np.zeros((height, width), np.uint8)
+    mask = np.full((height, width), 255, np.uint8)
+    cv2.fillPoly(mask, [region], (0, 0, 0))
+    eye = cv2.bitwise_not(black_frame, frame.copy(), mask=mask)
+    margin = 5
+    min_x = np.min(region[:, 0]) - margin
+    max_x = np.max(region[:, 0]) + margin
+    min_y = np.min(region[:, 1]) - margin
+    max_y = np.max(region[:, 1]) + margin
+    return eye[min_y:max_y, min_x:max_x], (min_x, min_y)
+
+
+def isolate_after(frame, landmarks, points, buffers):
+    eye = Eye.__new__(Eye)
+    eye._isolate(frame, landmarks, points, buffers)
+    return eye.frame, eye.origin
+
+
+def per_frame(function):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        function()
+    return (time.perf_counter() - start) / REPEATS * 1e6
+
+
+def main():
+    rng = np.random.default_rng(0)
+    failures = 0
+    sides = (Eye.LEFT_EYE_POINTS, Eye.RIGHT_EYE_POINTS)
+    buffers = (EyeBuffers(), EyeBuffers())
+    print("Both eyes of a frame")
+    for width, height in RESOLUTIONS:
+        frame = rng.integers(0, 255, (height, width), np.uint8)
+        landmarks = face_landmarks(width // 2, height // 2)
+        mismatches = 0
+        for points, side_buffers in zip(sides, buffers):
+            old_patch, old_origin = isolate_before(frame, landmarks, points)
+            new_patch, new_origin = isolate_after(frame, landmarks, points, side_buffers)
+            mismatches += not np.array_equal(old_patch, new_patch) or tuple(old_origin) != new_origin
+        failures += mismatches > 0
+
+        old = per_frame(lambda: [isolate_before(frame, landmarks, points) for points in sides])
+        new = per_frame(lambda: [isolate_after(frame, landmarks, points, side_buffers)
+                                 for points, side_buffers in zip(sides, buffers)])
+        print(f"  {f'{width}x{height}':10s} before {old:8.1f} us   after {new:6.1f} us   {old / new:6.1f}x   "
+              f"{'ok' if not mismatches else f'FAIL: {mismatches} of {len(sides)} eyes differ'}")
+
+    # Left eye against the left border of the frame
+    frame = rng.integers(0, 255, (480, 640), np.uint8)
+    landmarks = face_landmarks(60, 240)
+    old_patch, _ = isolate_before(frame, landmarks, Eye.LEFT_EYE_POINTS)
+    new_patch, new_origin = isolate_after(frame, landmarks, Eye.LEFT_EYE_POINTS, EyeBuffers())
+    # The box starts at the border and ends at the margin after the rightmost point
+    right = max(landmarks.part(point).x for point in Eye.LEFT_EYE_POINTS) + 5
+    clamped = new_origin[0] == 0 and new_patch.shape[1] == right
+    failures += not clamped
+    print(f"Eye at the border: patch {old_patch.shape} before, {new_patch.shape} at {new_origin} after   "
+          f"{'ok' if clamped else 'FAIL: box not clamped to the frame'}")
+    print("ok" if not failures else "FAIL: see the lines above")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Compares the request latency and CPU time per frame of the base64 JSON
+frame upload with the binary uploads accepted by frame_from_request.
+
+Each request body is encoded once and replayed into the WSGI app, so the
+numbers cover server-side request parsing and decoding but not the network,
+client-side encoding or face mesh inference.
+
+Run from the repository root:
+    python -m benchmarks.bench_frames
+"""
+import base64
+import io
+import sys
+import time
+
+import cv2
+import numpy as np
+from flask import Flask, request, jsonify
+from werkzeug.test import EnvironBuilder
+
+from gaze_tracking.frames import frame_from_request
+
+WIDTH, HEIGHT = 640, 480
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/frame', methods=['POST'])
+    def frame():
+        rgb = frame_from_request(request)
+        return jsonify({'shape': list(rgb.shape)})
+
+    return app
+
+
+def synthetic_frame():
+    """A webcam-like BGR frame: smooth gradients with sensor noise."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:HEIGHT, 0:WIDTH]
+    base = np.dstack([x * 255 // WIDTH, y * 255 // HEIGHT, (x + y) * 255 // (WIDTH + HEIGHT)])
+    return np.clip(base + rng.normal(0, 8, base.shape), 0, 255).astype(np.uint8)
+
+
+def payloads(frame):
+    jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])[1].tobytes()
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB).tobytes()
+    nv12 = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)
+    # I420 to NV12: interleave the U and V planes
+    y_plane, uv = nv12[:HEIGHT], nv12[HEIGHT:].reshape(2, -1)
+    nv12 = np.concatenate([y_plane.ravel(), uv.T.ravel()]).tobytes()
+    data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()
+    size = {'X-Frame-Width': str(WIDTH), 'X-Frame-Height': str(HEIGHT)}
+
+    return {
+        "JSON base64 JPEG": (lambda: dict(json={'image': data_url}), len(data_url) + 12),
+        "octet-stream JPEG": (lambda: dict(data=jpeg, content_type='application/octet-stream',
+                                           headers={'X-Frame-Format': 'jpeg'}), len(jpeg)),
+        "multipart JPEG": (lambda: dict(data={'frame': (io.BytesIO(jpeg), 'frame.jpg', 'image/jpeg')},
+                                        content_type='multipart/form-data'), len(jpeg)),
+        "octet-stream RGB": (lambda: dict(data=rgb, content_type='application/octet-stream',
+                                          headers={'X-Frame-Format': 'rgb', **size}), len(rgb)),
+        "octet-stream NV12": (lambda: dict(data=nv12, content_type='application/octet-stream',
+                                           headers={'X-Frame-Format': 'nv12', **size}), len(nv12)),
+    }
+
+
+def encoded_environ(make_request):
+    """Returns a WSGI environ and its encoded body for a request."""
+    environ = EnvironBuilder(path='/frame', method='POST', **make_request()).get_environ()
+    return environ, environ['wsgi.input'].read()
+
+
+def call(app, environ, body):
+    environ = dict(environ, **{'wsgi.input': io.BytesIO(body)})
+    response = app(environ, lambda status, headers: None)
+    return b''.join(response)
+
+
+def main(n=300):
+    app = make_app().wsgi_app
+    print(f"{WIDTH}x{HEIGHT} frames, {n} requests per path")
+    for name, (make_request, size) in payloads(synthetic_frame()).items():
+        environ, body = encoded_environ(make_request)
+        assert call(app, environ, body) == b'{"shape":[%d,%d,3]}\n' % (HEIGHT, WIDTH)
+        samples = []
+        cpu_start = time.process_time()
+        for _ in range(n):
+            start = time.perf_counter()
+            call(app, environ, body)
+            samples.append(time.perf_counter() - start)
+        cpu = (time.process_time() - cpu_start) / n * 1e3
+        p50, p99 = np.percentile(samples, [50, 99]) * 1e3
+        print(f"  {name:18s} {size / 1024:7.1f} KiB   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms   CPU {cpu:6.2f} ms/frame")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Compares the old linear fuzzy scan of the word predictor with the
+symmetric-delete FuzzyIndex, for latency and for how often the intended
+word is suggested after a substitution, insertion or deletion typo.
+
+Run from the repository root:
+    python -m benchmarks.bench_fuzzy
+"""
+import random
+import string
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from gaze_tracking.completion import FuzzyIndex
+from benchmarks.corpus import load_tokens
+
+
+def linear_scan(common_words, partial_word):
+    """The fallback previously used by WordPredictor: same-length substitutions only."""
+    fuzzy_matches = []
+    for word in common_words:
+        if len(word) >= len(partial_word) and sum(c1 == c2 for c1, c2 in
+                                                 zip(partial_word, word[:len(partial_word)])) >= len(partial_word) - 1:
+            fuzzy_matches.append(word)
+            if len(fuzzy_matches) >= 3:
+                break
+    return fuzzy_matches
+
+
+def make_typo(rng, word, kind):
+    """Returns a prefix of the word with one typo of the given kind."""
+    chars = list(word[:rng.randint(4, len(word))])
+    i = rng.randrange(len(chars))
+    if kind == "substitution":
+        chars[i] = rng.choice(string.ascii_lowercase.replace(chars[i], ""))
+    elif kind == "insertion":
+        chars.insert(i, rng.choice(string.ascii_lowercase))
+    else:
+        del chars[i]
+    return "".join(chars)
+
+
+def measure(lookup, queries):
+    samples = []
+    hits = 0
+    for word, query in queries:
+        start = time.perf_counter()
+        matches = lookup(query)
+        samples.append(time.perf_counter() - start)
+        hits += word in matches
+    p50, p99 = np.percentile(samples, [50, 99]) * 1e6
+    return p50, p99, hits / len(queries)
+
+
+def main():
+    tokens, source = load_tokens()
+    common_words = [word for word, _ in Counter(tokens).most_common(5000)]
+    print(f"corpus: {source}, {len(common_words)} ranked words")
+
+    start = time.perf_counter()
+    index = FuzzyIndex.build(common_words)
+    print(f"index build {time.perf_counter() - start:.2f} s, {len(index.delete_keys)} keys, "
+          f"{sum(array.nbytes for array in index.to_arrays().values()) / 2**20:.1f} MiB")
+
+    rng = random.Random(0)
+    candidates = [word for word in common_words[:2000] if len(word) >= 5]
+    for kind in ("substitution", "insertion", "deletion"):
+        queries = []
+        while len(queries) < 2000:
+            word = rng.choice(candidates)
+            typo = make_typo(rng, word, kind)
+            # The fallback only runs when nothing starts with the typed text
+            if len(typo) >= 3 and not any(other.startswith(typo) for other in common_words):
+                queries.append((word, typo))
+        scan = measure(lambda query: linear_scan(common_words, query), queries)
+        fuzzy = measure(lambda query: index.lookup(query, 3), queries)
+        print(f"\n{kind}:")
+        for name, (p50, p99, recall) in (("linear scan", scan), ("FuzzyIndex", fuzzy)):
+            print(f"  {name:12s} p50 {p50:8.1f} us   p99 {p99:8.1f} us   intended word in top 3: {recall:.1%}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
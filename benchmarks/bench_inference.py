@@ -0,0 +1,125 @@
+"""Multi-user throughput of the face mesh inference: one detector shared by
+the request threads, as app.py used to have, against the InferencePool
+worker processes.
+
+The detector is a stand-in that keeps the CPU busy in Python for
+INFERENCE_MS per frame, like the GIL-bound pre- and post-processing around
+the face mesh graph, so the numbers do not need mediapipe or a face. Each
+client thread is one user with its own session token. On a machine with N
+cores the pool should approach N times the frame rate of the shared
+detector.
+
+The handoff section compares the cost of getting a 640x480 frame to a
+worker through the shared memory block with pickling it through a pipe.
+
+Run from the repository root:
+    python -m benchmarks.bench_inference
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from gaze_tracking.inference import InferencePool, MAX_LANDMARKS
+
+INFERENCE_MS = 10
+USERS = 8
+
+
+class BusyDetector(object):
+    """Spends INFERENCE_MS of CPU per frame and returns fixed landmarks."""
+
+    def __init__(self):
+        self.landmarks = np.full((MAX_LANDMARKS, 3), 0.5, np.float32)
+
+    def process(self, rgb):
+        # CPU time of this thread, so the work is the same however the cores are shared
+        end = time.thread_time() + INFERENCE_MS / 1e3
+        while time.thread_time() < end:
+            pass
+        return self.landmarks
+
+
+class NullDetector(object):
+    def process(self, rgb):
+        return None
+
+
+class SharedDetector(object):
+    """The previous setup: one detector in the server process behind a lock."""
+
+    def __init__(self, detector_factory):
+        self.detector = detector_factory()
+        self.lock = threading.Lock()
+
+    def detect(self, frame, token=None, flip=False):
+        with self.lock:
+            return self.detector.process(frame[:, ::-1] if flip else frame)
+
+
+def frames_per_second(backend, frame, seconds=3.0):
+    counts = [0] * USERS
+    stop = time.perf_counter() + seconds
+
+    def user(i):
+        token = f"user-{i}"
+        while time.perf_counter() < stop:
+            backend.detect(frame, token, flip=True)
+            counts[i] += 1
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(USERS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def _echo(connection):
+    while connection.recv() is not None:
+        connection.send(None)
+
+
+def pickled_handoff(frame, n):
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_echo, args=(child,), daemon=True)
+    process.start()
+    start = time.perf_counter()
+    for _ in range(n):
+        parent.send(frame)
+        parent.recv()
+    elapsed = (time.perf_counter() - start) / n
+    parent.send(None)
+    process.join()
+    return elapsed
+
+
+def main():
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), np.uint8)
+    cores = os.cpu_count() or 1
+    print(f"{USERS} users, {INFERENCE_MS} ms of CPU per frame, {cores} cores")
+    shared = frames_per_second(SharedDetector(BusyDetector), frame)
+    print(f"  shared detector    {shared:7.1f} frames/s")
+    for workers in sorted({1, 2, 4, cores}):
+        pool = InferencePool(workers, BusyDetector).start()
+        rate = frames_per_second(pool, frame)
+        pool.close()
+        print(f"  pool of {workers:2d} workers {rate:7.1f} frames/s   {rate / shared:5.2f}x")
+
+    n = 500
+    pool = InferencePool(1, NullDetector).start()
+    pool.detect(frame)
+    start = time.perf_counter()
+    for _ in range(n):
+        pool.detect(frame, flip=True)
+    shm = (time.perf_counter() - start) / n
+    pool.close()
+    print(f"Frame handoff round trip: shared memory {shm * 1e3:.3f} ms, pickled {pickled_handoff(frame, n) * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Per-frame cost of the blink and gaze features: the previous per-point
+Python code against the vectorised gaze_tracking.landmarks routines.
+
+Before, each frame built a list of 478 coordinate tuples, six small arrays
+and three np.linalg.norm calls per eye, plus the iris position in Python.
+After, the landmarks are one (N, 2) array and both eyes are computed with
+fancy indexing. Both paths are timed from MediaPipe landmark objects (as in
+ppp.py) and from the landmark array returned by the inference workers (as
+in app.py), and checked to give the same values. The batch row evaluates a
+stack of frames at once, as for a recorded session. The per-point code used
+to truncate the coordinates to whole pixels; both paths keep their fractions
+now, and pixel_landmarks is checked not to round them.
+
+Run from the repository root:
+    python -m benchmarks.bench_landmarks
+"""
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from gaze_tracking.landmarks import landmark_array, pixel_landmarks, eye_features
+
+WIDTH, HEIGHT = 640, 480
+N_LANDMARKS = 478
+
+
+def calculate_ear(landmarks, indices):
+    p = [np.array([landmarks[i][0], landmarks[i][1]]) for i in indices]
+    A = np.linalg.norm(p[1] - p[5])
+    B = np.linalg.norm(p[2] - p[4])
+    C = np.linalg.norm(p[0] - p[3])
+    return (A + B) / (2.0 * C)
+
+
+def iris_position(landmarks):
+    left = [landmarks[i] for i in [33, 133]]
+    right = [landmarks[i] for i in [362, 263]]
+    left_iris = landmarks[468]
+    right_iris = landmarks[473]
+    pos = lambda eye, iris: (iris[0] - eye[0][0]) / (eye[1][0] - eye[0][0] + 1e-6)
+    return (pos(left, left_iris) + pos(right, right_iris)) / 2
+
+
+def features_before(coords):
+    left_ear = calculate_ear(coords, [362, 385, 387, 263, 373, 380])
+    right_ear = calculate_ear(coords, [33, 160, 158, 133, 153, 144])
+    return (left_ear + right_ear) / 2, iris_position(coords)
+
+
+def synthetic_faces(n, seed=0):
+    """Normalized landmarks of n frames as float32 arrays, like the face mesh returns."""
+    rng = np.random.default_rng(seed)
+    faces = rng.uniform(0.3, 0.7, (n, N_LANDMARKS, 3)).astype(np.float32)
+    return faces
+
+
+def mediapipe_landmarks(face):
+    return SimpleNamespace(landmark=[SimpleNamespace(x=float(x), y=float(y), z=float(z)) for x, y, z in face])
+
+
+def per_frame(function, inputs):
+    start = time.perf_counter()
+    for item in inputs:
+        function(item)
+    return (time.perf_counter() - start) / len(inputs) * 1e6
+
+
+def main(n=2000):
+    faces = synthetic_faces(n)
+    objects = [mediapipe_landmarks(face) for face in faces]
+
+    def before_objects(landmarks):
+        coords = [(p.x * WIDTH, p.y * HEIGHT) for p in landmarks.landmark]
+        return features_before(coords)
+
+    def after_objects(landmarks):
+        return eye_features(pixel_landmarks(landmark_array(landmarks), WIDTH, HEIGHT))
+
+    def before_array(landmarks):
+        coords = [(x * WIDTH, y * HEIGHT) for x, y, _ in landmarks.tolist()]
+        return features_before(coords)
+
+    def after_array(landmarks):
+        return eye_features(pixel_landmarks(landmarks, WIDTH, HEIGHT))
+
+    # Equal up to rounding, as np.linalg.norm does not add the squares in the same order
+    same = lambda a, b: np.allclose(a, b, rtol=1e-12, atol=0)
+    mismatches = sum(not same(before_objects(o), after_objects(o)) or not same(before_array(f), after_array(f))
+                     for o, f in zip(objects, faces))
+    batch_ears, batch_ratios = eye_features(pixel_landmarks(faces, WIDTH, HEIGHT))
+    mismatches += sum((e, r) != after_array(f) for e, r, f in zip(batch_ears, batch_ratios, faces))
+
+    points = pixel_landmarks(faces, WIDTH, HEIGHT)
+    mismatches += int(np.count_nonzero(points != faces[..., :2].astype(np.float64) * (WIDTH, HEIGHT)))
+    subpixel = bool(np.any(points != np.round(points)))
+
+    print(f"{n} frames of {N_LANDMARKS} landmarks, {mismatches} mismatches, "
+          f"{'subpixel' if subpixel else 'WHOLE PIXEL'} coordinates")
+    for source, before, after, inputs in (("MediaPipe objects", before_objects, after_objects, objects),
+                                          ("landmark array", before_array, after_array, faces)):
+        old, new = per_frame(before, inputs), per_frame(after, inputs)
+        print(f"  from {source:18s} before {old:7.1f} us/frame   after {new:6.1f} us/frame   {old / new:5.1f}x")
+
+    start = time.perf_counter()
+    eye_features(pixel_landmarks(faces, WIDTH, HEIGHT))
+    batch = (time.perf_counter() - start) / n * 1e6
+    print(f"  batch of {n} frames       {batch:6.2f} us/frame")
+    return 1 if mismatches or not subpixel else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Measures the cost of committing words to the personal dictionary for two
+vocabulary sizes, and of replaying the log at startup.
+
+Run from the repository root:
+    python -m benchmarks.bench_personal
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from gaze_tracking.personal import PersonalDictionary
+from gaze_tracking.predictor import WordPredictor
+from benchmarks.corpus import synthetic_tokens
+
+
+def main():
+    rng = random.Random(0)
+    log_dir = tempfile.mkdtemp()
+    for vocab_size in (4000, 40000):
+        predictor = WordPredictor.from_corpus(synthetic_tokens(vocab_size=vocab_size), cache_size=0)
+        log_path = os.path.join(log_dir, f"personal{vocab_size}.log")
+        predictor.personal = PersonalDictionary(log_path)
+
+        committed = [(rng.choice(predictor.common_words[:500]) + "x", rng.choice(predictor.common_words[:50]))
+                     for _ in range(5000)]
+        samples = []
+        for word, previous in committed:
+            start = time.perf_counter()
+            predictor.add_to_dictionary(word, previous)
+            samples.append(time.perf_counter() - start)
+        p50, p99 = np.percentile(samples, [50, 99]) * 1e6
+        print(f"{len(predictor.word_freq)} words: add_to_dictionary p50 {p50:7.1f} us   p99 {p99:7.1f} us")
+
+        start = time.perf_counter()
+        entries = PersonalDictionary(log_path).replay()
+        print(f"  replaying {len(entries)} log entries: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
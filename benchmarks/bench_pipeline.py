@@ -0,0 +1,99 @@
+"""Frame rate and capture-to-display latency of the ppp.py keyboard, headless,
+with every step in one loop against the staged pipeline of ppp.run.
+
+In the sequential loop a frame is mirrored, analyzed, applied to the input
+state machine and drawn before the next one is taken. ppp.run overlaps
+inference of a frame with drawing of the previous one, with queues that
+drop stale frames between the stages.
+
+The camera is a SyntheticSource at CAMERA_FPS and the face mesh a stand-in
+that waits INFERENCE_MS, outside the GIL like the native face mesh, and
+returns a fixed set of landmarks. Drawing is the real compositor of ppp.py
+at SCREEN_SIZE. Per-stage timings of the pipeline are printed from its
+histograms.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline
+"""
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import ppp
+from benchmarks.bench_roi import landmark_template
+from gaze_tracking.capture import SyntheticSource, FrameCapture
+from gaze_tracking.landmarks import pixel_landmarks, eye_features
+from gaze_tracking.pipeline import TimingHistogram
+
+CAMERA_FPS = 30
+INFERENCE_MS = 25
+SCREEN_SIZE = (1280, 720)
+FRAMES = 150
+
+
+class SleepingDetector(object):
+    """Stands in for the face mesh: waits INFERENCE_MS and returns a face in the middle of the frame."""
+
+    def __init__(self):
+        self.landmarks = landmark_template()
+        self.landmarks[:, :2] = 0.35 + self.landmarks[:, :2] * 0.3
+
+    def process(self, rgb):
+        time.sleep(INFERENCE_MS / 1e3)
+        return self.landmarks
+
+
+class FixedPredictor(object):
+    def suggest(self, word, context=""):
+        return ["the", "to", "and"]
+
+    def add_to_dictionary(self, word, previous=None):
+        pass
+
+
+def camera():
+    return SyntheticSource(640, 480, CAMERA_FPS)
+
+
+def run_sequential(source, detector, predictor, frames):
+    renderer = ppp.KeyboardRenderer(*SCREEN_SIZE)
+    keyboard_input = ppp.KeyboardInput(predictor, speak=lambda text: None)
+    capture = FrameCapture(source).start()
+    frame = np.empty(source.shape, np.uint8)
+    latencies = TimingHistogram()
+    start = time.monotonic()
+    for _ in range(frames):
+        captured = capture.ring.latest()
+        cv2.flip(captured.frame, 1, dst=frame)
+        capture.ring.release()
+        landmarks = detector.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        ear, iris_ratio = eye_features(pixel_landmarks(landmarks, frame.shape[1], frame.shape[0]))
+        status = keyboard_input.update(ear, iris_ratio, captured.timestamp)
+        renderer.render(keyboard_input.view(frame, captured.timestamp, *status, ear))
+        latencies.add(time.monotonic() - captured.timestamp)
+    elapsed = time.monotonic() - start
+    capture.stop()
+    return {'frames': frames, 'fps': frames / elapsed, 'latency': latencies}
+
+
+def report(name, stats):
+    latency = stats['latency']
+    print(f"  {name:10s} {stats['fps']:5.1f} fps   latency p50 {latency.percentile(50) * 1e3:6.1f} ms  "
+          f"p99 {latency.percentile(99) * 1e3:6.1f} ms")
+
+
+def main():
+    print(f"Camera 640x480 at {CAMERA_FPS} fps, {INFERENCE_MS} ms inference, "
+          f"screen {SCREEN_SIZE[0]}x{SCREEN_SIZE[1]}, {FRAMES} frames")
+    report("sequential", run_sequential(camera(), SleepingDetector(), FixedPredictor(), FRAMES))
+    stats = ppp.run(camera(), SleepingDetector(), FixedPredictor(), SCREEN_SIZE, headless=True, max_frames=FRAMES)
+    report("pipelined", stats)
+    for name, timings in stats['stages'].items():
+        print(f"    {name:10s} {timings.summary()}, dropped {stats['dropped'].get(name, 0)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
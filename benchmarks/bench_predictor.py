@@ -0,0 +1,66 @@
+"""Reports p50/p99 latency of each WordPredictor suggestion path, with the
+bigram ranking and with trigram stupid backoff, plus next-word accuracy on
+held-out text. The suggestion cache is disabled so every call is measured.
+
+Run from the repository root:
+    python -m benchmarks.bench_predictor
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from gaze_tracking.predictor import WordPredictor
+from benchmarks.corpus import load_tokens
+
+
+def percentiles(fn, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(*query)
+        samples.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(samples, [50, 99]) * 1e6
+    return p50, p99
+
+
+def next_word_accuracy(predictor, tokens, n=5000):
+    """Fraction of held-out words found among the three next-word suggestions."""
+    hits = 0
+    for i in range(2, n + 2):
+        hits += tokens[i] in predictor.predict("", f"{tokens[i - 2]} {tokens[i - 1]}")
+    return hits / n
+
+
+def main():
+    tokens, source = load_tokens()
+    split = len(tokens) * 9 // 10
+    train, held_out = tokens[:split], tokens[split:]
+    print(f"corpus: {source}, {len(train)} training tokens, {len(held_out)} held out")
+
+    rng = random.Random(0)
+    starts = rng.choices(range(len(train) - 2), k=5000)
+    paths = {
+        "next word, no context": [("", "") for _ in starts],
+        "next word, one word": [("", train[i]) for i in starts],
+        "next word, two words": [("", f"{train[i]} {train[i + 1]}") for i in starts],
+        "prefix, one word": [(train[i + 1][:2], train[i]) for i in starts],
+        "prefix, two words": [(train[i + 2][:2], f"{train[i]} {train[i + 1]}") for i in starts],
+        "no match fallback": [(train[i][:3] + "qzx", "") for i in starts],
+    }
+
+    for use_trigrams in (False, True):
+        start = time.perf_counter()
+        predictor = WordPredictor.from_corpus(train, cache_size=0, use_trigrams=use_trigrams)
+        build_time = time.perf_counter() - start
+        label = "trigram backoff" if use_trigrams else "bigram ranking"
+        print(f"\n{label}: built in {build_time:.2f} s")
+        for name, queries in paths.items():
+            p50, p99 = percentiles(predictor.predict, queries)
+            print(f"  {name:22s} p50 {p50:8.1f} us   p99 {p99:8.1f} us")
+        print(f"  next-word top-3 accuracy on held-out text: {next_word_accuracy(predictor, held_out):.1%}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
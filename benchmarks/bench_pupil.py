@@ -0,0 +1,133 @@
+"""Accuracy, jitter and cost of Pupil.detect_iris on synthetic eye frames,
+with every contour of the binarized frame as before against the outer
+contours of its dark regions.
+
+Before, detect_iris traced every contour of the binarized frame with
+findContours (RETR_TREE, CHAIN_APPROX_NONE), sorted them all by area and
+took the moments of the second largest, the hole left by the iris in the
+white of the eye, truncated to whole pixels. image_processing allocated
+its kernel and every intermediate frame. Now only the outer contours of
+the dark regions are traced, with their corners only, the largest is found
+with max, and the kernel and buffers are reused from frame to frame; with
+subpixel=True the centroid is not truncated. The cost includes the
+bilateral filter, the same before and after, which takes most of it; the
+locator alone is timed on the filtered frames.
+
+The eyes are synthetic patches (benchmarks/eyes.py) with a known iris
+center, each binarized at the threshold calibration finds for it. Jitter
+is the standard deviation of the position found in JITTER_FRAMES frames of
+the same eye with new sensor noise. Exits with 1 if the new locator finds
+fewer irises than before, is less accurate than before by more than
+TOLERANCE pixels, or if the sub-pixel centroid jitters more than before.
+
+Run from the repository root:
+    python -m benchmarks.bench_pupil
+"""
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.eyes import synthetic_eyes
+from gaze_tracking.calibration import Calibration
+from gaze_tracking.pupil import Pupil, PupilBuffers
+
+EYES = 500
+JITTER_EYES = 50
+JITTER_FRAMES = 30
+TOLERANCE = 0.1
+
+
+def detect_iris_before(eye_frame, threshold):
+    """Pupil.detect_iris before the outer contours: (x, y) or None."""
+    kernel = np.ones((3, 3), np.uint8)
+    new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15)
+    new_frame = cv2.erode(new_frame, kernel, iterations=3)
+    return locate_before(new_frame, threshold)
+
+
+def locate_before(filtered, threshold):
+    iris_frame = cv2.threshold(filtered, threshold, 255, cv2.THRESH_BINARY)[1]
+    contours, _ = cv2.findContours(iris_frame, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)[-2:]
+    contours = sorted(contours, key=cv2.contourArea)
+    try:
+        moments = cv2.moments(contours[-2])
+        return int(moments['m10'] / moments['m00']), int(moments['m01'] / moments['m00'])
+    except (IndexError, ZeroDivisionError):
+        return None
+
+
+def locators():
+    buffers = PupilBuffers()
+
+    def after(eye_frame, threshold, subpixel):
+        pupil = Pupil(eye_frame, threshold, buffers, subpixel)
+        return None if pupil.x is None else (pupil.x, pupil.y)
+
+    return {
+        'before': detect_iris_before,
+        'after': lambda eye_frame, threshold: after(eye_frame, threshold, False),
+        'subpixel': lambda eye_frame, threshold: after(eye_frame, threshold, True),
+    }
+
+
+def locate_after(filtered, threshold, buffers):
+    _, _, iris_frame, dark = buffers.get(*filtered.shape)
+    cv2.threshold(filtered, threshold, 255, cv2.THRESH_BINARY, dst=iris_frame)
+    cv2.threshold(filtered, threshold, 255, cv2.THRESH_BINARY_INV, dst=dark)
+    return Pupil.iris_centroid(dark)
+
+
+def per_eye(function, eyes, thresholds):
+    start = time.perf_counter()
+    for eye_frame, threshold in zip(eyes, thresholds):
+        function(eye_frame, threshold)
+    return (time.perf_counter() - start) / len(eyes) * 1e6
+
+
+def noisy(rng, patch):
+    noise = rng.normal(0, 3, patch.shape)
+    return np.where(patch == 255, 255, np.clip(patch + noise, 0, 254)).astype(np.uint8)
+
+
+def main():
+    rng = np.random.default_rng(1)
+    eyes = synthetic_eyes(EYES)
+    thresholds = [Calibration.find_best_threshold(patch) for patch, _ in eyes]
+    jitter_frames = [[noisy(rng, patch) for _ in range(JITTER_FRAMES)] for patch, _ in eyes[:JITTER_EYES]]
+
+    results = {}
+    print(f"{EYES} eye frames, jitter over {JITTER_FRAMES} noisy frames of {JITTER_EYES} eyes")
+    print("             found   error px   jitter px   cost us")
+    for name, locate in locators().items():
+        found = [locate(patch, threshold) for (patch, _), threshold in zip(eyes, thresholds)]
+        errors = [np.hypot(position[0] - center[0], position[1] - center[1])
+                  for position, (_, center) in zip(found, eyes) if position is not None]
+
+        jitters = []
+        for frames, threshold in zip(jitter_frames, thresholds):
+            positions = np.array([p for p in (locate(frame, threshold) for frame in frames) if p is not None])
+            if len(positions) > 1:
+                jitters.append(np.hypot(*positions.std(axis=0)))
+
+        cost = per_eye(locate, [patch for patch, _ in eyes], thresholds)
+
+        results[name] = (len(errors), np.mean(errors), np.mean(jitters))
+        print(f"  {name:10s} {len(errors):5d}   {np.mean(errors):8.2f}   {np.mean(jitters):9.3f}   {cost:7.1f}")
+
+    filtered = [Pupil.filter_frame(patch) for patch, _ in eyes]
+    buffers = PupilBuffers()
+    old = per_eye(locate_before, filtered, thresholds)
+    new = per_eye(lambda frame, threshold: locate_after(frame, threshold, buffers), filtered, thresholds)
+    print(f"Locator alone, on the filtered frames: before {old:.1f} us   after {new:.1f} us   {old / new:.1f}x")
+
+    before, after, subpixel = results['before'], results['after'], results['subpixel']
+    ok = (after[0] >= before[0] and after[1] <= before[1] + TOLERANCE and subpixel[1] <= before[1] + TOLERANCE
+          and subpixel[2] <= before[2])
+    print("ok" if ok else "FAIL: fewer irises found, larger error or more jitter than before")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Calibration over a session in which the lighting changes, with the
+thresholds frozen after the first frames as before against the rolling
+recalibration of Calibration, and the startup with a saved profile.
+
+Before, Calibration evaluated the first 20 frames of each eye, kept the
+thresholds in lists and summed them again on every call to threshold();
+after that the thresholds never changed. Now the thresholds of an eye are
+a fixed ring with a running sum: the first nb_frames frames are all
+evaluated, as before, then one frame in every recalibration_interval
+replaces the oldest threshold. The profile saved by the first session lets
+the second one start with a complete calibration.
+
+The eyes are two synthetic patches (benchmarks/eyes.py) with new sensor
+noise in every frame, at CAMERA_FPS. After LIGHT_SECONDS, the eye gets darker by
+DIM_GAIN. The target threshold is the average of the best thresholds of
+the dim frames. Checks, each failing with exit status 1:
+- the first thresholds are those of the old calibration
+- the rolling calibration ends within TOLERANCE of the target
+- the profile was saved during the session, and a calibration loaded from
+  the profile saved at the end is complete at once, with its thresholds
+
+Run from the repository root:
+    python -m benchmarks.bench_recalibration
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.eyes import synthetic_eyes
+from gaze_tracking.calibration import Calibration, profile_path
+
+CAMERA_FPS = 30
+LIGHT_SECONDS = 20
+DIM_SECONDS = 60
+DIM_GAIN = 0.6
+TOLERANCE = 5
+
+
+class CalibrationBefore(object):
+    """Calibration before the rolling estimator: lists that freeze after nb_frames."""
+
+    def __init__(self):
+        self.nb_frames = 20
+        self.thresholds_left = []
+        self.thresholds_right = []
+
+    def is_complete(self):
+        return len(self.thresholds_left) >= self.nb_frames and len(self.thresholds_right) >= self.nb_frames
+
+    def threshold(self, side):
+        thresholds = self.thresholds_right if side else self.thresholds_left
+        return int(sum(thresholds) / len(thresholds))
+
+    def update(self, eye_frame, side):
+        if not self.is_complete():
+            thresholds = self.thresholds_right if side else self.thresholds_left
+            thresholds.append(Calibration.find_best_threshold(eye_frame))
+
+
+def dimmed(patch, gain):
+    """The patch with the eye darker by gain, and the white around it unchanged."""
+    return np.where(patch == 255, 255, patch * gain).astype(np.uint8)
+
+
+def noisy(rng, patch):
+    """The patch with new sensor noise on the eye."""
+    noise = rng.normal(0, 3, patch.shape)
+    return np.where(patch == 255, 255, np.clip(patch + noise, 0, 254)).astype(np.uint8)
+
+
+def session(calibration, frames):
+    """Feeds both eyes of every frame; returns the seconds spent and the thresholds at each second."""
+    spent = 0
+    thresholds = []
+    for i, (left, right) in enumerate(frames):
+        start = time.perf_counter()
+        for side, eye_frame in enumerate((left, right)):
+            calibration.update(eye_frame, side)
+            calibration.threshold(side)
+        spent += time.perf_counter() - start
+        if i % CAMERA_FPS == CAMERA_FPS - 1:
+            thresholds.append((calibration.threshold(0), calibration.threshold(1)))
+    return spent, thresholds
+
+
+def main():
+    rng = np.random.default_rng(1)
+    eyes = [patch for patch, _ in synthetic_eyes(2)]
+    light = [tuple(noisy(rng, patch) for patch in eyes) for _ in range(LIGHT_SECONDS * CAMERA_FPS)]
+    dim = [tuple(noisy(rng, dimmed(patch, DIM_GAIN)) for patch in eyes) for _ in range(DIM_SECONDS * CAMERA_FPS)]
+    target = [np.mean([Calibration.find_best_threshold(pair[side]) for pair in dim]) for side in (0, 1)]
+    frames = light + dim
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = profile_path("user", 0, directory)
+        before = CalibrationBefore()
+        after = Calibration(profile_path=path)
+        old_time, old_thresholds = session(before, frames)
+        new_time, new_thresholds = session(after, frames)
+
+        first = CalibrationBefore()
+        for left, right in frames[:before.nb_frames]:
+            first.update(left, 0)
+            first.update(right, 1)
+        rolling = Calibration(recalibration_interval=None)
+        for left, right in frames[:rolling.nb_frames]:
+            rolling.update(left, 0)
+            rolling.update(right, 1)
+        same_start = (rolling.thresholds_left, rolling.thresholds_right) == (first.thresholds_left, first.thresholds_right)
+
+        print(f"{len(frames)} frames at {CAMERA_FPS} fps, eye {DIM_GAIN}x darker after {LIGHT_SECONDS} s, "
+              f"target thresholds {target[0]:.1f} and {target[1]:.1f}")
+        print("  second   before     after")
+        for second in range(LIGHT_SECONDS - 1, len(old_thresholds), 10):
+            print(f"  {second + 1:6d}   {old_thresholds[second][0]:3d} {old_thresholds[second][1]:3d}   "
+                  f"{new_thresholds[second][0]:3d} {new_thresholds[second][1]:3d}")
+        print(f"  per frame   before {old_time / len(frames) * 1e6:6.1f} us   after {new_time / len(frames) * 1e6:6.1f} us")
+        errors = [abs(new_thresholds[-1][side] - target[side]) for side in (0, 1)]
+        converged = max(errors) <= TOLERANCE
+
+        # Saved while the thresholds renewed, then at the end of the session
+        saved = os.path.exists(path)
+        after.save(path)
+
+        start = time.perf_counter()
+        warm = Calibration(profile_path=path)
+        load_ms = (time.perf_counter() - start) * 1e3
+        warm_start = (saved and warm.is_complete() and warm.thresholds_left == after.thresholds_left
+                      and warm.thresholds_right == after.thresholds_right)
+        print(f"Profile {os.path.basename(path)}: loaded in {load_ms:.2f} ms, "
+              f"thresholds {warm.threshold(0)} and {warm.threshold(1)}, complete {warm.is_complete()}")
+
+    print(f"First thresholds {'same as' if same_start else 'DIFFERENT from'} before, "
+          f"rolling calibration {'within' if converged else 'NOT within'} {TOLERANCE} of the target, "
+          f"warm start {'ok' if warm_start else 'FAILED'}")
+    return 0 if same_start and converged and warm_start else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
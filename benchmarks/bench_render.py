@@ -0,0 +1,145 @@
+"""Per-frame drawing cost of the ppp.py screen: everything drawn again each
+frame, as before, against KeyboardRenderer with its cached layers.
+
+Before, each frame allocated the keyboard, text area and webcam panel,
+drew the background pattern line by line, all 40 keys with their labels,
+the text field, the title and the exit hint. Now those come from
+render_layers, drawn once per screen size, frame size and theme; a frame
+copies the sprites of the keys whose highlight changed and redraws the
+text or the status line only when they change.
+
+Scenarios, each over FRAMES frames with a new camera image every frame:
+- idle: nothing changes but the camera image
+- navigating: the focused key moves every frame
+- typing: the text and the status change every frame
+- suggestions: the focused suggestion moves every frame
+
+Both renderers are checked to draw identical screens, frame by frame; the
+script exits with 1 if any frame differs. Drawing includes the
+webcam resize, which both do every frame; see bench_compositor for the
+memory allocated per frame.
+
+Run from the repository root:
+    python -m benchmarks.bench_render
+"""
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import ppp
+
+SCREEN_SIZES = [(1280, 720), (1920, 1080), (3840, 2160)]
+FRAME_SIZE = (640, 480)
+FRAMES = 100
+
+
+def render_before(renderer, view):
+    """Draws the whole screen from scratch, as ppp.py did every frame."""
+    SCREEN_WIDTH, SCREEN_HEIGHT = renderer.screen_width, renderer.screen_height
+    KEYBOARD_HEIGHT, TEXT_AREA_HEIGHT, WEBCAM_HEIGHT = renderer.keyboard_height, renderer.text_area_height, renderer.webcam_height
+    theme = renderer.theme
+
+    keyboard = np.zeros((KEYBOARD_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
+    keyboard[:] = theme.background
+    pattern_spacing = max(int(SCREEN_WIDTH / 30), 1)
+    for i in range(0, SCREEN_WIDTH, pattern_spacing):
+        cv2.line(keyboard, (i, 0), (i, KEYBOARD_HEIGHT), (245, 240, 250), 1)
+    for i in range(0, KEYBOARD_HEIGHT, pattern_spacing):
+        cv2.line(keyboard, (0, i), (SCREEN_WIDTH, i), (245, 240, 250), 1)
+    if view.suggest_active or view.force_suggest_mode:
+        renderer.draw_suggestions(keyboard, view)
+    else:
+        for i in range(len(ppp.keys_set)):
+            renderer.draw_key(keyboard, i, ppp.keys_set[i], i == view.letter_index)
+        header_height = int(KEYBOARD_HEIGHT * 0.1)
+        cv2.rectangle(keyboard, (0, 0), (SCREEN_WIDTH, header_height), (180, 155, 220), -1)
+        font_scale = max(SCREEN_HEIGHT / 1080 * 0.8, 0.5)
+        instruction = "Look left/right to move, blink to select"
+        text_size = cv2.getTextSize(instruction, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)[0]
+        cv2.putText(keyboard, instruction, ((SCREEN_WIDTH - text_size[0]) // 2, int(header_height * 0.7)),
+                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), 1)
+
+    text_area = np.zeros((TEXT_AREA_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
+    text_area[:] = theme.text_area_background
+    padding_x, padding_y = int(SCREEN_WIDTH * 0.02), int(TEXT_AREA_HEIGHT * 0.15)
+    for color, thickness in (((255, 255, 255), -1), (theme.key_border, 2)):
+        ppp.create_rounded_rectangle(text_area, (padding_x, padding_y),
+                                     (SCREEN_WIDTH - padding_x, int(TEXT_AREA_HEIGHT * 0.6)), color, thickness)
+    renderer.draw_text(text_area, view)
+    renderer.draw_status(text_area, view, f"EAR: {view.ear_value:.3f}" if view.ear_value > 0 else "")
+
+    frame_bg = np.zeros((WEBCAM_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
+    frame_bg[:] = theme.background
+    frame_h, frame_w = view.frame.shape[:2]
+    x, y, width, height = renderer.webcam_box(frame_w, frame_h)
+    frame_bg[y:y+height, x:x+width] = cv2.resize(view.frame, (width, height))
+    cv2.rectangle(frame_bg, (x-2, y-2), (x+width+2, y+height+2), theme.header, 2)
+    title_font_scale = max(SCREEN_HEIGHT / 1080 * 0.8, 0.5)
+    cv2.putText(frame_bg, "Gaze Keyboard", (int(SCREEN_WIDTH * 0.02), int(WEBCAM_HEIGHT * 0.08)),
+                cv2.FONT_HERSHEY_DUPLEX, title_font_scale, theme.header, 1)
+    exit_font_scale = max(SCREEN_HEIGHT / 1080 * 0.6, 0.4)
+    exit_text_size = cv2.getTextSize("Press 'Q' to exit", cv2.FONT_HERSHEY_DUPLEX, exit_font_scale, 1)[0]
+    cv2.putText(frame_bg, "Press 'Q' to exit",
+                (SCREEN_WIDTH - exit_text_size[0] - int(SCREEN_WIDTH * 0.02), int(WEBCAM_HEIGHT * 0.08)),
+                cv2.FONT_HERSHEY_DUPLEX, exit_font_scale, theme.header, 1)
+    if (view.suggest_active or view.force_suggest_mode) and view.last_spoken_suggestion:
+        renderer.draw_caption(frame_bg, f"Suggestion: {view.last_spoken_suggestion}")
+    return np.vstack((frame_bg, keyboard, text_area))
+
+
+def scenario(name, frames):
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 255, (4, FRAME_SIZE[1], FRAME_SIZE[0], 3), np.uint8)
+    base = ppp.KeyboardView(None, 0, "HELLO WORLD", 12, ("the", "to", "and"), False, False, "",
+                            "Ready", (100, 180, 100), 0.3)
+    views = []
+    for i in range(frames):
+        view = base._replace(frame=images[i % len(images)])
+        if name == "navigating":
+            view = view._replace(letter_index=i % 40)
+        elif name == "typing":
+            view = view._replace(text="HELLO WORLD" + "ABC"[:i % 4], status_text=("Ready", "Looking Left")[i % 2],
+                                 ear_value=0.25 + i % 7 / 100)
+        elif name == "suggestions":
+            view = view._replace(text="HELLO ", suggest_active=True, letter_index=i % 3,
+                                 last_spoken_suggestion=("the", "to", "and")[i % 3])
+        views.append(view)
+    return views
+
+
+def per_frame(render, views):
+    start = time.perf_counter()
+    for view in views:
+        render(view)
+    return (time.perf_counter() - start) / len(views) * 1e3
+
+
+def mismatching_frames(width, height, views):
+    """Number of views KeyboardRenderer draws differently from the full redraw."""
+    before = ppp.KeyboardRenderer(width, height)
+    after = ppp.KeyboardRenderer(width, height)
+    return sum(not np.array_equal(render_before(before, view), after.render(view)) for view in views)
+
+
+def main():
+    failures = 0
+    for width, height in SCREEN_SIZES:
+        print(f"Screen {width}x{height}, camera {FRAME_SIZE[0]}x{FRAME_SIZE[1]}")
+        for name in ("idle", "navigating", "typing", "suggestions"):
+            views = scenario(name, FRAMES)
+            mismatches = mismatching_frames(width, height, views)
+            failures += mismatches > 0
+
+            before = ppp.KeyboardRenderer(width, height)
+            old = per_frame(lambda view: render_before(before, view), views)
+            new = per_frame(ppp.KeyboardRenderer(width, height).render, views)
+            print(f"  {name:12s} before {old:6.2f} ms/frame   after {new:6.2f} ms/frame   {old / new:5.1f}x   "
+                  f"{'ok' if not mismatches else f'FAIL: {mismatches} of {len(views)} frames differ'}")
+    print("ok" if not failures else "FAIL: the cached layers do not draw the same screen as the full redraw")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
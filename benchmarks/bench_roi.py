@@ -0,0 +1,154 @@
+"""Inference cost per frame and re-detection rate of RoiTracker against
+running the detector on every full frame.
+
+By default the session is synthetic: a 1280x720 recording of a face moving
+smoothly, jumping across the frame every JUMP_EVERY frames and leaving it
+for a few frames. The detector is a stand-in with the cost structure of the
+face mesh: it converts and resizes its whole input, then locates the face
+and places a fixed landmark template in it. The landmark error against the
+template at the true face position checks the remapping to the frame.
+
+With mediapipe installed, a recorded video can be given instead, in which
+case the face mesh runs on it and the error is measured against the
+landmarks found on the full frames:
+    python -m benchmarks.bench_roi path/to/session.mp4
+
+Run from the repository root:
+    python -m benchmarks.bench_roi
+"""
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from gaze_tracking.landmarks import EAR_INDICES, CORNER_INDICES, IRIS_INDICES
+from gaze_tracking.roi import RoiTracker
+
+WIDTH, HEIGHT = 1280, 720
+FACE_SIZE = 220
+FRAMES = 400
+JUMP_EVERY = 100
+ABSENT = range(250, 260)
+FACE_COLOR = (40, 230, 40)
+
+
+def landmark_template(n=478, seed=0):
+    """Landmarks normalized to the face box, with the eye vertices on two eye outlines."""
+    rng = np.random.default_rng(seed)
+    template = np.zeros((n, 3), np.float32)
+    template[:, :2] = rng.uniform(0.1, 0.9, (n, 2))
+    template[[0, 1], :2] = [[0.02, 0.02], [0.98, 0.98]]
+    angles = np.linspace(0, 2 * np.pi, 6, endpoint=False)
+    for eye, center in zip(EAR_INDICES, ((0.68, 0.4), (0.32, 0.4))):
+        template[eye, 0] = center[0] + 0.1 * np.cos(angles)
+        template[eye, 1] = center[1] + 0.04 * np.sin(angles)
+    for corners, iris in zip(CORNER_INDICES, IRIS_INDICES):
+        template[iris, :2] = template[corners, :2].mean(axis=0)
+    return template
+
+
+class TemplateDetector(object):
+    """Finds the synthetic face and returns the template landmarks placed on it."""
+
+    def __init__(self):
+        self.template = landmark_template()
+
+    def process(self, rgb):
+        # Whole-input work like the face mesh's image conversion and resizing
+        cv2.resize(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGRA), (256, 256), interpolation=cv2.INTER_AREA)
+        mask = cv2.inRange(rgb, (0, 200, 0), (100, 255, 100))
+        x, y, w, h = cv2.boundingRect(mask)
+        if w < 10 or h < 10:
+            return None
+        height, width = rgb.shape[:2]
+        landmarks = self.template.copy()
+        landmarks[:, 0] = (x + landmarks[:, 0] * w) / width
+        landmarks[:, 1] = (y + landmarks[:, 1] * h) / height
+        return landmarks
+
+
+def face_positions():
+    rng = np.random.default_rng(1)
+    positions = []
+    anchor = np.array([WIDTH / 2, HEIGHT / 2])
+    for i in range(FRAMES):
+        if i % JUMP_EVERY == 0:
+            anchor = rng.uniform([FACE_SIZE, FACE_SIZE], [WIDTH - FACE_SIZE, HEIGHT - FACE_SIZE])
+        sway = np.array([40 * np.sin(i / 15), 15 * np.sin(i / 9)])
+        positions.append(None if i in ABSENT else (anchor + sway - FACE_SIZE / 2).astype(int))
+    return positions
+
+
+def synthetic_session():
+    rng = np.random.default_rng(2)
+    background = rng.integers(0, 150, (HEIGHT, WIDTH, 3), np.uint8)
+    for position in face_positions():
+        frame = background.copy()
+        if position is not None:
+            x, y = position
+            cv2.rectangle(frame, (x, y), (x + FACE_SIZE - 1, y + FACE_SIZE - 1), FACE_COLOR, -1)
+        yield frame
+
+
+def video_session(path):
+    capture = cv2.VideoCapture(path)
+    while True:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    capture.release()
+
+
+def timed(process, frames):
+    results, elapsed = [], 0.0
+    for frame in frames:
+        start = time.perf_counter()
+        results.append(process(frame))
+        elapsed += time.perf_counter() - start
+    return results, elapsed / len(frames) * 1e3
+
+
+def landmark_error(found, reference, width, height):
+    """Largest eye landmark distance in pixels over frames where both found a face, and the frames that differ."""
+    worst, missed = 0.0, 0
+    eyes = np.concatenate([EAR_INDICES.ravel(), IRIS_INDICES])
+    for a, b in zip(found, reference):
+        if (a is None) != (b is None):
+            missed += 1
+        elif a is not None:
+            worst = max(worst, np.abs((a[eyes, :2] - b[eyes, :2]) * (width, height)).max())
+    return worst, missed
+
+
+def main(path=None):
+    if path is None:
+        frames = list(synthetic_session())
+        detector = TemplateDetector()
+        reference = [None if position is None else TemplateDetector().process(frame)
+                     for frame, position in zip(frames, face_positions())]
+        print(f"Synthetic session: {len(frames)} frames of {WIDTH}x{HEIGHT}, a jump every {JUMP_EVERY} frames")
+    else:
+        from gaze_tracking.backends import FaceMeshDetector
+        frames = list(video_session(path))
+        detector = FaceMeshDetector()
+        reference = None
+        print(f"{path}: {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    height, width = frames[0].shape[:2]
+
+    full, full_ms = timed(detector.process, frames)
+    if reference is None:
+        reference = full
+        detector = FaceMeshDetector()
+    tracker = RoiTracker(detector)
+    tracked, tracked_ms = timed(tracker.process, frames)
+
+    for name, found, ms in (("Full frame", full, full_ms), ("ROI tracking", tracked, tracked_ms)):
+        worst, missed = landmark_error(found, reference, width, height)
+        print(f"  {name:12s} {ms:6.2f} ms/frame   eye landmark error {worst:5.2f} px   {missed} frames differ")
+    print(f"  Re-detection rate {tracker.redetection_rate():.1%} ({tracker.detections} full frame searches)")
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:2]))
@@ -0,0 +1,156 @@
+"""Gaze-to-action latency with and without the latest-wins frame scheduler.
+
+A synthetic camera produces frames at CAMERA_FPS while a stand-in for face
+mesh inference takes INFERENCE_MS per frame, with every STALL_EVERY-th frame
+taking STALL_MS as under CPU contention. Inference is slower than the
+camera, so the in-order queue that the capture loops used to be builds a
+backlog and its latency keeps growing, while LatestFrameScheduler drops
+stale frames and keeps it bounded by roughly one inference time.
+
+Latency is the time from capture to the end of inference of a frame, i.e.
+the delay before an action derived from it can be applied.
+
+The second section sends frames of one session from several request
+threads to LatestFrameScheduler.run, as the server does, alongside a
+stream thread submitting frames and processing them with taking(), as the
+WebSocket handler does. It checks that frames of the session never overlap
+and that every frame taken is processed.
+
+Run from the repository root:
+    python -m benchmarks.bench_scheduler
+"""
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+from gaze_tracking.scheduler import LatestFrameScheduler, FrameDropped
+
+CAMERA_FPS = 30
+INFERENCE_MS = 45
+STALL_EVERY = 20
+STALL_MS = 300
+
+
+class SlowInference(object):
+    """Stands in for the face mesh: sleeps for the inference time of each frame."""
+
+    def __init__(self):
+        self.frames = 0
+
+    def __call__(self, frame):
+        self.frames += 1
+        time.sleep((STALL_MS if self.frames % STALL_EVERY == 0 else INFERENCE_MS) / 1e3)
+        return frame
+
+
+def camera(put, seconds, stop):
+    """Calls put with the capture time of each frame, at CAMERA_FPS."""
+    start = time.monotonic()
+    n = 0
+    while n < seconds * CAMERA_FPS:
+        time.sleep(max(0, start + n / CAMERA_FPS - time.monotonic()))
+        put(time.monotonic())
+        n += 1
+    stop.set()
+
+
+def run_fifo(seconds):
+    frames = queue.Queue()
+    stop = threading.Event()
+    threading.Thread(target=camera, args=(frames.put, seconds, stop), daemon=True).start()
+    inference = SlowInference()
+    latencies, depth = [], 0
+    # Runs for as long as the camera does, like the capture loop while the user types
+    while not stop.is_set():
+        try:
+            captured = frames.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        inference(captured)
+        latencies.append(time.monotonic() - captured)
+        depth = max(depth, frames.qsize())
+    return latencies, 0, depth
+
+
+def run_latest(seconds):
+    scheduler = LatestFrameScheduler()
+    stop = threading.Event()
+    threading.Thread(target=camera, args=(lambda t: scheduler.submit("camera", t, t), seconds, stop),
+                     daemon=True).start()
+    inference = SlowInference()
+    latencies, depth = [], 0
+    while not stop.is_set():
+        scheduled = scheduler.take("camera", timeout=0.1)
+        if scheduled is None:
+            continue
+        inference(scheduled.frame)
+        latencies.append(time.monotonic() - scheduled.timestamp)
+        depth = max(depth, scheduler.stats("camera")['depth'])
+    return latencies, scheduler.stats("camera")['dropped'], depth
+
+
+def run_server(threads=4, frames=50):
+    scheduler = LatestFrameScheduler()
+    active, overlaps, calls, results = [0], [0], [0], {'processed': 0, 'dropped': 0}
+    lock = threading.Lock()
+
+    def process(frame):
+        with lock:
+            calls[0] += 1
+            active[0] += 1
+            overlaps[0] += active[0] > 1
+        time.sleep(INFERENCE_MS / 1e3)
+        with lock:
+            active[0] -= 1
+        return frame
+
+    def client(i):
+        for n in range(frames):
+            try:
+                scheduler.run("session", (i, n), process)
+                outcome = 'processed'
+            except FrameDropped:
+                outcome = 'dropped'
+            with lock:
+                results[outcome] += 1
+            time.sleep(INFERENCE_MS / 1e3 / threads)
+
+    def stream():
+        for n in range(frames):
+            scheduler.submit("session", ('stream', n))
+            with scheduler.taking("session", timeout=0) as scheduled:
+                if scheduled is not None:
+                    process(scheduled.frame)
+            with lock:
+                results['processed' if scheduled is not None else 'dropped'] += 1
+            time.sleep(INFERENCE_MS / 1e3 / threads)
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=stream))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results, overlaps[0], calls[0], scheduler.stats()
+
+
+def main(seconds=10):
+    print(f"Camera at {CAMERA_FPS} fps, inference {INFERENCE_MS} ms with a {STALL_MS} ms stall "
+          f"every {STALL_EVERY} frames, {seconds} s")
+    for name, run in (("In-order queue", run_fifo), ("Latest-wins", run_latest)):
+        latencies, dropped, depth = run(seconds)
+        p50, p99, worst = np.percentile(latencies, [50, 99, 100]) * 1e3
+        print(f"  {name:15s} {len(latencies):4d} processed {dropped:4d} dropped   queue depth {depth:3d}   "
+              f"latency p50 {p50:7.1f} ms   p99 {p99:7.1f} ms   max {worst:7.1f} ms")
+
+    results, overlaps, calls, stats = run_server()
+    print(f"Server threads and stream: {results['processed']} processed, {results['dropped']} dropped, "
+          f"{overlaps} overlapping, max age {stats['max_age'] * 1e3:.1f} ms")
+    return 1 if overlaps or calls != stats['processed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Load test of the per-session keyboard state in app.py.
+
+Many simulated users, each with its own X-Session-Token, post to /api/type
+from several client threads against app.py served on localhost. The run
+reports the request rate and latency for increasing numbers of sessions,
+checks that no session sees another one's text or cursor, and measures the
+memory held per idle session and the idle eviction of the registry.
+
+Needs the full app.py environment (mediapipe, pyttsx3).
+
+Run from the repository root:
+    python -m benchmarks.bench_sessions
+"""
+import http.client
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+import app
+from gaze_tracking.sessions import SessionRegistry
+
+CLIENT_THREADS = 8
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def serve():
+    server = make_server('127.0.0.1', 0, app.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def prepare(tokens):
+    """Gives every session its own text, and lets its next command through the cooldown."""
+    for i, token in enumerate(tokens):
+        session = app.sessions.get(token)
+        session.text = f"user{i} "
+        session.letter_index = 0
+        session.last_action = 0
+
+
+def client(port, tokens, requests, latencies, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    for n in range(requests):
+        i = n % len(tokens)
+        index, token = tokens[i]
+        # The first request of each session moves its cursor, later ones only read the state
+        action = "RIGHT" if n < len(tokens) else ""
+        start = time.perf_counter()
+        connection.request('POST', '/api/type', json.dumps({'action': action}),
+                           {'Content-Type': 'application/json', 'X-Session-Token': token})
+        data = json.loads(connection.getresponse().read())
+        latencies.append(time.perf_counter() - start)
+        if data['text'] != f"user{index} " or data['letter_index'] != 1:
+            errors.append((token, data['text'], data['letter_index']))
+    connection.close()
+
+
+def run(port, n_sessions, requests_per_thread):
+    tokens = [f"bench-{n_sessions}-{i}" for i in range(n_sessions)]
+    prepare(tokens)
+    indexed = list(enumerate(tokens))
+    shares = [indexed[t::CLIENT_THREADS] for t in range(CLIENT_THREADS) if indexed[t::CLIENT_THREADS]]
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(port, share, max(requests_per_thread, len(share)),
+                                                     latencies, errors))
+               for share in shares]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(threads), len(latencies) / elapsed, np.percentile(latencies, [50, 99]) * 1e3, errors
+
+
+def session_memory(n=10000):
+    registry = SessionRegistry()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(n):
+        registry.get(f"memory-{i}")
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return total / n
+
+
+def eviction():
+    registry = SessionRegistry(idle_timeout=0.05, max_sessions=100)
+    for i in range(150):
+        registry.get(f"evict-{i}")
+    capped = len(registry)
+    time.sleep(0.1)
+    registry.get("fresh")
+    return capped, len(registry)
+
+
+def main(requests_per_thread=500):
+    server = serve()
+    print(f"/api/type from up to {CLIENT_THREADS} client threads, {requests_per_thread} requests per thread")
+    failed = False
+    for n_sessions in (1, 10, 100, 1000):
+        n_threads, rate, (p50, p99), errors = run(server.port, n_sessions, requests_per_thread)
+        failed |= bool(errors)
+        print(f"  {n_sessions:5d} sessions {n_threads} threads   {rate:8.1f} requests/s   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms"
+              f"   cross-session errors {len(errors)}")
+    server.shutdown()
+
+    print(f"Memory per idle session: {session_memory():.0f} bytes")
+    capped, remaining = eviction()
+    print(f"Eviction: 150 sessions capped to {capped}, {remaining} left after the idle timeout")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Compares the HTTP polling loop of the demo page with the /ws/stream
+WebSocket channel: sustained frame rate and end-to-end action latency.
+
+The polling client posts each frame to /api/process-frame and, when a
+command comes back, posts it to /api/type, as the demo page does. The
+streaming client pushes frames over one WebSocket and reads the state delta.
+Both run against app.py served on localhost, without the page's 100 ms pause
+between frames.
+
+Face mesh inference costs the same on both paths, so app.analyze_frame is
+replaced by a scripted detector that issues a RIGHT or LEFT command every
+few frames and clears the command cooldown, so every command moves the
+cursor. Action latency is the time from sending such a frame to receiving
+the moved cursor.
+
+Needs the full app.py environment (mediapipe, pyttsx3, flask-sock).
+
+Run from the repository root:
+    python -m benchmarks.bench_streaming
+"""
+import http.client
+import json
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+from simple_websocket import Client
+from werkzeug.serving import make_server
+
+import app
+
+COMMAND_EVERY = 5
+
+
+class ScriptedDetector(object):
+    """Stands in for analyze_frame, alternating RIGHT and LEFT commands."""
+
+    def __init__(self):
+        self.frames = 0
+
+    def __call__(self, frame, gaze_sensitivity, token=None):
+        self.frames += 1
+        command = None
+        if self.frames % COMMAND_EVERY == 0:
+            command = "RIGHT" if self.frames // COMMAND_EVERY % 2 else "LEFT"
+            app.sessions.get().last_action = 0
+        return {'eye_position': [50.0, 50.0], 'eye_direction': command or "CENTER",
+                'is_blinking': False, 'ear_value': 0.3, 'command': command}
+
+
+def serve():
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def jpeg_frame():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 640, 3), np.uint8)
+    return cv2.imencode('.jpg', cv2.GaussianBlur(frame, (9, 9), 3), [cv2.IMWRITE_JPEG_QUALITY, 70])[1].tobytes()
+
+
+def reset():
+    app.analyze_frame = ScriptedDetector()
+    # Both clients use the default session, as they send no session token
+    session = app.sessions.get()
+    session.tracking_active = True
+    session.letter_index = 0
+
+
+def run_polling(port, jpeg, n):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/octet-stream', 'X-Frame-Format': 'jpeg'}
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(n):
+        sent = time.perf_counter()
+        connection.request('POST', '/api/process-frame', jpeg, headers)
+        data = json.loads(connection.getresponse().read())
+        if data['command']:
+            connection.request('POST', '/api/type', json.dumps({'action': data['command']}),
+                               {'Content-Type': 'application/json'})
+            json.loads(connection.getresponse().read())
+            latencies.append(time.perf_counter() - sent)
+    return n / (time.perf_counter() - start), latencies
+
+
+def run_streaming(port, jpeg, n):
+    ws = Client.connect(f'ws://127.0.0.1:{port}/ws/stream')
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(n):
+        sent = time.perf_counter()
+        ws.send(jpeg)
+        delta = json.loads(ws.receive())
+        if 'letter_index' in delta:
+            latencies.append(time.perf_counter() - sent)
+    rate = n / (time.perf_counter() - start)
+    ws.close()
+    return rate, latencies
+
+
+def main(n=1000):
+    if not app.SOCK_AVAILABLE:
+        print("flask-sock is not installed; /ws/stream is unavailable")
+        return 1
+    server = serve()
+    jpeg = jpeg_frame()
+    print(f"{n} frames of {len(jpeg) / 1024:.1f} KiB, a command every {COMMAND_EVERY} frames")
+    for name, run in (("HTTP polling", run_polling), ("WebSocket stream", run_streaming)):
+        reset()
+        run(server.port, jpeg, 20)
+        reset()
+        rate, latencies = run(server.port, jpeg, n)
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+        print(f"  {name:17s} {rate:7.1f} frames/s   action latency p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
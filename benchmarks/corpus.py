@@ -0,0 +1,30 @@
+"""Token streams shared by the predictor benchmarks."""
+import random
+import string
+
+try:
+    from nltk.corpus import brown
+except ImportError:
+    brown = None
+
+
+def synthetic_tokens(n_tokens=1000000, vocab_size=40000, seed=0):
+    """Returns a Zipf-distributed token list with a Brown-like vocabulary size."""
+    rng = random.Random(seed)
+    vocab = set()
+    while len(vocab) < vocab_size:
+        vocab.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 10))))
+    vocab = sorted(vocab)
+    rng.shuffle(vocab)
+    weights = [1.0 / (rank + 1) for rank in range(vocab_size)]
+    return rng.choices(vocab, weights, k=n_tokens)
+
+
+def load_tokens():
+    """Returns the lowercase alphabetic Brown tokens, or a synthetic stand-in if the corpus is missing."""
+    if brown is not None:
+        try:
+            return [w.lower() for w in brown.words() if w.isalpha()], "brown"
+        except LookupError:
+            pass
+    return synthetic_tokens(), "synthetic"
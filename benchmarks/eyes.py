@@ -0,0 +1,44 @@
+"""Synthetic eye patches shared by the calibration and pupil benchmarks."""
+import cv2
+import numpy as np
+
+
+def synthetic_eye(rng, width=None, height=None):
+    """Returns an eye patch as Eye._isolate gives it and the true center of its iris.
+
+    The eye is a white ellipse inside a patch that is white outside the eye
+    polygon, with a dark iris and a darker pupil at a random position and
+    sub-pixel center, an eyelid shadow, sensor noise and a little blur.
+    """
+    width = width or int(rng.integers(36, 90))
+    height = height or int(rng.integers(max(width // 3, 16), max(width // 2, 17) + 1))
+    scale = 16
+    patch = np.full((height, width), 255, np.uint8)
+    axes = (width // 2 - 5, height // 2 - 5)
+    center = (width // 2, height // 2)
+    cv2.ellipse(patch, center, axes, 0, 0, 360, int(rng.integers(170, 225)), -1)
+
+    radius = height * rng.uniform(0.45, 0.6)
+    iris_x = width / 2 + rng.uniform(-0.45, 0.45) * axes[0]
+    iris_y = height / 2 + rng.uniform(-0.2, 0.2) * axes[1]
+    eye = np.zeros_like(patch)
+    cv2.ellipse(eye, center, axes, 0, 0, 360, 255, -1)
+    iris = patch.copy()
+    cv2.circle(iris, (int(round(iris_x * scale)), int(round(iris_y * scale))), int(radius * scale),
+               int(rng.integers(40, 110)), -1, cv2.LINE_AA, 4)
+    cv2.circle(iris, (int(round(iris_x * scale)), int(round(iris_y * scale))), int(radius * 0.45 * scale),
+               int(rng.integers(10, 40)), -1, cv2.LINE_AA, 4)
+    patch = np.where(eye > 0, iris, patch)
+
+    shadow = np.linspace(rng.uniform(0.7, 0.9), 1, height)[:, None]
+    noise = rng.normal(0, rng.uniform(2, 8), patch.shape)
+    inside = (eye > 0)
+    noisy = np.clip(patch * np.where(inside, shadow, 1) + noise * inside, 0, 255).astype(np.uint8)
+    noisy = np.where(inside, cv2.GaussianBlur(noisy, (3, 3), 0), 255).astype(np.uint8)
+    return noisy, (iris_x, iris_y)
+
+
+def synthetic_eyes(count, seed=0):
+    """Returns count synthetic eye patches with their true iris centers."""
+    rng = np.random.default_rng(seed)
+    return [synthetic_eye(rng) for _ in range(count)]
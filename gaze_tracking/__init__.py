@@ -1 +1,7 @@
-from .gaze_tracking import GazeTracking
+def __getattr__(name):
+    # GazeTracking needs dlib, so it is only imported when requested. This keeps
+    # the predictor and the other helpers usable without it.
+    if name == "GazeTracking":
+        from .gaze_tracking import GazeTracking
+        return GazeTracking
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
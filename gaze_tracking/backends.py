@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import cv2
+from .calibration import Calibration
+from .eye import Eye, EyeBuffers
+from .landmarks import MESH_LAYOUT, DLIB_LAYOUT, landmark_array
+
+DLIB_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trained_models",
+                               "shape_predictor_68_face_landmarks.dat")
+
+
+class FaceMeshDetector(object):
+    """MediaPipe face mesh returning the landmarks of the first face as an array"""
+
+    # Refined landmarks, with the iris centers at 468 and 473
+    layout = MESH_LAYOUT
+
+    def __init__(self):
+        import mediapipe as mp
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(refine_landmarks=True, max_num_faces=1)
+
+    def process(self, rgb):
+        """Returns the normalized (x, y, z) landmarks as a float32 array, or None without a face"""
+        results = self.face_mesh.process(rgb)
+        if not results.multi_face_landmarks:
+            return None
+        return landmark_array(results.multi_face_landmarks[0])
+
+
+class DlibDetector(object):
+    """
+    dlib HOG face detector and 68-point shape predictor, with the pupils
+    located in the eye patches (see Eye and Pupil) since the predictor has
+    no iris points. process returns the landmarks of the first face like
+    FaceMeshDetector does, with the two pupils appended, so both backends
+    share the eye features of landmarks.
+    """
+
+    layout = DLIB_LAYOUT
+
+    def __init__(self, model_path=DLIB_MODEL_PATH, calibration=None, subpixel=True):
+        """
+        Arguments:
+            model_path (str): Model file of the 68-point shape predictor
+            calibration (Calibration): Binarization threshold of the pupils,
+                a new calibration from scratch by default
+            subpixel (bool): Locates the pupils to a fraction of a pixel
+        """
+        import dlib
+        self._face_detector = dlib.get_frontal_face_detector()
+        self._predictor = dlib.shape_predictor(model_path)
+        self.calibration = calibration if calibration is not None else Calibration()
+        self.subpixel = subpixel
+        # Scratch memory of each eye, reused from frame to frame
+        self._eye_buffers = (EyeBuffers(), EyeBuffers())
+        self.eyes = (None, None)
+
+    def analyze(self, gray):
+        """Detects the face of a grayscale frame and isolates its eyes into self.eyes.
+
+        Returns:
+            The dlib.full_object_detection of the face, or None without a face
+        """
+        faces = self._face_detector(gray)
+        if len(faces) == 0:
+            self.eyes = (None, None)
+            return None
+        landmarks = self._predictor(gray, faces[0])
+        self.eyes = tuple(Eye(gray, landmarks, side, self.calibration, self._eye_buffers[side], self.subpixel)
+                          for side in (0, 1))
+        return landmarks
+
+    def process(self, rgb):
+        """Returns the normalized (x, y, z) landmarks as a (70, 3) float32 array, or None without a face.
+
+        The coordinates are those of pixel centers, measured from the frame
+        edge as for the face mesh, and the pupils keep their fractions of a
+        pixel when subpixel is set.
+        """
+        landmarks = self.analyze(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY))
+        if landmarks is None:
+            return None
+        points = np.zeros((70, 3), np.float32)
+        points[:68, :2] = [(p.x, p.y) for p in landmarks.parts()]
+        for i, eye in enumerate(self.eyes):
+            if eye.pupil is not None and eye.pupil.x is not None:
+                points[68 + i, :2] = (eye.origin[0] + eye.pupil.x, eye.origin[1] + eye.pupil.y)
+            else:
+                # No pupil found, e.g. during a blink: the middle of the eye
+                points[68 + i, :2] = eye.landmark_points.mean(axis=0)
+        height, width = rgb.shape[:2]
+        points[:, :2] += 0.5
+        points[:, :2] /= (width, height)
+        return points
+
+
+# Landmark backends by name, each a detector class with a process(rgb) method
+# returning normalized landmarks and the layout of their eye points
+BACKENDS = {
+    'mediapipe': FaceMeshDetector,
+    'dlib': DlibDetector,
+}
@@ -1,22 +1,108 @@
 from __future__ import division
+import json
+import os
+import re
 import cv2
+import numpy as np
 from .pupil import Pupil
 
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trained_models", "calibration")
+
+# Bumped whenever the content of calibration profiles changes
+PROFILE_VERSION = 1
+
+
+def profile_path(user, camera, directory=DEFAULT_PROFILE_DIR):
+    """Returns the file holding the calibration profile of a user with a camera.
+
+    Arguments:
+        user: Name or ID of the user
+        camera: Camera index, device or video path
+        directory: Directory of the profiles
+    """
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '_', f"{user}-{camera}")
+    return os.path.join(directory, name + ".json")
+
+
+class RollingThreshold(object):
+    """
+    Average of the last thresholds found for an eye. The thresholds are
+    kept in a fixed ring with their running sum, so adding one and reading
+    the average cost the same however long the calibration runs.
+    """
+
+    def __init__(self, size):
+        self.values = [0] * size
+        self.count = 0
+        self.total = 0
+        self._next = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, threshold):
+        """Adds a threshold, replacing the oldest one once the ring is full"""
+        if self.count == len(self.values):
+            self.total -= self.values[self._next]
+        else:
+            self.count += 1
+        self.values[self._next] = threshold
+        self.total += threshold
+        self._next = (self._next + 1) % len(self.values)
+
+    def average(self):
+        """Returns the average threshold, as an integer"""
+        return int(self.total / self.count)
+
+    def tolist(self):
+        """Returns the thresholds from the oldest to the newest"""
+        if self.count < len(self.values):
+            return self.values[:self.count]
+        return self.values[self._next:] + self.values[:self._next]
+
 
 class Calibration(object):
     """
     This class calibrates the pupil detection algorithm by finding the
     best binarization threshold value for the person and the webcam.
+
+    The first nb_frames frames of each eye are all evaluated. After that,
+    one frame in every recalibration_interval is, and replaces the oldest
+    threshold of the eye, so the calibration follows changes of lighting.
+    With a profile path, the thresholds are loaded from it at startup,
+    so the calibration starts complete, and saved back as they renew.
     """
 
-    def __init__(self):
-        self.nb_frames = 20
-        self.thresholds_left = []
-        self.thresholds_right = []
+    def __init__(self, nb_frames=20, recalibration_interval=30, profile_path=None):
+        """
+        Arguments:
+            nb_frames (int): Thresholds averaged for each eye
+            recalibration_interval (int): Frames between two evaluations once
+                the calibration is complete, or None to stop evaluating then
+            profile_path (str): JSON file of the calibration profile, or None
+        """
+        self.nb_frames = nb_frames
+        self.recalibration_interval = recalibration_interval
+        self.profile_path = profile_path
+        self._thresholds = (RollingThreshold(nb_frames), RollingThreshold(nb_frames))
+        self._frames = [0, 0]
+        # Thresholds found since the profile was last saved
+        self._unsaved = 0
+
+        if profile_path:
+            self.load(profile_path)
+
+    @property
+    def thresholds_left(self):
+        return self._thresholds[0].tolist()
+
+    @property
+    def thresholds_right(self):
+        return self._thresholds[1].tolist()
 
     def is_complete(self):
         """Returns true if the calibration is completed"""
-        return len(self.thresholds_left) >= self.nb_frames and len(self.thresholds_right) >= self.nb_frames
+        return len(self._thresholds[0]) >= self.nb_frames and len(self._thresholds[1]) >= self.nb_frames
 
     def threshold(self, side):
         """Returns the threshold value for the given eye.
@@ -24,10 +110,74 @@ class Calibration(object):
         Argument:
             side: Indicates whether it's the left eye (0) or the right eye (1)
         """
-        if side == 0:
-            return int(sum(self.thresholds_left) / len(self.thresholds_left))
-        elif side == 1:
-            return int(sum(self.thresholds_right) / len(self.thresholds_right))
+        if side in (0, 1):
+            return self._thresholds[side].average()
+
+    def update(self, eye_frame, side):
+        """Evaluates the frame of an eye if the calibration needs it: every
+        frame until the eye is calibrated, then one in every
+        recalibration_interval. Saves the profile once the calibration is
+        complete and again each time its thresholds have been renewed.
+
+        Arguments:
+            eye_frame (numpy.ndarray): Frame of the eye
+            side: Indicates whether it's the left eye (0) or the right eye (1)
+        """
+        if side not in (0, 1):
+            return
+        if len(self._thresholds[side]) >= self.nb_frames:
+            self._frames[side] += 1
+            if not self.recalibration_interval or self._frames[side] % self.recalibration_interval:
+                return
+
+        self.evaluate(eye_frame, side)
+        if self.profile_path and self.is_complete() and self._unsaved >= 2 * self.nb_frames:
+            try:
+                self.save(self.profile_path)
+            except OSError as e:
+                print(f"Error saving calibration profile: {e}")
+
+    def load(self, path):
+        """Loads the thresholds of a profile saved by save, if there is one.
+
+        Argument:
+            path (str): JSON file of the profile
+
+        Returns:
+            True if the profile was loaded
+        """
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+            if profile['version'] != PROFILE_VERSION:
+                return False
+            sides = [[int(threshold) for threshold in profile[key]] for key in ('left', 'right')]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error reading calibration profile: {e}")
+            return False
+
+        self._thresholds = (RollingThreshold(self.nb_frames), RollingThreshold(self.nb_frames))
+        for rolling, thresholds in zip(self._thresholds, sides):
+            for threshold in thresholds[-self.nb_frames:]:
+                rolling.add(threshold)
+        self._unsaved = 0
+        return True
+
+    def save(self, path):
+        """Saves the thresholds of both eyes into a profile.
+
+        Argument:
+            path (str): JSON file of the profile, replaced atomically
+        """
+        profile = {'version': PROFILE_VERSION, 'left': self.thresholds_left, 'right': self.thresholds_right}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, path)
+        self._unsaved = 0
 
     @staticmethod
     def iris_size(frame):
@@ -43,27 +193,57 @@ class Calibration(object):
         nb_blacks = nb_pixels - cv2.countNonZero(frame)
         return nb_blacks / nb_pixels
 
+    @staticmethod
+    def iris_sizes(frame, thresholds):
+        """Returns the percentage of space that the iris would take up on
+        the surface of the eye for each threshold, as iris_size gives it for
+        the frame binarized at that threshold.
+
+        Arguments:
+            frame (numpy.ndarray): Filtered eye frame, before binarization
+            thresholds (numpy.ndarray): Threshold values from 0 to 255
+
+        Returns:
+            The sizes as an array, or None if the frame is too small to
+            have pixels left once its 5 pixel border is cut off
+        """
+        frame = frame[5:-5, 5:-5]
+        nb_pixels = frame.shape[0] * frame.shape[1]
+        if nb_pixels == 0:
+            return None
+        # Binarization turns black the pixels at or below the threshold
+        histogram = np.bincount(frame.ravel(), minlength=256)
+        nb_blacks = np.cumsum(histogram)[thresholds]
+        return nb_blacks / nb_pixels
+
     @staticmethod
     def find_best_threshold(eye_frame):
         """Calculates the optimal threshold to binarize the
         frame for the given eye.
 
+        The frame is filtered once and the iris size at every threshold
+        is read from its histogram, instead of binarizing it once per
+        threshold.
+
         Argument:
             eye_frame (numpy.ndarray): Frame of the eye to be analyzed
+
+        Returns:
+            The threshold, or None if the frame is too small to be analyzed
         """
         average_iris_size = 0.48
-        trials = {}
-
-        for threshold in range(5, 100, 5):
-            iris_frame = Pupil.image_processing(eye_frame, threshold)
-            trials[threshold] = Calibration.iris_size(iris_frame)
+        thresholds = np.arange(5, 100, 5)
 
-        best_threshold, iris_size = min(trials.items(), key=(lambda p: abs(p[1] - average_iris_size)))
-        return best_threshold
+        sizes = Calibration.iris_sizes(Pupil.filter_frame(eye_frame), thresholds)
+        if sizes is None:
+            return None
+        # argmin keeps the first of equal distances, the lowest threshold, as min did
+        best_threshold = thresholds[np.argmin(np.abs(sizes - average_iris_size))]
+        return int(best_threshold)
 
     def evaluate(self, eye_frame, side):
         """Improves calibration by taking into consideration the
-        given image.
+        given image. Frames too small to be analyzed are skipped.
 
         Arguments:
             eye_frame (numpy.ndarray): Frame of the eye
@@ -71,7 +251,6 @@ class Calibration(object):
         """
         threshold = self.find_best_threshold(eye_frame)
 
-        if side == 0:
-            self.thresholds_left.append(threshold)
-        elif side == 1:
-            self.thresholds_right.append(threshold)
+        if threshold is not None and side in (0, 1):
+            self._thresholds[side].add(threshold)
+            self._unsaved += 1
@@ -0,0 +1,228 @@
+from collections import namedtuple
+import threading
+import time
+import numpy as np
+import cv2
+from .pipeline import TimingHistogram
+
+# A frame of the ring: a view of its buffer, the capture time (time.monotonic) and its sequence number
+CapturedFrame = namedtuple('CapturedFrame', ['frame', 'timestamp', 'sequence'])
+
+
+class CameraSource(object):
+    """Frames of a camera, read with cv2.VideoCapture"""
+
+    def __init__(self, index=0):
+        self.capture = cv2.VideoCapture(index)
+        if not self.capture.isOpened():
+            raise IOError(f"Could not open camera {index}")
+        ret, frame = self.capture.read()
+        if not ret:
+            raise IOError(f"Could not read from camera {index}")
+        self.shape = frame.shape
+
+    def read(self, out):
+        """Reads the next frame into out.
+
+        Returns:
+            The capture time of the frame on the time.monotonic clock, or None if there are no more frames
+        """
+        ret, frame = self.capture.read(out)
+        if not ret:
+            return None
+        if frame is not out:
+            # OpenCV allocates a new image if the camera changed its resolution
+            out[...] = cv2.resize(frame, (out.shape[1], out.shape[0]))
+        return time.monotonic()
+
+    def release(self):
+        self.capture.release()
+
+
+class VideoSource(CameraSource):
+    """Frames of a video file, paced at its frame rate like a camera unless realtime is False"""
+
+    def __init__(self, path, realtime=True):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Could not open video {path}")
+        self.shape = (int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+        self.interval = 1.0 / (self.capture.get(cv2.CAP_PROP_FPS) or 30) if realtime else 0
+        self._next = None
+
+    def read(self, out):
+        if self.interval:
+            now = time.monotonic()
+            self._next = now if self._next is None else max(self._next + self.interval, now - self.interval)
+            time.sleep(max(0, self._next - now))
+        return super().read(out)
+
+
+class SyntheticSource(object):
+    """
+    Generated frames at a fixed rate: a textured background with a moving
+    bright disc. Like a camera driver, it keeps up to `buffered` frames that
+    were captured but not read yet, so a slow reader gets stale frames.
+    """
+
+    def __init__(self, width=640, height=480, fps=30, frames=None, buffered=4, seed=0):
+        """
+        Arguments:
+            width (int): Frame width
+            height (int): Frame height
+            fps (float): Frames per second, or None to generate frames as fast as they are read
+            frames (int): Number of frames before the source ends, unlimited by default
+            buffered (int): Frames the source keeps while the reader is behind
+            seed (int): Seed of the background texture
+        """
+        self.shape = (height, width, 3)
+        self.interval = 1.0 / fps if fps else 0
+        self.frames = frames
+        self.buffered = buffered
+        self.background = np.random.default_rng(seed).integers(60, 120, self.shape, np.uint8)
+        self.count = 0
+        self._start = None
+
+    def read(self, out):
+        if self.frames is not None and self.count >= self.frames:
+            return None
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        if self.interval:
+            # Frame captured last, skipping those pushed out of the buffer
+            index = max(self.count, int((now - self._start) / self.interval) - self.buffered + 1)
+            captured = self._start + index * self.interval
+            time.sleep(max(0, captured - now))
+        else:
+            index, captured = self.count, now
+        self.count = index + 1
+        np.copyto(out, self.background)
+        height, width = self.shape[:2]
+        x = int(width / 2 + width / 3 * np.sin(index / 20))
+        cv2.circle(out, (x, height // 2), height // 8, (255, 255, 255), -1)
+        return captured
+
+    def release(self):
+        pass
+
+
+def open_source(spec):
+    """Frame source named by spec: a camera index, 'synthetic', or the path of a video file"""
+    if str(spec).isdigit():
+        return CameraSource(int(spec))
+    if spec == 'synthetic':
+        return SyntheticSource()
+    return VideoSource(spec)
+
+
+class FrameRing(object):
+    """
+    Preallocated frame buffers filled by one capture thread and read by one
+    consumer. The consumer gets a view of the newest frame, which stays
+    untouched until it is released, so frames are never copied between the
+    threads. Frames overwritten before being read are counted as skipped.
+    """
+
+    def __init__(self, shape, size=4, dtype=np.uint8):
+        """
+        Arguments:
+            shape (tuple): Shape of a frame
+            size (int): Number of buffers, at least 3: the newest frame, the one being read and the one being written
+        """
+        if size < 3:
+            raise ValueError("A frame ring needs at least 3 buffers")
+        self.buffers = np.empty((size,) + tuple(shape), dtype)
+        self.timestamps = np.zeros(size)
+        self.sequences = np.zeros(size, np.int64)
+        self.written = 0
+        self.skipped = 0
+        self.closed = False
+        self._latest = -1
+        self._pinned = -1
+        self._next = 0
+        self._last_read = 0
+        self._condition = threading.Condition()
+
+    def writable(self):
+        """Buffer to write the next frame into, then call publish()"""
+        with self._condition:
+            slot = self._next
+            while slot == self._latest or slot == self._pinned:
+                slot = (slot + 1) % len(self.buffers)
+            self._next = slot
+        return self.buffers[slot]
+
+    def publish(self, timestamp):
+        """Makes the frame written to the writable() buffer the newest one"""
+        with self._condition:
+            slot = self._next
+            self.written += 1
+            self.timestamps[slot] = timestamp
+            self.sequences[slot] = self.written
+            self._latest = slot
+            self._next = (slot + 1) % len(self.buffers)
+            self._condition.notify_all()
+
+    def close(self):
+        """Tells the consumer that no more frames will come"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def latest(self, timeout=None):
+        """Waits for a frame newer than the last one read and returns it.
+
+        The frame is a view of its buffer and stays valid until release() or
+        the next call.
+
+        Returns:
+            A CapturedFrame, or None on timeout or once the ring is closed and fully read
+        """
+        with self._condition:
+            fresh = lambda: self._latest >= 0 and self.sequences[self._latest] > self._last_read
+            if not self._condition.wait_for(lambda: fresh() or self.closed, timeout) or not fresh():
+                return None
+            slot = self._latest
+            self._pinned = slot
+            sequence = int(self.sequences[slot])
+            self.skipped += sequence - self._last_read - 1
+            self._last_read = sequence
+            return CapturedFrame(self.buffers[slot], float(self.timestamps[slot]), sequence)
+
+    def release(self):
+        """Lets the capture thread reuse the buffer of the frame returned by latest()"""
+        with self._condition:
+            self._pinned = -1
+
+
+class FrameCapture(object):
+    """Reads a frame source into a FrameRing in a background thread"""
+
+    def __init__(self, source, ring_size=4):
+        self.source = source
+        self.ring = FrameRing(source.shape, ring_size)
+        self.timings = TimingHistogram()  # Time spent reading each frame
+        self._running = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._running.set()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        try:
+            while self._running.is_set():
+                start = time.perf_counter()
+                timestamp = self.source.read(self.ring.writable())
+                if timestamp is None:
+                    break
+                self.timings.add(time.perf_counter() - start)
+                self.ring.publish(timestamp)
+        finally:
+            self.ring.close()
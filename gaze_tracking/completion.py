@@ -0,0 +1,340 @@
+from bisect import bisect_left, insort
+from heapq import merge, nsmallest
+import numpy as np
+
+
+def encode_words(words):
+    """Returns the words as a numpy byte-string array, keeping their order."""
+    return np.array([word.encode() for word in words], dtype=bytes)
+
+
+def deletes(word, max_distance, min_length=1):
+    """Returns the word and every string obtained by deleting up to max_distance
+    of its characters, keeping only strings of at least min_length characters."""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > min_length for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def prefix_distance(query, word, max_distance):
+    """Returns the smallest edit distance between the query and a prefix of the
+    word, or None if it is larger than max_distance."""
+    word = word[:len(query) + max_distance]
+    previous = list(range(len(word) + 1))
+    for i, char in enumerate(query, 1):
+        current = [i]
+        left = i
+        for j, other in enumerate(word):
+            cost = previous[j] if char == other else previous[j] + 1
+            if previous[j + 1] < cost:
+                cost = previous[j + 1] + 1
+            if left < cost:
+                cost = left + 1
+            current.append(cost)
+            left = cost
+        if min(current) > max_distance:
+            return None
+        previous = current
+    distance = min(previous)
+    return distance if distance <= max_distance else None
+
+
+def _prefix_end(prefix):
+    """Returns the smallest byte string greater than every string starting with the prefix."""
+    return prefix + b'\xff'
+
+
+class WordSet(object):
+    """
+    Read-only sorted word array, usually memory-mapped from a snapshot,
+    plus a small sorted overlay for words added at runtime.
+    Supports the subset of the set API used by the word predictor.
+    """
+
+    def __init__(self, sorted_words):
+        """
+        Args:
+            sorted_words (numpy.ndarray): Sorted byte-string array of words
+        """
+        self.words = sorted_words
+        self._added = []
+
+    @classmethod
+    def from_words(cls, words):
+        return cls(encode_words(sorted(set(words))))
+
+    def _find(self, word):
+        key = word.encode()
+        i = np.searchsorted(self.words, key)
+        return i < len(self.words) and self.words[i] == key
+
+    def __contains__(self, word):
+        if not isinstance(word, str):
+            return False
+        if self._find(word):
+            return True
+        added = self._added
+        i = bisect_left(added, word)
+        return i < len(added) and added[i] == word
+
+    def __len__(self):
+        return len(self.words) + len(self._added)
+
+    def __iter__(self):
+        return merge((word.decode() for word in self.words), self._added)
+
+    def add(self, word):
+        self.update([word])
+
+    def update(self, words):
+        # Replaced on update, see WordPredictor._setup
+        new_words = {word for word in words if word not in self}
+        if new_words:
+            self._added = sorted(new_words.union(self._added))
+
+    def iter_prefix(self, prefix):
+        """Yields the words starting with the prefix in sorted order."""
+        key = prefix.encode()
+        start, end = np.searchsorted(self.words, [key, _prefix_end(key)])
+        base = (word.decode() for word in self.words[start:end])
+
+        added = self._added
+        i = j = bisect_left(added, prefix)
+        while j < len(added) and added[j].startswith(prefix):
+            j += 1
+        return merge(base, added[i:j])
+
+
+class CompletionIndex(object):
+    """
+    Prefix index used by the word predictor to answer completion queries
+    without scanning the dictionaries.
+
+    Ranked words (most frequent first) are stored in a flattened prefix trie
+    where each prefix node keeps its top-k completions in rank order. The
+    full vocabulary is kept as a sorted array and searched with bisect.
+    All tables are plain arrays so the index can be stored in a snapshot.
+    Words committed by the user are kept in a small sorted overlay that is
+    updated in place of a rebuild.
+    """
+
+    def __init__(self, ranked_words, vocabulary, prefix_keys, prefix_offsets, prefix_entries):
+        """
+        Args:
+            ranked_words (list): Words ordered by decreasing frequency
+            vocabulary (WordSet): Every known word
+            prefix_keys (numpy.ndarray): Sorted byte-string array of prefix nodes
+            prefix_offsets (numpy.ndarray): Start of each node's entries, plus the end
+            prefix_entries (numpy.ndarray): Ranks of the completions of each node
+        """
+        self.ranked_words = ranked_words
+        self.vocabulary = vocabulary
+        self.prefix_keys = prefix_keys
+        self.prefix_offsets = prefix_offsets
+        self.prefix_entries = prefix_entries
+        self._personal = []
+
+    @classmethod
+    def build(cls, ranked_words, vocabulary, k=11):
+        """Builds the index.
+
+        Args:
+            ranked_words: Words ordered by decreasing frequency
+            vocabulary: Every known word
+            k: Number of ranked completions kept per prefix node
+        """
+        ranked_words = list(ranked_words)
+        nodes = {}
+        for rank, word in enumerate(ranked_words):
+            for i in range(1, len(word) + 1):
+                node = nodes.setdefault(word[:i], [])
+                if len(node) < k:
+                    node.append(rank)
+
+        keys = sorted(nodes)
+        offsets = np.zeros(len(keys) + 1, np.int32)
+        offsets[1:] = np.cumsum([len(nodes[key]) for key in keys])
+        entries = np.array([rank for key in keys for rank in nodes[key]], np.int32)
+
+        if not isinstance(vocabulary, WordSet):
+            vocabulary = WordSet.from_words(vocabulary)
+        return cls(ranked_words, vocabulary, encode_words(keys), offsets, entries)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuilds an index from the arrays returned by to_arrays."""
+        ranked_words = [word.decode() for word in arrays['ranked_words']]
+        return cls(ranked_words, WordSet(arrays['vocabulary']), arrays['prefix_keys'],
+                   arrays['prefix_offsets'], arrays['prefix_entries'])
+
+    def to_arrays(self):
+        """Returns the index tables, including runtime additions, as named arrays."""
+        return {
+            'ranked_words': encode_words(self.ranked_words),
+            'vocabulary': encode_words(self.vocabulary),
+            'prefix_keys': self.prefix_keys,
+            'prefix_offsets': self.prefix_offsets,
+            'prefix_entries': self.prefix_entries,
+        }
+
+    def ranked(self, prefix):
+        """Returns up to k ranked words starting with the prefix, most frequent first."""
+        key = prefix.encode()
+        i = np.searchsorted(self.prefix_keys, key)
+        if i == len(self.prefix_keys) or self.prefix_keys[i] != key:
+            return []
+        ranks = self.prefix_entries[self.prefix_offsets[i]:self.prefix_offsets[i + 1]]
+        return [self.ranked_words[rank] for rank in ranks]
+
+    def add_personal(self, word):
+        """Adds a word committed by the user, offered among the completions of its prefixes."""
+        self.vocabulary.add(word)
+        personal = self._personal
+        i = bisect_left(personal, word)
+        if i == len(personal) or personal[i] != word:
+            # Replaced on update, see WordPredictor._setup
+            personal = list(personal)
+            insort(personal, word)
+            self._personal = personal
+
+    def personal(self, prefix):
+        """Returns the personal words starting with the prefix in sorted order."""
+        personal = self._personal
+        i = j = bisect_left(personal, prefix)
+        while j < len(personal) and personal[j].startswith(prefix):
+            j += 1
+        return personal[i:j]
+
+    def complete(self, prefix, n, frequency):
+        """
+        Returns up to n completions of the prefix, excluding the prefix itself.
+        Personal words are ranked with the ranked words by frequency, ties
+        keeping the ranked words first, and the sorted vocabulary fills the
+        remainder.
+
+        Args:
+            prefix: Partial word
+            n: Number of completions
+            frequency: Function giving the count of a word, corpus and personal counts included
+        """
+        candidates = self.ranked(prefix)
+        personal = self.personal(prefix)
+        if personal:
+            # Sorting is stable, so equal counts keep the ranked words first
+            candidates = sorted(dict.fromkeys(candidates + personal), key=frequency, reverse=True)
+        completions = [word for word in candidates if word != prefix][:n]
+        seen = set(completions)
+        seen.add(prefix)
+        if len(completions) < n:
+            for word in self.vocabulary.iter_prefix(prefix):
+                if word not in seen:
+                    seen.add(word)
+                    completions.append(word)
+                    if len(completions) >= n:
+                        break
+        return completions
+
+
+class FuzzyIndex(object):
+    """
+    Typo-tolerant prefix index over the ranked words, using symmetric-delete
+    candidate generation.
+
+    Every prefix of a word, up to PREFIX_LENGTH characters, is stored under
+    each string obtained by deleting up to MAX_DISTANCE of its characters.
+    A query looks up its own deletes, which finds every word with a prefix
+    within that many insertions, deletions or substitutions without scanning
+    the words. Candidates are then checked with a bounded edit distance.
+    """
+
+    MAX_DISTANCE = 2
+    PREFIX_LENGTH = 7
+    # Shorter delete strings would match most of the vocabulary
+    MIN_KEY_LENGTH = 2
+
+    def __init__(self, ranked_words, delete_keys, delete_offsets, delete_entries):
+        """
+        Args:
+            ranked_words (list): Words ordered by decreasing frequency
+            delete_keys (numpy.ndarray): Sorted byte-string array of delete strings
+            delete_offsets (numpy.ndarray): Start of each key's entries, plus the end
+            delete_entries (numpy.ndarray): Ranks of the words each key leads to
+        """
+        self.ranked_words = ranked_words
+        self.delete_keys = delete_keys
+        self.delete_offsets = delete_offsets
+        self.delete_entries = delete_entries
+
+    @classmethod
+    def build(cls, ranked_words):
+        """Builds the index.
+
+        Args:
+            ranked_words: Words ordered by decreasing frequency
+        """
+        ranked_words = list(ranked_words)
+        entries = {}
+        for rank, word in enumerate(ranked_words):
+            keys = set()
+            for length in range(cls.MIN_KEY_LENGTH, min(len(word), cls.PREFIX_LENGTH) + 1):
+                keys |= deletes(word[:length], cls.MAX_DISTANCE, cls.MIN_KEY_LENGTH)
+            for key in keys:
+                entries.setdefault(key, []).append(rank)
+
+        keys = sorted(entries)
+        offsets = np.zeros(len(keys) + 1, np.int32)
+        offsets[1:] = np.cumsum([len(entries[key]) for key in keys])
+        ranks = np.array([rank for key in keys for rank in entries[key]], np.int32)
+        return cls(ranked_words, encode_words(keys), offsets, ranks)
+
+    @classmethod
+    def from_arrays(cls, ranked_words, arrays):
+        """Rebuilds an index from the arrays returned by to_arrays."""
+        return cls(ranked_words, arrays['fuzzy_keys'], arrays['fuzzy_offsets'], arrays['fuzzy_entries'])
+
+    def to_arrays(self):
+        """Returns the index tables as named arrays, without the ranked words."""
+        return {
+            'fuzzy_keys': self.delete_keys,
+            'fuzzy_offsets': self.delete_offsets,
+            'fuzzy_entries': self.delete_entries,
+        }
+
+    @classmethod
+    def allowed_distance(cls, length):
+        """Returns the number of typos tolerated in a query of the given length."""
+        return 1 if length <= 4 else cls.MAX_DISTANCE
+
+    def lookup(self, query, n):
+        """
+        Returns up to n words starting with a prefix close to the query,
+        closest first, then most frequent first.
+        """
+        if len(query) < self.MIN_KEY_LENGTH or not len(self.delete_keys):
+            return []
+        distance = self.allowed_distance(len(query))
+        keys = encode_words(sorted(deletes(query[:self.PREFIX_LENGTH], distance, self.MIN_KEY_LENGTH)))
+        found = np.searchsorted(self.delete_keys, keys)
+        np.minimum(found, len(self.delete_keys) - 1, out=found)
+
+        ranks = set()
+        for i in found[self.delete_keys[found] == keys].tolist():
+            ranks.update(self.delete_entries[self.delete_offsets[i]:self.delete_offsets[i + 1]].tolist())
+
+        # Candidates are checked most frequent first, so once n of them have the
+        # lowest possible distance no later candidate can rank above them
+        lowest = 0 if any(self.ranked_words[rank].startswith(query) for rank in ranks) else 1
+        matches = []
+        closest = 0
+        for rank in sorted(ranks):
+            word_distance = prefix_distance(query, self.ranked_words[rank], distance)
+            if word_distance is not None:
+                matches.append((word_distance, rank))
+                if word_distance <= lowest:
+                    closest += 1
+                    if closest == n:
+                        break
+        return [self.ranked_words[rank] for _, rank in nsmallest(n, matches)]
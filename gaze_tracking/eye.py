@@ -1,7 +1,30 @@
 import math
 import numpy as np
 import cv2
-from .pupil import Pupil
+from .pupil import Pupil, PupilBuffers
+
+
+class EyeBuffers(object):
+    """
+    Scratch memory reused from frame to frame by the eyes of one side: the
+    isolated eye patch and its polygon mask, and in pupil the buffers of the
+    pupil detection. The arrays handed out are views of flat buffers, so
+    they are contiguous, and they are only reallocated when an eye patch is
+    larger than any before.
+    """
+
+    def __init__(self):
+        self._patch = np.empty(0, np.uint8)
+        self._mask = np.empty(0, np.uint8)
+        self.pupil = PupilBuffers()
+
+    def get(self, height, width):
+        """Returns the (height, width) patch and mask arrays, overwriting those of the previous frame"""
+        size = height * width
+        if size > self._patch.size:
+            self._patch = np.empty(size, np.uint8)
+            self._mask = np.empty(size, np.uint8)
+        return self._patch[:size].reshape(height, width), self._mask[:size].reshape(height, width)
 
 
 class Eye(object):
@@ -13,14 +36,14 @@ class Eye(object):
     LEFT_EYE_POINTS = [36, 37, 38, 39, 40, 41]
     RIGHT_EYE_POINTS = [42, 43, 44, 45, 46, 47]
 
-    def __init__(self, original_frame, landmarks, side, calibration):
+    def __init__(self, original_frame, landmarks, side, calibration, buffers=None, subpixel=False):
         self.frame = None
         self.origin = None
         self.center = None
         self.pupil = None
         self.landmark_points = None
 
-        self._analyze(original_frame, landmarks, side, calibration)
+        self._analyze(original_frame, landmarks, side, calibration, buffers, subpixel)
 
     @staticmethod
     def _middle_point(p1, p2):
@@ -34,33 +57,42 @@ class Eye(object):
         y = int((p1.y + p2.y) / 2)
         return (x, y)
 
-    def _isolate(self, frame, landmarks, points):
+    def _isolate(self, frame, landmarks, points, buffers=None):
         """Isolate an eye, to have a frame without other part of the face.
 
+        Only the box around the eye is read from the frame, so the cost does not
+        depend on the camera resolution. Pixels of the box outside the eye are
+        white. The box is clamped to the frame when the eye is near its border.
+
         Arguments:
             frame (numpy.ndarray): Frame containing the face
             landmarks (dlib.full_object_detection): Facial landmarks for the face region
             points (list): Points of an eye (from the 68 Multi-PIE landmarks)
+            buffers (EyeBuffers): Scratch memory to isolate the eye in, a new patch is allocated without it
         """
         region = np.array([(landmarks.part(point).x, landmarks.part(point).y) for point in points])
         region = region.astype(np.int32)
         self.landmark_points = region
 
-        # Applying a mask to get only the eye
-        height, width = frame.shape[:2]
-        black_frame = np.zeros((height, width), np.uint8)
-        mask = np.full((height, width), 255, np.uint8)
-        cv2.fillPoly(mask, [region], (0, 0, 0))
-        eye = cv2.bitwise_not(black_frame, frame.copy(), mask=mask)
-
         # Cropping on the eye
         margin = 5
-        min_x = np.min(region[:, 0]) - margin
-        max_x = np.max(region[:, 0]) + margin
-        min_y = np.min(region[:, 1]) - margin
-        max_y = np.max(region[:, 1]) + margin
-
-        self.frame = eye[min_y:max_y, min_x:max_x]
+        height, width = frame.shape[:2]
+        min_x = max(int(np.min(region[:, 0])) - margin, 0)
+        max_x = min(int(np.max(region[:, 0])) + margin, width)
+        min_y = max(int(np.min(region[:, 1])) - margin, 0)
+        max_y = min(int(np.max(region[:, 1])) + margin, height)
+        patch_height, patch_width = max(max_y - min_y, 0), max(max_x - min_x, 0)
+
+        # Applying a mask, in the coordinates of the box, to get only the eye
+        if buffers is None:
+            buffers = EyeBuffers()
+        eye, mask = buffers.get(patch_height, patch_width)
+        eye[:] = 255
+        mask[:] = 0
+        cv2.fillPoly(mask, [region - (min_x, min_y)], 255)
+        cv2.copyTo(frame[min_y:max_y, min_x:max_x], mask, eye)
+
+        self.frame = eye
         self.origin = (min_x, min_y)
 
         height, width = self.frame.shape[:2]
@@ -92,7 +124,7 @@ class Eye(object):
 
         return ratio
 
-    def _analyze(self, original_frame, landmarks, side, calibration):
+    def _analyze(self, original_frame, landmarks, side, calibration, buffers=None, subpixel=False):
         """Detects and isolates the eye in a new frame, sends data to the calibration
         and initializes Pupil object.
 
@@ -101,6 +133,8 @@ class Eye(object):
             landmarks (dlib.full_object_detection): Facial landmarks for the face region
             side: Indicates whether it's the left eye (0) or the right eye (1)
             calibration (calibration.Calibration): Manages the binarization threshold value
+            buffers (EyeBuffers): Scratch memory of this side, reused from frame to frame
+            subpixel (bool): Locates the pupil to a fraction of a pixel
         """
         if side == 0:
             points = self.LEFT_EYE_POINTS
@@ -110,10 +144,12 @@ class Eye(object):
             return
 
         self.blinking = self._blinking_ratio(landmarks, points)
-        self._isolate(original_frame, landmarks, points)
+        self._isolate(original_frame, landmarks, points, buffers)
+        if self.frame.size == 0:
+            # The eye is outside the frame, there is no pupil to look for
+            return
 
-        if not calibration.is_complete():
-            calibration.evaluate(self.frame, side)
+        calibration.update(self.frame, side)
 
         threshold = calibration.threshold(side)
-        self.pupil = Pupil(self.frame, threshold)
+        self.pupil = Pupil(self.frame, threshold, buffers.pupil if buffers is not None else None, subpixel)
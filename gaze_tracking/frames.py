@@ -0,0 +1,85 @@
+import base64
+import numpy as np
+import cv2
+
+# Bytes per pixel of the raw frame formats
+RAW_FORMATS = {'rgb': 3, 'bgr': 3, 'nv12': 1.5}
+
+# Frame formats implied by the content type of a request body
+_MIMETYPE_FORMATS = {'image/jpeg': 'jpeg', 'image/png': 'png', 'image/webp': 'webp'}
+
+
+def decode_frame(data, frame_format='jpeg', width=None, height=None):
+    """Decodes an encoded image or raw pixels into an RGB frame.
+
+    The data is wrapped in a memoryview and read in place, so raw RGB frames
+    are returned without any copy and other formats only pay for the decode.
+
+    Arguments:
+        data: Bytes-like object holding the frame
+        frame_format (str): 'rgb', 'bgr', 'nv12', or an image format such as
+            'jpeg' that OpenCV can decode
+        width (int): Frame width, required for raw formats
+        height (int): Frame height, required for raw formats
+
+    Returns:
+        A read-only RGB frame, or None if the image could not be decoded
+    """
+    buffer = np.frombuffer(memoryview(data), np.uint8)
+    if frame_format not in RAW_FORMATS:
+        frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        return None if frame is None else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    if not width or not height:
+        raise ValueError(f"Width and height are required for {frame_format} frames")
+    expected = int(width * height * RAW_FORMATS[frame_format])
+    if len(buffer) != expected:
+        raise ValueError(f"Expected {expected} bytes for a {width}x{height} {frame_format} frame, got {len(buffer)}")
+
+    if frame_format == 'nv12':
+        return cv2.cvtColor(buffer.reshape(height * 3 // 2, width), cv2.COLOR_YUV2RGB_NV12)
+    frame = buffer.reshape(height, width, 3)
+    return frame if frame_format == 'rgb' else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def decode_data_url(image_data):
+    """Decodes a base64 image, optionally given as a data URL, into an RGB frame."""
+    if image_data.startswith('data:'):
+        image_data = image_data.partition(',')[2]
+    return decode_frame(base64.b64decode(image_data))
+
+
+def frame_from_request(request):
+    """Reads the frame sent to the frame processing endpoint as an RGB frame.
+
+    JSON bodies hold a base64 data URL in 'image'. Any other body is the frame
+    itself, or a multipart form with the frame in its 'frame' part. Binary
+    frames are described by the X-Frame-Format, X-Frame-Width and
+    X-Frame-Height headers, or by form fields named format, width and height.
+    Without a format, the content type is used and JPEG is assumed.
+
+    Arguments:
+        request (flask.Request): The incoming request
+
+    Returns:
+        A read-only RGB frame, or None if the image could not be decoded
+    """
+    if request.is_json:
+        return decode_data_url(request.get_json()['image'])
+
+    if request.mimetype == 'multipart/form-data':
+        fields = request.form
+        part = request.files['frame']
+        data = part.stream.getbuffer() if hasattr(part.stream, 'getbuffer') else part.read()
+        mimetype = part.mimetype
+    else:
+        fields = {}
+        data = request.get_data(cache=False)
+        mimetype = request.mimetype
+
+    def parameter(name):
+        return request.headers.get(f'X-Frame-{name.title()}') or fields.get(name)
+
+    frame_format = (parameter('format') or _MIMETYPE_FORMATS.get(mimetype, 'jpeg')).lower()
+    width, height = parameter('width'), parameter('height')
+    return decode_frame(data, frame_format, width and int(width), height and int(height))
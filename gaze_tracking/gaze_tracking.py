@@ -1,8 +1,6 @@
 from __future__ import division
-import os
 import cv2
-import dlib
-from .eye import Eye
+from .backends import DlibDetector
 from .calibration import Calibration
 
 
@@ -13,19 +11,23 @@ class GazeTracking(object):
     and pupils and allows to know if the eyes are open or closed
     """
 
-    def __init__(self):
+    def __init__(self, profile_path=None, subpixel=False):
+        """
+        Arguments:
+            profile_path (str): Calibration profile of the user and camera,
+                see calibration.profile_path, or None to calibrate from
+                scratch and keep the calibration in memory only
+            subpixel (bool): Locates the pupils to a fraction of a pixel, so
+                their coordinates are floats
+        """
         self.frame = None
         self.eye_left = None
         self.eye_right = None
-        self.calibration = Calibration()
-
-        # _face_detector is used to detect faces
-        self._face_detector = dlib.get_frontal_face_detector()
+        self.calibration = Calibration(profile_path=profile_path)
+        self.subpixel = subpixel
 
-        # _predictor is used to get facial landmarks of a given face
-        cwd = os.path.abspath(os.path.dirname(__file__))
-        model_path = os.path.abspath(os.path.join(cwd, "trained_models/shape_predictor_68_face_landmarks.dat"))
-        self._predictor = dlib.shape_predictor(model_path)
+        # _detector finds the face and its 68 landmarks, and isolates the eyes
+        self._detector = DlibDetector(calibration=self.calibration, subpixel=subpixel)
 
     @property
     def pupils_located(self):
@@ -42,16 +44,8 @@ class GazeTracking(object):
     def _analyze(self):
         """Detects the face and initialize Eye objects"""
         frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
-        faces = self._face_detector(frame)
-
-        try:
-            landmarks = self._predictor(frame, faces[0])
-            self.eye_left = Eye(frame, landmarks, 0, self.calibration)
-            self.eye_right = Eye(frame, landmarks, 1, self.calibration)
-
-        except IndexError:
-            self.eye_left = None
-            self.eye_right = None
+        self._detector.analyze(frame)
+        self.eye_left, self.eye_right = self._detector.eyes
 
     def refresh(self, frame):
         """Refreshes the frame and analyzes it.
@@ -123,8 +117,8 @@ class GazeTracking(object):
 
         if self.pupils_located:
             color = (0, 255, 0)
-            x_left, y_left = self.pupil_left_coords()
-            x_right, y_right = self.pupil_right_coords()
+            x_left, y_left = (int(round(c)) for c in self.pupil_left_coords())
+            x_right, y_right = (int(round(c)) for c in self.pupil_right_coords())
             cv2.line(frame, (x_left - 5, y_left), (x_left + 5, y_left), color)
             cv2.line(frame, (x_left, y_left - 5), (x_left, y_left + 5), color)
             cv2.line(frame, (x_right - 5, y_right), (x_right + 5, y_right), color)
@@ -0,0 +1,223 @@
+from collections import OrderedDict
+from multiprocessing import shared_memory
+import multiprocessing
+import atexit
+import math
+import os
+import threading
+import zlib
+import numpy as np
+import cv2
+from .backends import FaceMeshDetector
+from .roi import RoiTracker
+
+# Largest frame handed to the workers, as (height, width, channels); larger ones are downscaled
+MAX_FRAME_SHAPE = (1080, 1920, 3)
+# Most landmarks returned by a backend: the face mesh with refined irises
+MAX_LANDMARKS = 478
+# Sessions whose detector a worker keeps at most
+MAX_SESSIONS = 16
+
+
+def _serve(connection, shm_name, frame_bytes, detector_factory, track_roi, max_sessions):
+    """Worker loop: detects landmarks in the frames written to the shared memory block"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    landmarks = np.ndarray((MAX_LANDMARKS, 3), np.float32, buffer=shm.buf, offset=frame_bytes)
+    # One detector per session, as the face mesh tracks the face from one frame to the next
+    detectors = OrderedDict()
+    try:
+        while True:
+            request = connection.recv()
+            if request is None:
+                break
+            shape, key = request
+            frame = np.ndarray(shape, np.uint8, buffer=shm.buf)
+            try:
+                detector = detectors.get(key)
+                if detector is None:
+                    detector = detector_factory()
+                    if track_roi:
+                        detector = RoiTracker(detector, max_sessions=1)
+                    detectors[key] = detector
+                    while len(detectors) > max_sessions:
+                        detectors.popitem(last=False)
+                else:
+                    detectors.move_to_end(key)
+                found = detector.process(frame, key) if track_roi else detector.process(frame)
+            except Exception as e:
+                connection.send((0, str(e)))
+                continue
+            finally:
+                del frame
+            count = 0
+            if found is not None:
+                count = min(len(found), MAX_LANDMARKS)
+                landmarks[:count] = found[:count]
+            connection.send((count, None))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        # Views into the block must be released before it can be closed
+        del landmarks
+        shm.close()
+
+
+class InferenceWorker(object):
+    """
+    A process owning its own detector. Frames are written to a shared memory
+    block and only their shape goes through the pipe; the landmarks come
+    back through the same block.
+    """
+
+    def __init__(self, detector_factory, context, max_frame_shape=MAX_FRAME_SHAPE, track_roi=False,
+                 max_sessions=MAX_SESSIONS):
+        self.detector_factory = detector_factory
+        self.context = context
+        self.track_roi = track_roi
+        self.max_sessions = max_sessions
+        self.frame_bytes = int(np.prod(max_frame_shape))
+        # One frame in flight per worker, as the block holds a single frame
+        self.lock = threading.Lock()
+        self.process = None
+        self.connection = None
+        self.shm = None
+
+    def start(self):
+        self.shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes + MAX_LANDMARKS * 3 * 4)
+        self.connection, child = self.context.Pipe()
+        self.process = self.context.Process(target=_serve, daemon=True,
+                                            args=(child, self.shm.name, self.frame_bytes, self.detector_factory,
+                                                  self.track_roi, self.max_sessions))
+        self.process.start()
+        child.close()
+
+    def fit_shape(self, shape):
+        """The shape of a frame downscaled, keeping its aspect ratio, to fit in the block"""
+        size = int(np.prod(shape))
+        if size <= self.frame_bytes:
+            return tuple(shape)
+        scale = math.sqrt(self.frame_bytes / size)
+        height, width = shape[:2]
+        return (max(1, int(height * scale)), max(1, int(width * scale))) + tuple(shape[2:])
+
+    def detect(self, frame, flip=False, key=None):
+        """Returns the landmarks of a frame, see InferencePool.detect"""
+        if frame.dtype != np.uint8:
+            raise ValueError(f"Frames must be uint8, got {frame.dtype}")
+        shape = self.fit_shape(frame.shape)
+        with self.lock:
+            view = np.ndarray(shape, np.uint8, buffer=self.shm.buf)
+            if shape != frame.shape:
+                # The landmarks are normalized, so they hold for the full size frame
+                cv2.resize(frame, (shape[1], shape[0]), dst=view, interpolation=cv2.INTER_AREA)
+                if flip:
+                    cv2.flip(view, 1, dst=view)
+            elif flip:
+                cv2.flip(frame, 1, dst=view)
+            else:
+                view[...] = frame
+            del view
+            try:
+                self.connection.send((shape, key))
+                count, error = self.connection.recv()
+            except (EOFError, OSError):
+                # The worker died, e.g. in native inference code; replace it for the next frames
+                self.close()
+                self.start()
+                raise RuntimeError("Inference worker exited")
+            if error:
+                raise RuntimeError(error)
+            if not count:
+                return None
+            return np.ndarray((count, 3), np.float32, buffer=self.shm.buf, offset=self.frame_bytes).copy()
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
+        self.shm.close()
+        self.shm.unlink()
+        self.process = self.connection = self.shm = None
+
+
+class InferencePool(object):
+    """
+    Worker processes running the face mesh, so frames of different clients
+    are processed in parallel on all cores. Each client token is always
+    served by the same worker, which keeps a detector for each of its
+    recent tokens so the tracking state of the face mesh is never shared
+    between clients.
+    """
+
+    def __init__(self, workers=None, detector_factory=FaceMeshDetector, max_frame_shape=MAX_FRAME_SHAPE,
+                 start_method=None, track_roi=False, max_sessions=MAX_SESSIONS):
+        """
+        Arguments:
+            workers (int): Number of worker processes, one per core by default
+            detector_factory: Picklable callable creating the detector of a worker, an
+                object whose process(rgb) returns an (N, 3) landmark array or None
+            max_frame_shape (tuple): Largest (height, width, channels) frame handed to a
+                worker; frames with more pixels are downscaled to fit
+            start_method (str): multiprocessing start method, 'forkserver' where available.
+                Workers are started, and restarted when they die, from request threads,
+                and forking a process that has threads is unsafe
+            track_roi (bool): Run the detector on a crop around the face of the session's
+                previous frame (see RoiTracker) rather than on the full frame
+            max_sessions (int): Number of client tokens whose detector a worker keeps,
+                the least recently seen one being dropped beyond it
+        """
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(start_method)
+        if start_method == 'forkserver':
+            # Workers are forked from a server that imported numpy and cv2 once
+            context.set_forkserver_preload([__name__])
+        self.size = workers or os.cpu_count() or 1
+        self.workers = [InferenceWorker(detector_factory, context, max_frame_shape, track_roi, max_sessions)
+                        for _ in range(self.size)]
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Starts the workers. Called on first use otherwise, but starting them
+        before serving keeps the first frames from waiting for them."""
+        with self._start_lock:
+            if not self._started:
+                for worker in self.workers:
+                    worker.start()
+                self._started = True
+                atexit.register(self.close)
+        return self
+
+    def worker_for(self, token):
+        """The worker serving a client token, stable across restarts"""
+        return self.workers[zlib.crc32((token or "").encode()) % self.size]
+
+    def detect(self, frame, token=None, flip=False):
+        """Detects the face landmarks of a frame.
+
+        Arguments:
+            frame (numpy.ndarray): RGB frame
+            token (str): Client token, choosing the worker
+            flip (bool): Mirror the frame horizontally while handing it over
+
+        Returns:
+            The normalized (x, y, z) landmarks as an (N, 3) float32 array, or None without a face
+        """
+        if not self._started:
+            self.start()
+        return self.worker_for(token).detect(frame, flip, token)
+
+    def close(self):
+        with self._start_lock:
+            for worker in self.workers:
+                with worker.lock:
+                    worker.close()
+            self._started = False
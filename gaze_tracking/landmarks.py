@@ -0,0 +1,108 @@
+from collections import namedtuple
+import numpy as np
+
+# Where a landmark backend puts the points the eye features are computed from:
+# the six points of the eye aspect ratio of each eye, its two corners and its
+# iris center. ear_starts and ear_ends are the point pairs of the three eye
+# aspect ratio distances, (1, 5), (2, 4) and (0, 3) of each eye.
+LandmarkLayout = namedtuple('LandmarkLayout', ['ear', 'corners', 'irises', 'ear_starts', 'ear_ends'])
+
+
+def landmark_layout(ear, corners, irises):
+    """Returns the LandmarkLayout of the given points.
+
+    Arguments:
+        ear: Per eye, the six points of the eye aspect ratio: the two corners
+            at positions 0 and 3, the upper lid points at 1 and 2, the lower
+            ones at 5 and 4
+        corners: Per eye, its corners in the order of increasing x in the frame
+        irises: Per eye, its iris center
+    """
+    ear = np.array(ear)
+    return LandmarkLayout(ear, np.array(corners), np.array(irises), ear[:, [1, 2, 0]], ear[:, [5, 4, 3]])
+
+
+# Face mesh vertices of the eye aspect ratio, per eye: the two corners are at
+# positions 0 and 3, the upper lid points at 1 and 2, the lower ones at 5 and 4
+EAR_INDICES = np.array([[362, 385, 387, 263, 373, 380],
+                        [33, 160, 158, 133, 153, 144]])
+# Eye corners and iris centers used for the horizontal iris position, per eye
+CORNER_INDICES = np.array([[33, 133], [362, 263]])
+IRIS_INDICES = np.array([468, 473])
+MESH_LAYOUT = landmark_layout(EAR_INDICES, CORNER_INDICES, IRIS_INDICES)
+
+# The 68 points of the dlib shape predictor, with the pupils found in the eye
+# patches appended as points 68 and 69 (see backends.DlibDetector)
+DLIB_LAYOUT = landmark_layout([[42, 43, 44, 45, 46, 47], [36, 37, 38, 39, 40, 41]],
+                              [[36, 39], [42, 45]], [68, 69])
+
+
+def landmark_array(landmark_list):
+    """Converts MediaPipe landmarks to an (N, 3) float32 array of normalized (x, y, z)"""
+    return np.array([value for p in landmark_list.landmark for value in (p.x, p.y, p.z)], np.float32).reshape(-1, 3)
+
+
+def pixel_landmarks(landmarks, width, height):
+    """Scales normalized landmarks to pixel coordinates.
+
+    Coordinates keep their fractions of a pixel, e.g. the subpixel pupils of
+    DlibDetector; round them only to draw them.
+
+    Arguments:
+        landmarks (numpy.ndarray): (..., N, 2 or 3) normalized landmarks, of one frame or a stack of frames
+        width (int): Frame width
+        height (int): Frame height
+
+    Returns:
+        An (..., N, 2) float64 array of (x, y) pixel coordinates
+    """
+    return landmarks[..., :2] * np.array((width, height), np.float64)
+
+
+def eye_aspect_ratios(points, layout=MESH_LAYOUT):
+    """Eye aspect ratio of both eyes.
+
+    Arguments:
+        points (numpy.ndarray): (..., N, 2) pixel landmarks of one frame or a stack of frames
+        layout (LandmarkLayout): Points of the landmark backend
+
+    Returns:
+        An (..., 2) array of the ratios of the eyes at layout.ear
+    """
+    squares = (points[..., layout.ear_starts, :] - points[..., layout.ear_ends, :]).astype(np.float64)
+    squares *= squares
+    distances = np.sqrt(squares[..., 0] + squares[..., 1])
+    return (distances[..., 0] + distances[..., 1]) / (2.0 * distances[..., 2])
+
+
+def iris_ratios(points, layout=MESH_LAYOUT):
+    """Horizontal iris position of both eyes, 0 at the first corner and 1 at the second.
+
+    Arguments:
+        points (numpy.ndarray): (..., N, 2) pixel landmarks of one frame or a stack of frames
+        layout (LandmarkLayout): Points of the landmark backend
+
+    Returns:
+        An (..., 2) array of the positions of the irises at layout.irises
+    """
+    corners = points[..., layout.corners, 0].astype(np.float64)
+    irises = points[..., layout.irises, 0].astype(np.float64)
+    return (irises - corners[..., 0]) / (corners[..., 1] - corners[..., 0] + 1e-6)
+
+
+def eye_features(points, layout=MESH_LAYOUT):
+    """Mean eye aspect ratio and mean iris position over both eyes.
+
+    Accepts a stack of frames, e.g. the landmarks of a recorded session, to
+    evaluate all of them at once.
+
+    Arguments:
+        points (numpy.ndarray): (..., N, 2) pixel landmarks
+        layout (LandmarkLayout): Points of the landmark backend
+
+    Returns:
+        The ear and iris ratio, as floats for one frame or as (...) arrays for a stack
+    """
+    ears = eye_aspect_ratios(points, layout)
+    ratios = iris_ratios(points, layout)
+    return (ears[..., 0] + ears[..., 1]) / 2, (ratios[..., 0] + ratios[..., 1]) / 2
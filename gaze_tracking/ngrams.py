@@ -0,0 +1,318 @@
+import numpy as np
+
+# Rows expanded into dicts for pair lookups before the expanded rows are dropped
+ROW_CACHE_SIZE = 16384
+
+
+def pack_pairs(first, second):
+    """Packs two arrays of IDs into int64 keys that sort by (first, second)."""
+    return (np.asarray(first, np.int64) << 32) | np.asarray(second, np.int64)
+
+
+def intern_tokens(tokens):
+    """Maps tokens to integer IDs in order of first appearance.
+
+    Args:
+        tokens: Sequence of words
+
+    Returns:
+        A (vocab, ids) tuple where vocab lists the distinct words by ID and
+        ids is an int64 array with the ID of every token
+    """
+    word_ids = {}
+    ids = np.fromiter((word_ids.setdefault(token, len(word_ids)) for token in tokens), np.int64, len(tokens))
+    return list(word_ids), ids
+
+
+def compact_dtype(max_value):
+    """Returns the smallest unsigned integer dtype able to hold max_value."""
+    return np.min_scalar_type(max(int(max_value), 0))
+
+
+class CountRows(object):
+    """
+    Successor counts for a set of integer rows, stored in CSR layout.
+
+    Row i of (successors, counts) lists the word IDs seen after row i, sorted
+    by decreasing count, so the most common successors are a slice. The same
+    rows are also kept sorted by successor ID for binary-search lookups.
+    ID and count arrays use the smallest integer type that fits the corpus.
+
+    Pair counts are looked up in a dict of the row, mapping successor words
+    to counts, built on the first lookup in the row and kept under its
+    context. A lookup then costs as much as in a dict of Counters, while only
+    the rows in use are expanded. Beyond ROW_CACHE_SIZE expanded rows they
+    are all dropped and expanded again as they are used.
+    """
+
+    def __init__(self, vocab, offsets, successors, counts, lookup_successors, lookup_counts):
+        """
+        Args:
+            vocab (list): Successor words indexed by ID
+            offsets (numpy.ndarray): Start of each row, plus the end
+            successors (numpy.ndarray): Successor IDs of every row, by decreasing count
+            counts (numpy.ndarray): Counts aligned with successors
+            lookup_successors (numpy.ndarray): Successor IDs of every row, in increasing order
+            lookup_counts (numpy.ndarray): Counts aligned with lookup_successors
+        """
+        self.vocab = vocab
+        self.offsets = offsets
+        self.successors = successors
+        self.counts = counts
+        self.lookup_successors = lookup_successors
+        self.lookup_counts = lookup_counts
+        self._rows = {}
+
+    @staticmethod
+    def count_pairs(n_rows, n_successors, rows, successors):
+        """Counts (row, successor) pairs given in corpus order with batched array operations.
+
+        Every pair is packed into one int64 key and counted with np.unique.
+        Rows come out in the order a Counter filled pair by pair would return
+        from most_common(): by decreasing count, then first appearance.
+
+        Returns:
+            The arguments of build_rows
+        """
+        keys, first_seen, counts = np.unique(pack_pairs(rows, successors), return_index=True, return_counts=True)
+        rows = keys >> 32
+        successors = keys & 0xFFFFFFFF
+
+        # Keys are sorted by (row, successor), which is already the lookup order
+        order = np.lexsort((first_seen, -counts, rows))
+        row_lengths = np.bincount(rows, minlength=n_rows)
+        return n_successors, row_lengths, successors[order], counts[order], successors, counts
+
+    @staticmethod
+    def build_rows(n_successors, row_lengths, successors, counts, lookup_successors=None, lookup_counts=None):
+        """Returns the constructor arguments for successors and counts already in row order.
+
+        The lookup rows are derived by sorting each row unless they are given.
+        """
+        offsets = np.zeros(len(row_lengths) + 1, np.int64)
+        np.cumsum(row_lengths, out=offsets[1:])
+        if lookup_successors is None:
+            rows = np.repeat(np.arange(len(row_lengths)), row_lengths)
+            order = np.lexsort((successors, rows))
+            lookup_successors, lookup_counts = successors[order], counts[order]
+
+        id_dtype = compact_dtype(n_successors - 1)
+        count_dtype = compact_dtype(counts.max() if len(counts) else 0)
+        return (offsets, successors.astype(id_dtype), counts.astype(count_dtype),
+                lookup_successors.astype(id_dtype), lookup_counts.astype(count_dtype))
+
+    def rows_to_arrays(self, prefix):
+        """Returns the count arrays named with the given prefix."""
+        return {
+            f'{prefix}_offsets': self.offsets,
+            f'{prefix}_successors': self.successors,
+            f'{prefix}_counts': self.counts,
+            f'{prefix}_lookup_successors': self.lookup_successors,
+            f'{prefix}_lookup_counts': self.lookup_counts,
+        }
+
+    @staticmethod
+    def rows_from_arrays(arrays, prefix):
+        """Returns the constructor arguments stored by rows_to_arrays."""
+        return tuple(arrays[f'{prefix}_{name}'] for name in
+                     ('offsets', 'successors', 'counts', 'lookup_successors', 'lookup_counts'))
+
+    @property
+    def nbytes(self):
+        """Size of the count arrays in bytes."""
+        return sum(array.nbytes for array in self.rows_to_arrays('').values())
+
+    def row_range(self, i):
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def top(self, i, n=None):
+        """Returns the n most common (successor ID, count) pairs of row i."""
+        start, end = self.row_range(i)
+        if n is not None:
+            end = min(end, start + n)
+        return list(zip(self.successors[start:end].tolist(), self.counts[start:end].tolist()))
+
+    def find(self, i, successor_id):
+        """Returns the position of a successor in the lookup arrays, or None."""
+        start, end = self.row_range(i)
+        k = start + int(self.lookup_successors[start:end].searchsorted(successor_id))
+        if k < end and self.lookup_successors[k] == successor_id:
+            return k
+        return None
+
+    def expand_row(self, context, i):
+        """Returns row i as a dict of successor words to counts, kept under its context."""
+        rows = self._rows
+        if len(rows) >= ROW_CACHE_SIZE:
+            # Replaced rather than emptied, so concurrent lookups are not affected
+            rows = self._rows = {}
+        start, end = self.row_range(i)
+        vocab = self.vocab
+        row = rows[context] = dict(zip([vocab[j] for j in self.lookup_successors[start:end].tolist()],
+                                       self.lookup_counts[start:end].tolist()))
+        return row
+
+
+class BigramTable(CountRows):
+    """
+    Bigram counts over integer word IDs: row i holds the successors of word i.
+    """
+
+    def __init__(self, vocab, offsets, successors, counts, lookup_successors, lookup_counts):
+        """
+        Args:
+            vocab (list): Words indexed by ID
+            offsets, successors, counts, lookup_successors, lookup_counts: See CountRows
+        """
+        super(BigramTable, self).__init__(vocab, offsets, successors, counts, lookup_successors, lookup_counts)
+        self.word_ids = {word: i for i, word in enumerate(vocab)}
+
+    @classmethod
+    def from_counters(cls, vocab, bigrams):
+        """Builds a table from a word -> Counter mapping.
+
+        Rows keep Counter.most_common() order, ties included.
+
+        Args:
+            vocab: Words indexed by ID, covering every word in the bigrams
+            bigrams: Mapping of words to Counters of their successors
+        """
+        vocab = list(vocab)
+        word_ids = {word: i for i, word in enumerate(vocab)}
+        row_lengths = np.zeros(len(vocab), np.int64)
+        successors, counts = [], []
+        for i, word in enumerate(vocab):
+            row = bigrams.get(word)
+            if row:
+                row_lengths[i] = len(row)
+                for successor, count in row.most_common():
+                    successors.append(word_ids[successor])
+                    counts.append(count)
+        return cls(vocab, *cls.build_rows(len(vocab), row_lengths, np.array(successors, np.int64),
+                                          np.array(counts, np.int64)))
+
+    @classmethod
+    def from_token_ids(cls, vocab, ids):
+        """Counts the bigrams of a token ID sequence with batched array operations.
+
+        Args:
+            vocab: Words indexed by ID
+            ids: Token IDs in corpus order
+        """
+        ids = np.asarray(ids, np.int64)
+        return cls(vocab, *cls.build_rows(*cls.count_pairs(len(vocab), len(vocab), ids[:-1], ids[1:])))
+
+    @classmethod
+    def from_arrays(cls, vocab, arrays):
+        """Rebuilds a table from the arrays returned by to_arrays."""
+        return cls(vocab, *cls.rows_from_arrays(arrays, 'bigram'))
+
+    def to_arrays(self):
+        """Returns the table as named arrays, without the vocabulary."""
+        return self.rows_to_arrays('bigram')
+
+    def pair_keys(self):
+        """Returns the sorted packed (word, successor) keys, aligned with the lookup arrays."""
+        rows = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        return pack_pairs(rows, self.lookup_successors)
+
+    def pair_index(self, word, successor):
+        """Returns the position of a bigram in the lookup arrays, or None if it was never seen."""
+        i = self.word_ids.get(word)
+        j = self.word_ids.get(successor)
+        if i is None or j is None:
+            return None
+        return self.find(i, j)
+
+    def __contains__(self, word):
+        """Returns true if the word has at least one successor."""
+        i = self.word_ids.get(word)
+        return i is not None and self.offsets[i + 1] > self.offsets[i]
+
+    def __len__(self):
+        return int(np.count_nonzero(np.diff(self.offsets)))
+
+    def most_common(self, word, n=None):
+        """Returns the n most common (successor, count) pairs of a word."""
+        i = self.word_ids.get(word)
+        if i is None:
+            return []
+        return [(self.vocab[j], count) for j, count in self.top(i, n)]
+
+    def row_counts(self, word):
+        """Returns the successors of a word as a dict of counts, or None for an unknown word."""
+        row = self._rows.get(word)
+        if row is None:
+            i = self.word_ids.get(word)
+            if i is not None:
+                row = self.expand_row(word, i)
+        return row
+
+    def count(self, word, successor):
+        """Returns how many times the successor followed the word."""
+        row = self._rows.get(word)
+        if row is None:
+            row = self.row_counts(word)
+            if row is None:
+                return 0
+        return row.get(successor, 0)
+
+    def count_many(self, word, successors):
+        """Returns how many times each of the successors followed the word."""
+        row = self.row_counts(word)
+        if row is None:
+            return [0] * len(successors)
+        return [row.get(successor, 0) for successor in successors]
+
+
+class TrigramTable(CountRows):
+    """
+    Trigram counts: row k holds the successors of the k-th bigram of a
+    BigramTable, in the order of its lookup arrays.
+    """
+
+    def __init__(self, bigrams, offsets, successors, counts, lookup_successors, lookup_counts):
+        """
+        Args:
+            bigrams (BigramTable): Table whose bigrams are the trigram contexts
+            offsets, successors, counts, lookup_successors, lookup_counts: See CountRows
+        """
+        super(TrigramTable, self).__init__(bigrams.vocab, offsets, successors, counts, lookup_successors,
+                                           lookup_counts)
+        self.bigrams = bigrams
+
+    @classmethod
+    def from_token_ids(cls, bigrams, ids):
+        """Counts the trigrams of the token ID sequence the bigram table was built from."""
+        ids = np.asarray(ids, np.int64)
+        pair_keys = bigrams.pair_keys()
+        contexts = np.searchsorted(pair_keys, pack_pairs(ids[:-2], ids[1:-1]))
+        n_words = len(bigrams.vocab)
+        return cls(bigrams, *cls.build_rows(*cls.count_pairs(len(pair_keys), n_words, contexts, ids[2:])))
+
+    @classmethod
+    def from_arrays(cls, bigrams, arrays):
+        """Rebuilds a table from the arrays returned by to_arrays."""
+        return cls(bigrams, *cls.rows_from_arrays(arrays, 'trigram'))
+
+    def to_arrays(self):
+        """Returns the table as named arrays."""
+        return self.rows_to_arrays('trigram')
+
+    def most_common(self, first, second, n=None):
+        """Returns the n most common (successor, count) pairs of a two-word context."""
+        k = self.bigrams.pair_index(first, second)
+        if k is None:
+            return []
+        vocab = self.bigrams.vocab
+        return [(vocab[j], count) for j, count in self.top(k, n)]
+
+    def count_many(self, first, second, successors):
+        """Returns how many times each of the successors followed the two words."""
+        row = self._rows.get((first, second))
+        if row is None:
+            k = self.bigrams.pair_index(first, second)
+            if k is None:
+                return [0] * len(successors)
+            row = self.expand_row((first, second), k)
+        return [row.get(successor, 0) for successor in successors]
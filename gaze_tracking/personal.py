@@ -0,0 +1,124 @@
+import json
+import os
+import uuid
+from collections import Counter
+import numpy as np
+from .completion import encode_words
+
+
+class PersonalDictionary(object):
+    """
+    Words and word transitions committed by the user.
+
+    Every commit is appended to a log of JSON lines, so recording a word
+    costs one short write. The first line of the log holds a random log ID.
+    When the counts are compacted into the predictor snapshot, the snapshot
+    stores the log ID and length, so that only newer entries are replayed
+    at startup and a crash between the two steps cannot count a word twice.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: Log file, or None to keep the counts in memory only
+        """
+        self.path = path
+        self.word_counts = Counter()
+        # Rows are replaced on update, see WordPredictor._setup
+        self.transitions = {}
+        self.log_id = None
+        self.pending = 0
+
+    def add(self, word, previous=None, count=1):
+        """Counts a committed word and its transition from the previous word."""
+        self.word_counts[word] += count
+        if previous:
+            row = Counter(self.transitions.get(previous, ()))
+            row[word] += count
+            self.transitions[previous] = row
+
+    def record(self, word, previous=None):
+        """Counts a committed word and appends it to the log."""
+        self.add(word, previous)
+        if self.path:
+            if self.log_id is None:
+                self.reset_log()
+            with open(self.path, 'a') as f:
+                f.write(json.dumps([word, previous]) + '\n')
+            self.pending += 1
+
+    def replay(self, compacted=None):
+        """Reads the entries of the log that were not compacted yet.
+
+        Args:
+            compacted: (log ID, length) pair stored by the last compaction, or None
+
+        Returns:
+            A list of (word, previous) tuples in commit order
+        """
+        if not self.path or not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        header, _, _ = data.partition(b'\n')
+        try:
+            self.log_id = json.loads(header)['log']
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Error reading personal dictionary log: {e}")
+            return []
+
+        start = len(header) + 1
+        if compacted and compacted[0] == self.log_id:
+            start = max(start, compacted[1])
+        entries = []
+        for line in data[start:].splitlines():
+            try:
+                word, previous = json.loads(line)
+            except (ValueError, TypeError):
+                # A write cut short by a crash
+                continue
+            entries.append((word, previous))
+        self.pending = len(entries)
+        return entries
+
+    def log_position(self):
+        """Returns the (log ID, length) pair to store with compacted counts, or None."""
+        if self.log_id is None or not self.path or not os.path.exists(self.path):
+            return None
+        return self.log_id, os.path.getsize(self.path)
+
+    def reset_log(self):
+        """Replaces the log with an empty one under a new log ID."""
+        self.log_id = uuid.uuid4().hex
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps({'log': self.log_id}) + '\n')
+        os.replace(tmp_path, self.path)
+        self.pending = 0
+
+    def most_common(self, previous, n=None):
+        """Returns the n most common (word, count) pairs committed after the previous word."""
+        row = self.transitions.get(previous)
+        return row.most_common(n) if row else []
+
+    def to_arrays(self):
+        """Returns the counts as named arrays."""
+        pairs = [(previous, word, count) for previous, row in self.transitions.items() for word, count in row.items()]
+        return {
+            'personal_words': encode_words(self.word_counts),
+            'personal_counts': np.array(list(self.word_counts.values()), np.int64),
+            'personal_previous': encode_words([previous for previous, _, _ in pairs]),
+            'personal_next': encode_words([word for _, word, _ in pairs]),
+            'personal_pair_counts': np.array([count for _, _, count in pairs], np.int64),
+        }
+
+    def load_arrays(self, arrays):
+        """Adds the counts stored by to_arrays."""
+        for word, count in zip(arrays['personal_words'], arrays['personal_counts'].tolist()):
+            self.word_counts[word.decode()] += count
+        pairs = zip(arrays['personal_previous'], arrays['personal_next'], arrays['personal_pair_counts'].tolist())
+        for previous, word, count in pairs:
+            previous = previous.decode()
+            self.transitions.setdefault(previous, Counter())[word.decode()] += count
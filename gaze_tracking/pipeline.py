@@ -0,0 +1,173 @@
+from bisect import bisect_right
+from collections import deque
+import queue
+import threading
+import time
+import numpy as np
+
+
+class TimingHistogram(object):
+    """Durations counted in log-spaced buckets, for percentiles without keeping every sample"""
+
+    def __init__(self, low=1e-5, high=10.0, buckets_per_decade=20):
+        """
+        Arguments:
+            low (float): Upper bound in seconds of the first bucket
+            high (float): Lower bound in seconds of the last bucket, which holds everything longer
+            buckets_per_decade (int): Resolution; 20 gives buckets about 12% wide
+        """
+        decades = np.log10(high) - np.log10(low)
+        self.edges = np.logspace(np.log10(low), np.log10(high), int(decades * buckets_per_decade) + 1).tolist()
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.counts[bisect_right(self.edges, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Upper bound in seconds of the bucket holding the q-th percentile"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q / 100 * self.count
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank and count:
+                    return min(self.edges[index] if index < len(self.edges) else self.max, self.max)
+            return self.max
+
+    def summary(self):
+        return (f"{self.count} calls, mean {self.mean() * 1e3:.2f} ms, p50 {self.percentile(50) * 1e3:.2f} ms, "
+                f"p99 {self.percentile(99) * 1e3:.2f} ms, max {self.max * 1e3:.2f} ms")
+
+
+class DropQueue(object):
+    """
+    Bounded queue between two pipeline stages. When it is full, put() drops
+    the oldest item instead of blocking, so a slow consumer makes the producer
+    skip ahead rather than build up latency. Dropped items are passed to
+    on_drop, e.g. to recycle their buffers.
+    """
+
+    def __init__(self, maxsize=1, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.closed = False
+        self.passed = 0
+        self.dropped = 0
+        self._items = deque()
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """Adds an item, dropping the oldest one if the queue is full.
+
+        Returns:
+            True if an item was dropped
+        """
+        with self._condition:
+            dropped = None
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+        return dropped is not None
+
+    def get(self, timeout=None):
+        """Waits for the oldest item and removes it.
+
+        Returns:
+            The item, or None on timeout or once the queue is closed and empty
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._items or self.closed, timeout) or not self._items:
+                return None
+            self.passed += 1
+            return self._items.popleft()
+
+    def close(self):
+        """Lets the consumer finish the remaining items and then stop"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class BufferPool(object):
+    """
+    Fixed set of preallocated arrays lent to the frames in flight between
+    stages, so a buffer is never written while another stage still reads it.
+    """
+
+    def __init__(self, shape, size, dtype=np.uint8):
+        self._free = queue.LifoQueue()
+        for _ in range(size):
+            self._free.put(np.empty(shape, dtype))
+
+    def acquire(self, timeout=None):
+        """A free buffer, waiting for one to be released if needed"""
+        return self._free.get(timeout=timeout)
+
+    def release(self, buffer):
+        self._free.put(buffer)
+
+
+class Stage(object):
+    """
+    Thread that takes items with receive(), passes each to function and puts
+    the result, unless None, on the output queue. The time spent in function
+    is recorded in a TimingHistogram. The stage ends when receive() returns
+    None, and then closes its output queue so the next stage ends too.
+    """
+
+    def __init__(self, name, function, receive, outbox=None):
+        """
+        Arguments:
+            name (str): Name of the stage in reports
+            function: Work of the stage, returning the item for the next stage or None
+            receive: Function returning the next input item, or None when there are no more
+            outbox (DropQueue): Queue of the next stage
+        """
+        self.name = name
+        self.function = function
+        self.receive = receive
+        self.outbox = outbox
+        self.timings = TimingHistogram()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            while True:
+                item = self.receive()
+                if item is None:
+                    break
+                start = time.perf_counter()
+                result = self.function(item)
+                self.timings.add(time.perf_counter() - start)
+                if result is not None and self.outbox is not None:
+                    self.outbox.put(result)
+        finally:
+            if self.outbox is not None:
+                self.outbox.close()
@@ -4,6 +4,8 @@ import os
 import json
 import random
 from collections import Counter
+from functools import lru_cache
+import heapq
 try:
     import nltk
     from nltk.corpus import words, brown
@@ -11,6 +13,41 @@ try:
 except ImportError:
     NLTK_AVAILABLE = False
 import string
+import threading
+import numpy as np
+from .completion import CompletionIndex, FuzzyIndex, encode_words
+from .ngrams import BigramTable, TrigramTable, intern_tokens
+from .personal import PersonalDictionary
+from .snapshot import content_checksum, fingerprint, read_snapshot, write_snapshot
+
+# Number of completion candidates gathered before ranking
+MAX_CANDIDATES = 10
+
+# Weight applied at each step down from trigram to bigram to unigram scores
+BACKOFF_WEIGHT = 0.4
+
+# Bumped whenever the arrays stored in predictor snapshots change
+SNAPSHOT_SCHEMA = 4
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trained_models", "predictor.snap")
+DEFAULT_PERSONAL_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trained_models", "personal.log")
+
+# Personal dictionary log entries replayed at startup before they are compacted into the snapshot
+COMPACT_AFTER = 500
+
+
+def _corpus_fingerprint():
+    """Returns a fingerprint of the locally installed NLTK corpora, or None if they are missing."""
+    if not NLTK_AVAILABLE:
+        return None
+    paths = []
+    for resource in ('corpora/words', 'corpora/brown'):
+        try:
+            pointer = nltk.data.find(resource)
+        except LookupError:
+            return None
+        paths.append(pointer.zipfile.filename if hasattr(pointer, 'zipfile') else pointer.path)
+    return fingerprint(paths)
+
 
 class WordPredictor:
     """
@@ -18,13 +55,111 @@ class WordPredictor:
     Also includes common word frequencies and n-gram based predictions.
     """
     
-    def __init__(self, custom_dict_path=None):
-        """Initialize the word predictor with dictionaries and language models."""
+    def __init__(self, custom_dict_path=None, snapshot_path=DEFAULT_SNAPSHOT_PATH, cache_size=1024,
+                 use_trigrams=False, personal_log_path=DEFAULT_PERSONAL_LOG_PATH):
+        """Initialize the word predictor with dictionaries and language models.
+
+        Args:
+            custom_dict_path: Optional JSON word list or word -> frequency mapping
+            snapshot_path: Compiled model file, loaded when it is up to date and
+                rebuilt otherwise. None disables the snapshot.
+            cache_size: Number of (partial word, context) results kept in the LRU suggestion cache
+            use_trigrams: Also build a trigram table and rank with stupid-backoff
+                scores when two context words are known
+            personal_log_path: Append-only log of the words committed with
+                add_to_dictionary. None keeps them in memory only.
+        """
+        self._setup(cache_size, use_trigrams)
+        self.personal = PersonalDictionary(personal_log_path)
+        self._snapshot_path = snapshot_path
+        self._custom_dict_path = custom_dict_path
+
+        if not (snapshot_path and self._load_snapshot(snapshot_path, custom_dict_path)):
+            self._build_language_model(custom_dict_path)
+            # Personal words compacted into an outdated snapshot carry over to the new model
+            for word, count in self.personal.word_counts.items():
+                self._apply_personal(word, count)
+            if snapshot_path and self._nltk_loaded:
+                try:
+                    self.save_snapshot(snapshot_path, custom_dict_path)
+                except OSError as e:
+                    print(f"Error saving predictor snapshot: {e}")
+
+        for word, previous in self.personal.replay(self._compacted_log):
+            self.personal.add(word, previous)
+            self._apply_personal(word)
+        self._model_changed()
+
+    def _setup(self, cache_size, use_trigrams):
+        """Initialize an empty model."""
         self.common_words = []
         self.word_freq = {}
-        self.bigrams = {}
+        self.bigrams = BigramTable.from_token_ids([], [])
+        self.trigrams = None
+        self.use_trigrams = use_trigrams
         self.current_context = ""
-        
+        self._nltk_loaded = False
+        self._top_words = ()
+        self._total_count = 0
+        self.personal = PersonalDictionary()
+        self._snapshot_path = None
+        self._compacted_log = None
+        self._compacting = False
+
+        # Writers are serialized by the lock; the read path takes none. Readers
+        # only look word_freq up one key at a time, so the single-key updates a
+        # writer makes to it in place are safe under the GIL: a suggestion computed
+        # during a write may see the old or the new count of that one word, and the
+        # generation bump drops it from the cache. Every other structure a reader
+        # touches, the top words, the completion overlays and the personal
+        # transition rows, is replaced rather than modified, so it never changes
+        # under a reader. The generation keys the cache to the model version.
+        self._write_lock = threading.Lock()
+        self._generation = 0
+        self._cached_suggest = lru_cache(maxsize=cache_size)(self._suggest)
+
+    @classmethod
+    def from_corpus(cls, tokens, dictionary=(), cache_size=1024, use_trigrams=False):
+        """Build a predictor from a list of tokens instead of the NLTK corpora.
+
+        Args:
+            tokens: Corpus words in order; non-alphabetic tokens are skipped
+            dictionary: Extra known words that have no frequency
+        """
+        predictor = cls.__new__(cls)
+        predictor._setup(cache_size, use_trigrams)
+        predictor.all_words = set(w.lower() for w in dictionary)
+        predictor._train([w.lower() for w in tokens if w.isalpha()])
+        predictor._build_index()
+        return predictor
+
+    def _train(self, word_list):
+        """Build the word frequencies and n-gram tables from a list of lowercase words."""
+        vocab, token_ids = intern_tokens(word_list)
+        self.word_freq = Counter(dict(zip(vocab, np.bincount(token_ids, minlength=len(vocab)).tolist())))
+        self.common_words = [word for word, _ in self.word_freq.most_common(5000)]
+
+        # Build simple bigram model
+        self.bigrams = BigramTable.from_token_ids(vocab, token_ids)
+        if self.use_trigrams:
+            self.trigrams = TrigramTable.from_token_ids(self.bigrams, token_ids)
+
+    def _build_index(self):
+        """Build the completion index and ranking tables once the dictionaries are loaded."""
+        self.completion_index = CompletionIndex.build(self.common_words, self.all_words, k=MAX_CANDIDATES + 1)
+        self.all_words = self.completion_index.vocabulary
+        self.fuzzy_index = FuzzyIndex.build(self.common_words)
+        self._update_top_words()
+
+    def _update_top_words(self):
+        """Precompute the most frequent words, suggested when there is nothing to complete."""
+        word_freq = self.word_freq
+        # nlargest keeps the tie order of a stable sort over the dictionary
+        self._top_words = tuple(heapq.nlargest(MAX_CANDIDATES, word_freq, key=word_freq.get))
+        self._total_count = sum(word_freq.values())
+
+    def _build_language_model(self, custom_dict_path):
+        """Build the dictionaries, frequencies and bigram model from the corpora."""
         # Try to load NLTK resources
         if NLTK_AVAILABLE:
             try:
@@ -36,15 +171,8 @@ class WordPredictor:
                 self.all_words = set(w.lower() for w in words.words())
                 
                 # Get word frequencies from Brown corpus
-                word_list = [w.lower() for w in brown.words() if w.isalpha()]
-                self.word_freq = Counter(word_list)
-                self.common_words = [word for word, _ in self.word_freq.most_common(5000)]
-                
-                # Build simple bigram model
-                for i in range(len(word_list) - 1):
-                    if word_list[i] not in self.bigrams:
-                        self.bigrams[word_list[i]] = Counter()
-                    self.bigrams[word_list[i]][word_list[i+1]] += 1
+                self._train([w.lower() for w in brown.words() if w.isalpha()])
+                self._nltk_loaded = True
                     
             except Exception as e:
                 print(f"NLTK data loading error: {e}")
@@ -54,17 +182,148 @@ class WordPredictor:
             self._load_fallback_dictionary()
             
         # Load custom dictionary if provided
-        if custom_dict_path and os.path.exists(custom_dict_path):
-            try:
-                with open(custom_dict_path, 'r') as f:
-                    custom_dict = json.load(f)
-                    if isinstance(custom_dict, list):
-                        self.all_words.update(w.lower() for w in custom_dict)
-                    elif isinstance(custom_dict, dict):
-                        self.word_freq.update(custom_dict)
-                        self.all_words.update(custom_dict.keys())
-            except Exception as e:
-                print(f"Error loading custom dictionary: {e}")
+        if custom_dict_path:
+            self.load_custom_dictionary(custom_dict_path)
+
+        self._build_index()
+
+    def load_custom_dictionary(self, custom_dict_path):
+        """Add the words of a JSON word list, or word -> frequency mapping, to the dictionary."""
+        if not os.path.exists(custom_dict_path):
+            return
+        try:
+            with open(custom_dict_path, 'r') as f:
+                custom_dict = json.load(f)
+        except Exception as e:
+            print(f"Error loading custom dictionary: {e}")
+            return
+
+        with self._write_lock:
+            if isinstance(custom_dict, list):
+                self.all_words.update(w.lower() for w in custom_dict)
+            elif isinstance(custom_dict, dict):
+                word_freq = self.word_freq.copy()
+                word_freq.update(custom_dict)
+                self.word_freq = word_freq
+                self.all_words.update(custom_dict.keys())
+            self._update_top_words()
+            self._model_changed()
+
+    def _apply_personal(self, word, count=1):
+        """
+        Add the count of a committed word to the model at constant cost: the
+        frequency is updated in place, the completion index gets the word in
+        its personal overlay and only the top words affected are re-ranked.
+        See _setup for why readers can run concurrently with this.
+        """
+        word_freq = self.word_freq
+        word_freq[word] = word_freq.get(word, 0) + count
+        self._total_count += count
+        self.completion_index.add_personal(word)
+
+        top_words = self._top_words
+        if word in top_words or len(top_words) < MAX_CANDIDATES or word_freq[word] > word_freq[top_words[-1]]:
+            candidates = top_words if word in top_words else top_words + (word,)
+            self._top_words = tuple(heapq.nlargest(MAX_CANDIDATES, candidates, key=word_freq.get))
+
+    def _model_changed(self):
+        """Invalidate cached suggestions after the model was modified."""
+        self._generation += 1
+        self._cached_suggest.cache_clear()
+
+    def _load_snapshot(self, path, custom_dict_path):
+        """Load the language model from a snapshot if it matches the corpora and custom dictionary.
+
+        Returns True if the snapshot was loaded.
+        """
+        try:
+            snapshot = read_snapshot(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading predictor snapshot: {e}")
+            return False
+        if snapshot is None:
+            return False
+
+        metadata, arrays = snapshot
+        # Personal words are kept even when the rest of the snapshot is outdated
+        self._load_personal(metadata, arrays)
+        if metadata.get('schema') != SNAPSHOT_SCHEMA:
+            return False
+        if metadata.get('custom_dict') != content_checksum(custom_dict_path):
+            return False
+        # Without local corpora there is nothing to rebuild from, so the snapshot is kept
+        corpus = _corpus_fingerprint()
+        if corpus is not None and corpus != metadata.get('corpus'):
+            return False
+        if metadata.get('trigrams', False) != self.use_trigrams:
+            return False
+
+        self.completion_index = CompletionIndex.from_arrays(arrays)
+        self.all_words = self.completion_index.vocabulary
+        self.common_words = self.completion_index.ranked_words
+        self.fuzzy_index = FuzzyIndex.from_arrays(self.common_words, arrays)
+        for word in self.personal.word_counts:
+            self.completion_index.add_personal(word)
+
+        vocab = [word.decode() for word in arrays['freq_words']]
+        self.word_freq = Counter(dict(zip(vocab, arrays['freq_counts'].tolist())))
+        self.bigrams = BigramTable.from_arrays(vocab[:len(arrays['bigram_offsets']) - 1], arrays)
+        if self.use_trigrams:
+            self.trigrams = TrigramTable.from_arrays(self.bigrams, arrays)
+        self._update_top_words()
+        self._nltk_loaded = True
+        return True
+
+    def _load_personal(self, metadata, arrays):
+        """Load the personal dictionary counts compacted into a snapshot."""
+        if 'personal_words' in arrays:
+            self.personal.load_arrays(arrays)
+            self._compacted_log = metadata.get('personal_log')
+
+    def save_snapshot(self, path, custom_dict_path=None):
+        """Compile the vocabulary, frequencies, n-gram tables, completion and fuzzy indexes
+        and the personal dictionary into a snapshot file.
+
+        Args:
+            path: Destination snapshot file
+            custom_dict_path: Custom dictionary the model was built with
+        """
+        arrays = self.completion_index.to_arrays()
+        arrays.update(self.fuzzy_index.to_arrays())
+        arrays.update(self.bigrams.to_arrays())
+        if self.trigrams is not None:
+            arrays.update(self.trigrams.to_arrays())
+        arrays.update(self.personal.to_arrays())
+        # Words added after the bigrams were built follow the bigram vocabulary
+        vocab = list(self.word_freq)
+        arrays.update({
+            'freq_words': encode_words(vocab),
+            'freq_counts': np.array([self.word_freq[word] for word in vocab], np.int64),
+        })
+        metadata = {
+            'schema': SNAPSHOT_SCHEMA,
+            'corpus': _corpus_fingerprint(),
+            'custom_dict': content_checksum(custom_dict_path),
+            'trigrams': self.trigrams is not None,
+            'personal_log': self.personal.log_position() or self._compacted_log,
+        }
+        write_snapshot(path, arrays, metadata)
+
+    @classmethod
+    def build_snapshot(cls, path=DEFAULT_SNAPSHOT_PATH, custom_dict_path=None, use_trigrams=False):
+        """Build the language model from the corpora and write it to a snapshot file."""
+        predictor = cls(custom_dict_path, snapshot_path=None, use_trigrams=use_trigrams, personal_log_path=None)
+        if not predictor._nltk_loaded:
+            raise RuntimeError("NLTK corpora are required to build a predictor snapshot")
+
+        # Keep the personal dictionary compacted into the snapshot being replaced
+        snapshot = read_snapshot(path)
+        if snapshot is not None:
+            predictor._load_personal(*snapshot)
+            for word, count in predictor.personal.word_counts.items():
+                predictor._apply_personal(word, count)
+        predictor.save_snapshot(path, custom_dict_path)
+        return predictor
     
     def _load_fallback_dictionary(self):
         """Load a basic fallback dictionary if NLTK is not available"""
@@ -82,9 +341,26 @@ class WordPredictor:
         self.common_words = list(self.all_words)
         self.word_freq = {word: 100 - i for i, word in enumerate(self.common_words[:100])}
         
+    def predict(self, partial_word, context=None):
+        """
+        Suggest completions for a partially typed word without using or
+        updating the predictor's current context. Safe to call from many
+        threads at once; the same arguments always give the same result for
+        a given model.
+        Args:
+            partial_word: The partial word to complete
+            context: Optional previous word for context-based suggestions
+        Returns the top 3 suggestions.
+        """
+        partial_word = partial_word.lower().strip() if partial_word else ""
+        context = context.lower().strip() if context else ""
+        return list(self._cached_suggest(partial_word, context, self._generation)[0])
+
     def suggest(self, partial_word, context=None):
         """
         Suggest completions for a partially typed word.
+        Without a context, the context of the previous call is used. Not
+        meant to be shared between threads; use predict() for that.
         Args:
             partial_word: The partial word to complete
             context: Optional previous word for context-based suggestions
@@ -92,37 +368,50 @@ class WordPredictor:
         """
         if context:
             self.current_context = context.lower().strip()
-        
+
+        partial_word = partial_word.lower().strip() if partial_word else ""
+        suggestions, next_context = self._cached_suggest(partial_word, self.current_context, self._generation)
+
+        # Update context for next prediction
+        if next_context is not None:
+            self.current_context = next_context
+
+        return list(suggestions)
+
+    def cache_info(self):
+        """Returns the hits, misses, maximum size and current size of the suggestion cache."""
+        return self._cached_suggest.cache_info()
+
+    def _suggest(self, partial_word, context, generation):
+        """
+        Compute suggestions for a normalized partial word and context word.
+        The model generation is only part of the cache key.
+        Returns a (suggestions, next_context) tuple where next_context is the
+        context for the following prediction, or None to keep the current one.
+        """
+        # Read the shared model once so a concurrent writer cannot swap it mid-call
+        word_freq = self.word_freq
+        top_words = self._top_words
+
+        # The last context word drives the bigrams, the one before it the trigrams
+        context_words = context.split()[-2:]
+        previous = context_words[-1] if context_words else ""
+
         if not partial_word:
             # If no partial word, suggest common next words based on context
-            if self.current_context and self.current_context in self.bigrams:
-                suggestions = [word for word, _ in self.bigrams[self.current_context].most_common(3)]
+            if self.trigrams is not None and context_words:
+                return tuple(self._predict_next(context_words, word_freq, top_words)), None
+            if previous and (previous in self.bigrams or previous in self.personal.transitions):
+                suggestions = self._next_words(previous, 3)
                 if len(suggestions) < 3:
-                    suggestions += [word for word, _ in self.word_freq.most_common(3-len(suggestions))]
-                return suggestions[:3]
+                    suggestions += list(top_words[:3-len(suggestions)])
+                return tuple(suggestions[:3]), None
             else:
                 # Fallback to most common words
-                return [word for word, _ in sorted(self.word_freq.items(), key=lambda x: x[1], reverse=True)[:3]] if self.word_freq else ["the", "and", "you"]
+                return (tuple(top_words[:3]) if top_words else ("the", "and", "you")), None
         
-        partial_word = partial_word.lower().strip()
-        
-        # Get completions that start with the partial word
-        completions = []
-        
-        # First check the more common words
-        for word in self.common_words:
-            if word.startswith(partial_word) and word != partial_word:
-                completions.append(word)
-                if len(completions) >= 10:  # Gather more than we need for ranking
-                    break
-        
-        # If we don't have enough, check the full dictionary
-        if len(completions) < 10:
-            for word in self.all_words:
-                if word.startswith(partial_word) and word != partial_word and word not in completions:
-                    completions.append(word)
-                    if len(completions) >= 10:
-                        break
+        # Get completions that start with the partial word, common words first
+        completions = self.completion_index.complete(partial_word, MAX_CANDIDATES, lambda word: word_freq.get(word, 0))
         
         # Add the exact word if it exists in our dictionary
         if partial_word in self.all_words and partial_word not in completions:
@@ -131,39 +420,25 @@ class WordPredictor:
         # If still no completions, return basic suggestions
         if not completions:
             if len(partial_word) >= 3:
-                # Try to find fuzzy matches for longer partial words
-                fuzzy_matches = []
-                for word in self.common_words:
-                    if len(word) >= len(partial_word) and sum(c1 == c2 for c1, c2 in 
-                                                             zip(partial_word, word[:len(partial_word)])) >= len(partial_word) - 1:
-                        fuzzy_matches.append(word)
-                        if len(fuzzy_matches) >= 3:
-                            break
+                # Try to find fuzzy matches for longer partial words, allowing typos
+                fuzzy_matches = self.fuzzy_index.lookup(partial_word, 3)
                 if fuzzy_matches:
-                    return fuzzy_matches[:3]
+                    return tuple(fuzzy_matches[:3]), None
             
             # Fallback to common words with the same first letter
-            first_letter_matches = [w for w in self.common_words if w and w[0] == partial_word[0]][:3]
-            return first_letter_matches if first_letter_matches else ["the", "and", "you"][:3]
+            first_letter_matches = list(self.completion_index.ranked(partial_word[0])[:3])
+            return tuple(first_letter_matches if first_letter_matches else ["the", "and", "you"][:3]), None
         
         # Rank completions by frequency and relevance
-        ranked_completions = []
-        for word in completions:
-            # Calculate a score based on frequency and how close the length is to the partial word
-            freq_score = self.word_freq.get(word, 1)
-            length_score = 1.0 / (abs(len(word) - len(partial_word)) + 1)
-            
-            # Context relevance (if we have context and bigrams)
-            context_score = 1
-            if self.current_context and self.current_context in self.bigrams and word in self.bigrams[self.current_context]:
-                context_score = self.bigrams[self.current_context][word] * 2
-                
-            final_score = freq_score * length_score * context_score
-            ranked_completions.append((word, final_score))
+        if self.trigrams is not None:
+            scores = self._backoff_scores(context_words, completions, word_freq)
+            ranked_completions = [(word, score / (abs(len(word) - len(partial_word)) + 1))
+                                  for word, score in zip(completions, scores)]
+        else:
+            ranked_completions = self._score_completions(partial_word, previous, completions, word_freq)
         
-        # Sort by score and return top 3
-        ranked_completions.sort(key=lambda x: x[1], reverse=True)
-        result = [word for word, _ in ranked_completions[:3]]
+        # Keep the top 3 by score
+        result = [word for word, _ in heapq.nlargest(3, ranked_completions, key=lambda x: x[1])]
         
         # If we have fewer than 3 suggestions, add the partial word itself or common words
         while len(result) < 3:
@@ -175,17 +450,128 @@ class WordPredictor:
                     if word not in result:
                         result.append(word)
                         break
-        
-        # Update context for next prediction
-        self.current_context = partial_word
                 
-        return result[:3]
+        return tuple(result[:3]), partial_word
     
-    def add_to_dictionary(self, word):
-        """Add a new word to the dictionary."""
+    def _score_completions(self, partial_word, context, completions, word_freq):
+        """Score completions by frequency, length and bigram relevance."""
+        ranked_completions = []
+        bigram_counts = self._bigram_counts(context, completions) if context else [0] * len(completions)
+        for word, bigram_count in zip(completions, bigram_counts):
+            # Calculate a score based on frequency and how close the length is to the partial word
+            freq_score = word_freq.get(word, 1)
+            length_score = 1.0 / (abs(len(word) - len(partial_word)) + 1)
+            
+            # Context relevance (if we have context and bigrams)
+            context_score = 1
+            if bigram_count:
+                context_score = bigram_count * 2
+                
+            final_score = freq_score * length_score * context_score
+            ranked_completions.append((word, final_score))
+        return ranked_completions
+
+    def _backoff_scores(self, context_words, candidates, word_freq):
+        """
+        Stupid-backoff scores of candidate words after up to two context words:
+        the trigram relative frequency if the trigram was seen, otherwise the
+        bigram one, otherwise the unigram one, weighted by BACKOFF_WEIGHT per step down.
+        """
+        total = self._total_count or 1
+        scores = [BACKOFF_WEIGHT ** 2 * word_freq.get(word, 1) / total for word in candidates]
+        if not context_words:
+            return scores
+
+        previous = context_words[-1]
+        previous_count = word_freq.get(previous, 0)
+        if previous_count:
+            for i, count in enumerate(self._bigram_counts(previous, candidates)):
+                if count:
+                    scores[i] = BACKOFF_WEIGHT * count / previous_count
+
+        if len(context_words) == 2:
+            pair_count = self.bigrams.count(*context_words)
+            if pair_count:
+                for i, count in enumerate(self.trigrams.count_many(context_words[0], previous, candidates)):
+                    if count:
+                        scores[i] = count / pair_count
+        return scores
+
+    def _bigram_counts(self, previous, words):
+        """Return how many times each word followed the previous word, in the corpus and personal dictionary."""
+        counts = self.bigrams.count_many(previous, words)
+        personal = self.personal.transitions.get(previous)
+        if personal:
+            counts = [count + personal.get(word, 0) for count, word in zip(counts, words)]
+        return counts
+
+    def _next_words(self, previous, n):
+        """Return the n words that most often followed the previous word, personal transitions included."""
+        personal = self.personal.most_common(previous)
+        if not personal:
+            return [word for word, _ in self.bigrams.most_common(previous, n)]
+        # Words without personal counts keep their corpus order, so n + len(personal) of them suffice
+        candidates = [word for word, _ in self.bigrams.most_common(previous, n + len(personal))]
+        candidates = list(dict.fromkeys(candidates + [word for word, _ in personal]))
+        counts = self._bigram_counts(previous, candidates)
+        return [word for word, _ in heapq.nlargest(n, zip(candidates, counts), key=lambda x: x[1])]
+
+    def _predict_next(self, context_words, word_freq, top_words):
+        """Rank likely next words after the context words by stupid-backoff score."""
+        candidates = []
+        if len(context_words) == 2:
+            candidates += [word for word, _ in self.trigrams.most_common(*context_words, n=MAX_CANDIDATES)]
+        candidates += self._next_words(context_words[-1], MAX_CANDIDATES)
+        candidates += top_words
+        candidates = list(dict.fromkeys(candidates))
+        scores = self._backoff_scores(context_words, candidates, word_freq)
+        return [word for word, _ in heapq.nlargest(3, zip(candidates, scores), key=lambda x: x[1])]
+
+    def add_to_dictionary(self, word, previous=None):
+        """
+        Add a word committed by the user to the dictionary.
+        The word, and its transition from the previous word, are appended to
+        the personal dictionary log and affect suggestions immediately.
+        Args:
+            word: The committed word
+            previous: Optional word typed before it
+        """
         word = word.lower().strip()
         if word and all(c in string.ascii_lowercase for c in word):
-            self.all_words.add(word)
-            self.word_freq[word] = self.word_freq.get(word, 0) + 1
+            previous = previous.lower().strip() if previous else None
+            with self._write_lock:
+                try:
+                    self.personal.record(word, previous)
+                except OSError as e:
+                    print(f"Error writing personal dictionary: {e}")
+                self._apply_personal(word)
+                self._model_changed()
+                compact = self.personal.pending >= COMPACT_AFTER and not self._compacting
+                if compact:
+                    self._compacting = True
+            if compact:
+                threading.Thread(target=self.compact, daemon=True).start()
             return True
-        return False
\ No newline at end of file
+        return False
+
+    def compact(self):
+        """
+        Fold the personal dictionary log into the snapshot and start a new log.
+        Returns True if the snapshot was written.
+        """
+        with self._write_lock:
+            try:
+                if not (self._snapshot_path and self._nltk_loaded and self.personal.path):
+                    return False
+                self.save_snapshot(self._snapshot_path, self._custom_dict_path)
+                self.personal.reset_log()
+                return True
+            except OSError as e:
+                print(f"Error compacting personal dictionary: {e}")
+                return False
+            finally:
+                self._compacting = False
+
+if __name__ == "__main__":
+    import sys
+    WordPredictor.build_snapshot(custom_dict_path=sys.argv[1] if len(sys.argv) > 1 else None)
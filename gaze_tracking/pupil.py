@@ -1,6 +1,30 @@
 import numpy as np
 import cv2
 
+# Structuring element of the erosions, shared by every frame
+KERNEL = np.ones((3, 3), np.uint8)
+
+
+class PupilBuffers(object):
+    """
+    Scratch memory reused from frame to frame by the pupils of one side:
+    the smoothed and eroded eye frames, the binarized iris frame and the
+    mask of its dark pixels. As in EyeBuffers, the arrays are contiguous
+    views of one buffer, only reallocated when an eye frame is larger than
+    any before.
+    """
+
+    def __init__(self):
+        self._frames = np.empty((4, 0), np.uint8)
+
+    def get(self, height, width):
+        """Returns the (height, width) smoothed, filtered, iris and dark arrays,
+        stacked, overwriting those of the previous frame"""
+        size = height * width
+        if size > self._frames.shape[1]:
+            self._frames = np.empty((4, size), np.uint8)
+        return self._frames[:, :size].reshape(4, height, width)
+
 
 class Pupil(object):
     """
@@ -8,13 +32,41 @@ class Pupil(object):
     the position of the pupil
     """
 
-    def __init__(self, eye_frame, threshold):
+    def __init__(self, eye_frame, threshold, buffers=None, subpixel=False):
+        """
+        Arguments:
+            eye_frame (numpy.ndarray): Frame containing an eye and nothing else
+            threshold (int): Threshold value used to binarize the eye frame
+            buffers (PupilBuffers): Scratch memory of this side, reused from frame to frame
+            subpixel (bool): Gives the position as floats rather than whole pixels
+        """
         self.iris_frame = None
         self.threshold = threshold
+        self.subpixel = subpixel
         self.x = None
         self.y = None
 
-        self.detect_iris(eye_frame)
+        self.detect_iris(eye_frame, buffers)
+
+    @staticmethod
+    def filter_frame(eye_frame, smoothed=None, dst=None):
+        """Smooths the eye frame and erodes it, the steps of image_processing
+        that come before binarization
+
+        Arguments:
+            eye_frame (numpy.ndarray): Frame containing an eye and nothing else
+            smoothed (numpy.ndarray): Array of the frame's shape for the
+                smoothed frame, or None to allocate it
+            dst (numpy.ndarray): Array of the frame's shape for the result,
+                or None to allocate it
+
+        Returns:
+            The filtered frame, which does not depend on the threshold
+        """
+        new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15, dst=smoothed)
+        new_frame = cv2.erode(new_frame, KERNEL, dst=dst, iterations=3)
+
+        return new_frame
 
     @staticmethod
     def image_processing(eye_frame, threshold):
@@ -27,28 +79,54 @@ class Pupil(object):
         Returns:
             A frame with a single element representing the iris
         """
-        kernel = np.ones((3, 3), np.uint8)
-        new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15)
-        new_frame = cv2.erode(new_frame, kernel, iterations=3)
+        new_frame = Pupil.filter_frame(eye_frame)
         new_frame = cv2.threshold(new_frame, threshold, 255, cv2.THRESH_BINARY)[1]
 
         return new_frame
 
-    def detect_iris(self, eye_frame):
+    @staticmethod
+    def iris_centroid(dark):
+        """Finds the iris in the mask of the dark pixels of a binarized eye
+        frame: the largest dark region. Only the outer contours of the dark
+        regions are traced, so bright spots inside the iris do not count.
+
+        Arguments:
+            dark (numpy.ndarray): Mask of the pixels at or below the threshold
+
+        Returns:
+            The centroid (x, y) of the area inside the contour of the iris,
+            or None if there is no dark region
+        """
+        contours, _ = cv2.findContours(dark, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2:]
+        if not contours:
+            return None
+
+        moments = cv2.moments(max(contours, key=cv2.contourArea))
+        if not moments['m00']:
+            return None
+        return moments['m10'] / moments['m00'], moments['m01'] / moments['m00']
+
+    def detect_iris(self, eye_frame, buffers=None):
         """Detects the iris and estimates the position of the iris by
         calculating the centroid.
 
         Arguments:
             eye_frame (numpy.ndarray): Frame containing an eye and nothing else
+            buffers (PupilBuffers): Scratch memory of this side, or None to allocate it
         """
-        self.iris_frame = self.image_processing(eye_frame, self.threshold)
+        if buffers is None:
+            buffers = PupilBuffers()
+        height, width = eye_frame.shape[:2]
+        smoothed, filtered, iris_frame, dark = buffers.get(height, width)
 
-        contours, _ = cv2.findContours(self.iris_frame, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)[-2:]
-        contours = sorted(contours, key=cv2.contourArea)
+        self.filter_frame(eye_frame, smoothed, filtered)
+        self.iris_frame = cv2.threshold(filtered, self.threshold, 255, cv2.THRESH_BINARY, dst=iris_frame)[1]
+        cv2.threshold(filtered, self.threshold, 255, cv2.THRESH_BINARY_INV, dst=dark)
 
-        try:
-            moments = cv2.moments(contours[-2])
-            self.x = int(moments['m10'] / moments['m00'])
-            self.y = int(moments['m01'] / moments['m00'])
-        except (IndexError, ZeroDivisionError):
-            pass
+        centroid = self.iris_centroid(dark)
+        if centroid is None:
+            return
+        if self.subpixel:
+            self.x, self.y = centroid
+        else:
+            self.x, self.y = int(centroid[0]), int(centroid[1])
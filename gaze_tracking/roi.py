@@ -0,0 +1,120 @@
+from collections import OrderedDict
+import numpy as np
+import cv2
+
+
+def landmark_box(landmarks, width, height):
+    """Bounding box (x0, y0, x1, y1) in pixels of normalized landmarks"""
+    x0, y0 = landmarks[:, :2].min(axis=0)
+    x1, y1 = landmarks[:, :2].max(axis=0)
+    return x0 * width, y0 * height, x1 * width, y1 * height
+
+
+class RoiTracker(object):
+    """
+    Runs a landmark detector on a crop around the face of the previous frame,
+    downscaled to at most max_side pixels, instead of on the full frame.
+
+    The crop is square and only moves when the face drifts from its center by
+    more than max_shift of the crop size, so it stays stable between frames.
+    The full frame is searched again when no face is found in the crop or the
+    face reaches its border, where it may be cut off. Landmarks are returned
+    normalized to the full frame, as the detector would return them for it.
+    """
+
+    def __init__(self, detector, margin=0.35, max_side=320, max_shift=0.15, max_sessions=64):
+        """
+        Arguments:
+            detector: Object whose process(rgb) returns (N, 3) normalized landmarks or None
+            margin (float): Space around the face box on each side, relative to its size
+            max_side (int): Crops larger than this are downscaled to it
+            max_shift (float): Face movement, relative to the crop size, that recenters the crop
+            max_sessions (int): Number of sessions whose crop is remembered
+        """
+        self.detector = detector
+        self.margin = margin
+        self.max_side = max_side
+        self.max_shift = max_shift
+        self.max_sessions = max_sessions
+        self._rois = OrderedDict()
+        self.frames = 0
+        self.detections = 0
+
+    def process(self, rgb, key=None):
+        """Detects the landmarks of a frame, in the crop of the session given by key if it has one.
+
+        Returns:
+            The (N, 3) landmarks normalized to the full frame, or None without a face
+        """
+        self.frames += 1
+        height, width = rgb.shape[:2]
+        roi = self._rois.get(key)
+        if roi is not None:
+            self._rois.move_to_end(key)
+            landmarks = self._detect_in(rgb, roi)
+            if landmarks is not None and self._covers(roi, landmarks, width, height):
+                if self._drifted(roi, landmarks, width, height):
+                    self._rois[key] = self._roi_around(landmarks, width, height)
+                return landmarks
+
+        # Lost the face, or first frame: search the full frame
+        self.detections += 1
+        landmarks = self.detector.process(rgb)
+        if landmarks is None:
+            self._rois.pop(key, None)
+            return None
+        self._rois[key] = self._roi_around(landmarks, width, height)
+        self._rois.move_to_end(key)
+        while len(self._rois) > self.max_sessions:
+            self._rois.popitem(last=False)
+        return landmarks
+
+    def redetection_rate(self):
+        """Share of frames that needed a full frame search"""
+        return self.detections / self.frames if self.frames else 0.0
+
+    def _roi_around(self, landmarks, width, height):
+        x0, y0, x1, y1 = landmark_box(landmarks, width, height)
+        side = min(max(x1 - x0, y1 - y0) * (1 + 2 * self.margin), width, height)
+        # Square crop centered on the face, shifted back inside the frame
+        left = min(max((x0 + x1 - side) / 2, 0), width - side)
+        top = min(max((y0 + y1 - side) / 2, 0), height - side)
+        return int(left), int(top), int(left + side), int(top + side)
+
+    def _detect_in(self, rgb, roi):
+        x0, y0, x1, y1 = roi
+        crop = rgb[y0:y1, x0:x1]
+        crop_w, crop_h = x1 - x0, y1 - y0
+        scale = self.max_side / max(crop_w, crop_h)
+        if scale < 1:
+            crop = cv2.resize(crop, (max(1, round(crop_w * scale)), max(1, round(crop_h * scale))),
+                              interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+        landmarks = self.detector.process(crop)
+        if landmarks is None:
+            return None
+        # Normalized to the crop; remap to the full frame
+        height, width = rgb.shape[:2]
+        remapped = np.empty_like(landmarks)
+        remapped[:, 0] = (landmarks[:, 0] * crop_w + x0) / width
+        remapped[:, 1] = (landmarks[:, 1] * crop_h + y0) / height
+        remapped[:, 2:] = landmarks[:, 2:] * (crop_w / width)
+        return remapped
+
+    def _covers(self, roi, landmarks, width, height):
+        """Whether the face lies inside the crop, off its border"""
+        x0, y0, x1, y1 = roi
+        border = (x1 - x0) * 0.02
+        fx0, fy0, fx1, fy1 = landmark_box(landmarks, width, height)
+        return fx0 >= x0 + border and fy0 >= y0 + border and fx1 <= x1 - border and fy1 <= y1 - border
+
+    def _drifted(self, roi, landmarks, width, height):
+        """Whether the face moved or changed size enough to recenter the crop"""
+        x0, y0, x1, y1 = roi
+        fx0, fy0, fx1, fy1 = landmark_box(landmarks, width, height)
+        side = x1 - x0
+        shift = max(abs((fx0 + fx1) - (x0 + x1)), abs((fy0 + fy1) - (y0 + y1))) / 2
+        expected = side / (1 + 2 * self.margin)
+        size = max(fx1 - fx0, fy1 - fy0)
+        return shift > self.max_shift * side or abs(size - expected) > self.max_shift * side
@@ -0,0 +1,203 @@
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+import threading
+import time
+
+# A frame handed out by the scheduler, with the seconds it waited since it was submitted
+ScheduledFrame = namedtuple('ScheduledFrame', ['frame', 'timestamp', 'age'])
+
+
+class FrameDropped(Exception):
+    """Raised by LatestFrameScheduler.run when a newer frame of the session replaced the frame"""
+
+
+class _Slot(object):
+    __slots__ = ('frame', 'timestamp', 'sequence', 'busy', 'condition', 'last_seen',
+                 'submitted', 'processed', 'dropped', 'last_age', 'max_age')
+
+    def __init__(self, lock):
+        self.frame = None
+        self.timestamp = None
+        self.sequence = 0
+        self.busy = False
+        self.condition = threading.Condition(lock)
+        self.last_seen = 0
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.last_age = 0
+        self.max_age = 0
+
+    def waiting(self):
+        return self.timestamp is not None
+
+
+class LatestFrameScheduler(object):
+    """
+    Keeps only the newest frame of each session waiting for inference. A frame
+    submitted while an older one still waits replaces it, and the older one is
+    dropped and counted, so a session that falls behind skips to the present
+    instead of working through a backlog. Frames of one session are processed
+    one at a time; the age of each frame when it is taken is recorded.
+
+    Frames are either submitted by a producer (e.g. a capture thread) and
+    taken by a consumer, or handed in by the thread that processes them
+    through run(). A consumer sharing sessions with run() takes frames with
+    taking(), so the two never process frames of one session at once.
+    """
+
+    def __init__(self, idle_timeout=1800, clock=time.monotonic):
+        """
+        Arguments:
+            idle_timeout (float): Seconds without frames after which the statistics of a session are dropped
+            clock: Function returning the current time in seconds
+        """
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()
+        self._dropped = 0
+        self._processed = 0
+
+    def _slot(self, key, now):
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _Slot(self._lock)
+        else:
+            self._slots.move_to_end(key)
+        slot.last_seen = now
+        # Slots are in last-seen order, so only the front can have expired
+        while self._slots:
+            old_key, old = next(iter(self._slots.items()))
+            if now - old.last_seen < self.idle_timeout or old.busy or old.waiting():
+                break
+            del self._slots[old_key]
+        return slot
+
+    def _submit(self, slot, frame, timestamp):
+        replaced = slot.waiting()
+        if replaced:
+            slot.dropped += 1
+            self._dropped += 1
+        slot.frame, slot.timestamp = frame, timestamp
+        slot.sequence += 1
+        slot.submitted += 1
+        slot.condition.notify_all()
+        return replaced
+
+    def _take(self, slot, now):
+        taken = ScheduledFrame(slot.frame, slot.timestamp, now - slot.timestamp)
+        slot.frame = slot.timestamp = None
+        slot.processed += 1
+        self._processed += 1
+        slot.last_age = taken.age
+        slot.max_age = max(slot.max_age, taken.age)
+        return taken
+
+    def submit(self, key, frame, timestamp=None):
+        """Queues a frame of a session, replacing the frame still waiting, if any.
+
+        Arguments:
+            key: Session the frame belongs to
+            frame: The frame, passed through as is
+            timestamp (float): Capture time on the scheduler's clock, now by default
+
+        Returns:
+            True if a waiting frame was dropped
+        """
+        now = self.clock()
+        with self._lock:
+            return self._submit(self._slot(key, now), frame, now if timestamp is None else timestamp)
+
+    def take(self, key, timeout=None):
+        """Takes the newest frame of a session, waiting up to timeout seconds for one.
+
+        Returns:
+            A ScheduledFrame, or None if no frame arrived in time
+        """
+        with self._lock:
+            slot = self._slot(key, self.clock())
+            if not slot.condition.wait_for(slot.waiting, timeout):
+                return None
+            return self._take(slot, self.clock())
+
+    @contextmanager
+    def taking(self, key, timeout=None):
+        """Takes the newest frame of a session like take, once the frame being
+        processed for the session is done, and keeps the session busy until the
+        block ends.
+
+        Arguments:
+            key: Session the frame belongs to
+            timeout (float): Seconds to wait for a frame once the session is free
+
+        Yields:
+            A ScheduledFrame, or None if no frame arrived in time
+        """
+        with self._lock:
+            slot = self._slot(key, self.clock())
+            slot.condition.wait_for(lambda: not slot.busy)
+            taken = None
+            if slot.condition.wait_for(lambda: slot.waiting() and not slot.busy, timeout):
+                taken = self._take(slot, self.clock())
+                slot.busy = True
+        try:
+            yield taken
+        finally:
+            if taken is not None:
+                with self._lock:
+                    slot.busy = False
+                    slot.condition.notify_all()
+
+    def run(self, key, frame, process, timestamp=None):
+        """Processes a frame once the previous frame of its session is done.
+
+        Meant for servers where each frame arrives in its own thread. While the
+        frame waits, a newer frame of the session replaces it and it is dropped.
+
+        Arguments:
+            key: Session the frame belongs to
+            frame: The frame, passed to process
+            process: Function called with the frame
+            timestamp (float): Capture time on the scheduler's clock, now by default
+
+        Returns:
+            The result of process and the seconds the frame waited
+
+        Raises:
+            FrameDropped: If a newer frame of the session replaced this one
+        """
+        now = self.clock()
+        with self._lock:
+            slot = self._slot(key, now)
+            self._submit(slot, frame, now if timestamp is None else timestamp)
+            sequence = slot.sequence
+            slot.condition.wait_for(lambda: not slot.busy or slot.sequence != sequence)
+            if slot.sequence != sequence or not slot.waiting():
+                raise FrameDropped()
+            taken = self._take(slot, self.clock())
+            slot.busy = True
+        try:
+            return process(taken.frame), taken.age
+        finally:
+            with self._lock:
+                slot.busy = False
+                slot.condition.notify_all()
+
+    def stats(self, key=None):
+        """Counters of one session, or totals over all sessions if key is None.
+
+        depth is the number of frames waiting, ages are in seconds.
+        """
+        with self._lock:
+            if key is not None:
+                slot = self._slots.get(key)
+                if slot is None:
+                    return {'submitted': 0, 'processed': 0, 'dropped': 0, 'depth': 0, 'last_age': 0, 'max_age': 0}
+                return {'submitted': slot.submitted, 'processed': slot.processed, 'dropped': slot.dropped,
+                        'depth': int(slot.waiting()), 'last_age': slot.last_age, 'max_age': slot.max_age}
+            slots = self._slots.values()
+            return {'sessions': len(self._slots), 'processed': self._processed, 'dropped': self._dropped,
+                    'depth': sum(slot.waiting() for slot in slots),
+                    'busy': sum(slot.busy for slot in slots),
+                    'max_age': max((slot.max_age for slot in slots), default=0)}
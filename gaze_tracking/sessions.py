@@ -0,0 +1,86 @@
+from collections import OrderedDict
+import threading
+import time
+
+# Token used by clients that do not send one, so single-user clients keep working
+DEFAULT_TOKEN = "default"
+MAX_TOKEN_LENGTH = 64
+
+
+class KeyboardSession(object):
+    """
+    Keyboard state of one client. Slots keep each session small when a
+    server hosts many of them.
+    """
+
+    __slots__ = ('text', 'last_committed', 'letter_index', 'suggest_active', 'force_suggest_mode', 'last_action',
+                 'tracking_active', 'gaze_sensitivity', 'last_seen', 'lock')
+
+    def __init__(self, gaze_sensitivity=0.7):
+        self.text = ""
+        # Text up to the last word recorded in the personal dictionary, so it is recorded once
+        self.last_committed = None
+        self.letter_index = 0
+        self.suggest_active = False
+        self.force_suggest_mode = False
+        self.last_action = time.time()
+        self.tracking_active = False
+        self.gaze_sensitivity = gaze_sensitivity
+        self.last_seen = time.monotonic()
+        # Serializes the requests of one client, e.g. frames and clicks arriving together
+        self.lock = threading.Lock()
+
+
+class SessionRegistry(object):
+    """
+    Sessions keyed by client token, kept in least recently used order.
+    Sessions idle for longer than the timeout, and the oldest ones beyond
+    max_sessions, are evicted as other sessions are looked up.
+    """
+
+    def __init__(self, idle_timeout=1800, max_sessions=10000, factory=KeyboardSession):
+        """
+        Arguments:
+            idle_timeout (float): Seconds without requests after which a session is dropped
+            max_sessions (int): Number of sessions kept at most
+            factory: Callable creating the state of a new session
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.factory = factory
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token=None):
+        """Returns the session of a token, creating it if needed.
+
+        Tokens are truncated to MAX_TOKEN_LENGTH characters.
+        """
+        token = (token or DEFAULT_TOKEN)[:MAX_TOKEN_LENGTH]
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                session = self._sessions[token] = self.factory()
+            else:
+                self._sessions.move_to_end(token)
+            session.last_seen = now
+            self._evict(now)
+        return session
+
+    def _evict(self, now):
+        sessions = self._sessions
+        while len(sessions) > self.max_sessions:
+            sessions.popitem(last=False)
+        # Sessions are in last-seen order, so only the front can have expired
+        while sessions:
+            token, session = next(iter(sessions.items()))
+            if now - session.last_seen < self.idle_timeout:
+                break
+            del sessions[token]
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, token):
+        return token in self._sessions
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+MAGIC = b"GZSNAP"
+FORMAT_VERSION = 1
+
+# Magic, format version and length of the JSON header that follows
+_PREAMBLE = struct.Struct("<6sHI")
+_ALIGNMENT = 64
+
+
+def fingerprint(paths):
+    """Returns a checksum of the given files and directories.
+
+    Directories are walked recursively. Only names, sizes and modification
+    times are hashed, so fingerprinting a corpus is cheap.
+
+    Args:
+        paths: Files or directories to fingerprint
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for name in files:
+            stat = os.stat(name)
+            digest.update(f"{os.path.relpath(name, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def content_checksum(path):
+    """Returns a checksum of the content of a file, or None if there is no file."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def write_snapshot(path, arrays, metadata):
+    """Writes arrays into a single versioned binary snapshot file.
+
+    The file starts with a small JSON header describing every array, followed
+    by the raw array data aligned so it can be memory-mapped back.
+
+    Args:
+        path: Destination file, replaced atomically
+        arrays: Mapping of names to numpy arrays
+        metadata: JSON-serializable values stored in the header
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({'metadata': metadata, 'arrays': layout}).encode()
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path):
+    """Memory-maps a snapshot file.
+
+    Args:
+        path: Snapshot file written by write_snapshot
+
+    Returns:
+        A (metadata, arrays) tuple where the arrays are read-only views into
+        the mapped file, or None if the file is missing or has another format version.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, header_size = _PREAMBLE.unpack_from(buffer)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        buffer.close()
+        return None
+
+    header = json.loads(buffer[_PREAMBLE.size:_PREAMBLE.size + header_size])
+    data_start = _align(_PREAMBLE.size + header_size)
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec['offset'])
+        arrays[name] = array.reshape(spec['shape'])
+    return header['metadata'], arrays
@@ -1,23 +1,30 @@
+import argparse
 import cv2
-import mediapipe as mp
 import numpy as np
 import time
-import pygame
-import pyttsx3
 import threading
-from gaze_tracking.predictor import WordPredictor  # Use correct folder name here
-
-# Initialize TTS and sound
-engine = pyttsx3.init()
-pygame.init()
+from collections import namedtuple
+from functools import lru_cache
+try:
+    import pygame
+    PYGAME_AVAILABLE = True
+except ImportError:
+    PYGAME_AVAILABLE = False
 try:
-    click_sound = pygame.mixer.Sound("click.wav")
-except:
-    click_sound = None
+    import pyttsx3
+    PYTTSX3_AVAILABLE = True
+except ImportError:
+    PYTTSX3_AVAILABLE = False
+from gaze_tracking.predictor import WordPredictor  # Use correct folder name here
+from gaze_tracking.landmarks import MESH_LAYOUT, pixel_landmarks, eye_features
+from gaze_tracking.backends import BACKENDS
+from gaze_tracking.roi import RoiTracker
+from gaze_tracking.capture import open_source, FrameCapture
+from gaze_tracking.pipeline import BufferPool, DropQueue, Stage, TimingHistogram
 
-# MediaPipe face mesh
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(refine_landmarks=True, max_num_faces=1)
+# TTS engine and click sound, set up by main() unless running headless
+engine = None
+click_sound = None
 
 # Modern UI Colors - Soft purple theme
 BG_COLOR = (250, 245, 255)  # Light lavender background
@@ -28,6 +35,11 @@ TEXT_COLOR = (90, 70, 120)  # Dark purple text
 HEADER_COLOR = (150, 100, 180)  # Accent color for headers
 TEXT_AREA_BG = (245, 240, 255)  # Slightly different background for text area
 
+# Colors of the interface; the static layers of the screen are cached per theme
+Theme = namedtuple('Theme', ['background', 'key_inactive', 'key_active', 'key_border', 'text', 'header',
+                             'text_area_background'])
+DEFAULT_THEME = Theme(BG_COLOR, KEY_INACTIVE, KEY_ACTIVE, KEY_BORDER, TEXT_COLOR, HEADER_COLOR, TEXT_AREA_BG)
+
 # Keyboard setup with suggestion key added
 keys_set = [
     "1", "2", "3", "4", "5", "6", "7", "8", "9", "0",
@@ -41,58 +53,29 @@ keys_set = [
 DEFAULT_SCREEN_WIDTH = 1280
 DEFAULT_SCREEN_HEIGHT = 720
 
-# Initialize video capture first to help with resolution detection
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    print("Error: Could not open camera.")
-    exit()
-
-# Get camera resolution to help determine screen size
-ret, frame = cap.read()
-if ret:
-    cam_height, cam_width = frame.shape[:2]
-    print(f"Camera resolution: {cam_width}x{cam_height}")
-    # Use camera resolution as minimum screen size
-    DEFAULT_SCREEN_WIDTH = max(DEFAULT_SCREEN_WIDTH, cam_width)
-    DEFAULT_SCREEN_HEIGHT = max(DEFAULT_SCREEN_HEIGHT, cam_height)
-
-# Create main window
-cv2.namedWindow("Gaze Keyboard", cv2.WINDOW_NORMAL)
-cv2.setWindowProperty("Gaze Keyboard", cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-
-# Try to get screen dimensions from pygame as a more reliable source
-pygame.display.init()
-info = pygame.display.Info()
-SCREEN_WIDTH = info.current_w
-SCREEN_HEIGHT = info.current_h
-
-# Fallback if pygame doesn't work
-if SCREEN_WIDTH <= 0 or SCREEN_HEIGHT <= 0:
-    print("Using default dimensions")
-    SCREEN_WIDTH = DEFAULT_SCREEN_WIDTH
-    SCREEN_HEIGHT = DEFAULT_SCREEN_HEIGHT
-
-print(f"Screen dimensions: {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
-
 # Adjust these values to maintain proportions
 KEYBOARD_HEIGHT_RATIO = 0.40  # 40% of the total height
-TEXT_AREA_HEIGHT_RATIO = 0.15  # 15% of the total height 
+TEXT_AREA_HEIGHT_RATIO = 0.15  # 15% of the total height
 WEBCAM_HEIGHT_RATIO = 0.45  # 45% of the total height
 
-# Calculate component heights
-KEYBOARD_HEIGHT = int(SCREEN_HEIGHT * KEYBOARD_HEIGHT_RATIO)
-TEXT_AREA_HEIGHT = int(SCREEN_HEIGHT * TEXT_AREA_HEIGHT_RATIO)
-WEBCAM_HEIGHT = int(SCREEN_HEIGHT * WEBCAM_HEIGHT_RATIO)
+# Frames in flight between the stages: one being analyzed, one in each queue,
+# one in the input stage and one being drawn
+FRAMES_IN_FLIGHT = 5
+
+# Eye features of a mirrored camera frame; ear and iris_ratio are None without a face
+Observation = namedtuple('Observation', ['frame', 'timestamp', 'ear', 'iris_ratio'])
 
-# Initialize UI components with dynamic sizes
-keyboard = np.zeros((KEYBOARD_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
+# What the compositor draws: the frame and a snapshot of the keyboard state
+KeyboardView = namedtuple('KeyboardView', ['frame', 'timestamp', 'text', 'letter_index', 'suggestions',
+                                           'suggest_active', 'force_suggest_mode', 'last_spoken_suggestion',
+                                           'status_text', 'status_color', 'ear_value'])
 
 # TTS Functions for threading
 def speak_text(text_to_speak):
     """Speak text in a separate thread to avoid blocking the UI"""
-    if not text_to_speak:
+    if not text_to_speak or engine is None:
         return
-    
+
     engine.stop()  # Stop any current speech
     engine.say(text_to_speak)
     engine.runAndWait()
@@ -103,68 +86,8 @@ def speak_async(text_to_speak):
     speech_thread.daemon = True  # Thread will close when main program exits
     speech_thread.start()
 
-def draw_key(index, text, is_active):
-    # Calculate key dimensions based on screen width and keyboard height
-    key_width = SCREEN_WIDTH // 10
-    key_height = KEYBOARD_HEIGHT // 4
-    
-    x = (index % 10) * key_width
-    y = (index // 10) * key_height
-    
-    padding = int(key_width * 0.08)  # 8% padding
-    
-    # Draw key with rounded corners
-    color = KEY_ACTIVE if is_active else KEY_INACTIVE
-    
-    # Main key rectangle
-    cv2.rectangle(keyboard, 
-                 (x+padding, y+padding), 
-                 (x+key_width-padding, y+key_height-padding), 
-                 color, -1)
-    
-    # Add subtle shadow effect
-    if not is_active:
-        cv2.rectangle(keyboard, 
-                     (x+padding, y+padding), 
-                     (x+key_width-padding, y+key_height-padding), 
-                     KEY_BORDER, 2)
-    else:
-        # Highlight effect for active key
-        cv2.rectangle(keyboard, 
-                     (x+padding-2, y+padding-2), 
-                     (x+key_width-padding+2, y+key_height-padding+2), 
-                     (150, 120, 200), 2)
-    
-    # Text with better positioning
-    font = cv2.FONT_HERSHEY_DUPLEX  # More modern font
-    
-    # Scale font based on key size
-    font_scale = min(key_width, key_height) / 100.0
-    scale = font_scale * (1.2 if len(text) == 1 else 0.9)
-    
-    text_size = cv2.getTextSize(text, font, scale, 1)[0]
-    text_x = x + (key_width - text_size[0]) // 2
-    text_y = y + (key_height + text_size[1]) // 2
-    
-    # Text with subtle shadow for depth
-    if is_active:
-        cv2.putText(keyboard, text, (text_x+1, text_y+1), font, scale, (120, 100, 160), 1)
-    cv2.putText(keyboard, text, (text_x, text_y), font, scale, TEXT_COLOR, 1)
-
-def calculate_ear(landmarks, indices):
-    p = [np.array([landmarks[i][0], landmarks[i][1]]) for i in indices]
-    A = np.linalg.norm(p[1] - p[5])
-    B = np.linalg.norm(p[2] - p[4])
-    C = np.linalg.norm(p[0] - p[3])
-    return (A + B) / (2.0 * C)
-
-def get_gaze(landmarks):
-    left = [landmarks[i] for i in [33, 133]]
-    right = [landmarks[i] for i in [362, 263]]
-    left_iris = landmarks[468]
-    right_iris = landmarks[473]
-    pos = lambda eye, iris: (iris[0] - eye[0][0]) / (eye[1][0] - eye[0][0] + 1e-6)
-    avg = (pos(left, left_iris) + pos(right, right_iris)) / 2
+def get_gaze(avg):
+    """Gaze direction from the mean iris position of both eyes (see eye_features)"""
     if avg < 0.4: return "RIGHT"
     elif avg > 0.6: return "LEFT"
     return "CENTER"
@@ -173,15 +96,15 @@ def create_rounded_rectangle(img, top_left, bottom_right, color, thickness, radi
     """Draw a rectangle with rounded corners"""
     x1, y1 = top_left
     x2, y2 = bottom_right
-    
+
     # If radius is None, calculate based on rectangle size
     if radius is None:
         radius = min(int((x2-x1) * 0.05), int((y2-y1) * 0.05), 20)  # Max 20px radius
-    
+
     # Draw main rectangle
     cv2.rectangle(img, (x1+radius, y1), (x2-radius, y2), color, thickness)
     cv2.rectangle(img, (x1, y1+radius), (x2, y2-radius), color, thickness)
-    
+
     # Draw the corners
     if thickness == -1:  # Filled rectangle
         cv2.circle(img, (x1+radius, y1+radius), radius, color, thickness)
@@ -194,168 +117,393 @@ def create_rounded_rectangle(img, top_left, bottom_right, color, thickness, radi
         cv2.circle(img, (x1+radius, y2-radius), radius, color, thickness)
         cv2.circle(img, (x2-radius, y2-radius), radius, color, thickness)
 
-# Predictor
-predictor = WordPredictor()
-suggestions = ["", "", ""]
-last_spoken_suggestion = ""  # Track last spoken suggestion to avoid repetition
-
-text = ""
-letter_index = 0
-blink_counter = 0
-last_action = time.time()
-cooldown = 0.4
-suggest_active = False
-force_suggest_mode = False  # New flag for direct word suggestion mode
-
-# Status indicators
-status_text = "Ready"
-status_color = (100, 180, 100)  # Green by default
-
-while True:
-    ret, frame = cap.read()
-    if not ret: break
-    frame = cv2.flip(frame, 1)
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = face_mesh.process(rgb)
-
-    frame_h, frame_w = frame.shape[:2]
-    current_time = time.time()
-    
-    # Reset status each loop
-    status_text = "Ready"
-    status_color = (100, 180, 100)
-    ear_value = 0
-
-    if results.multi_face_landmarks:
-        landmarks = results.multi_face_landmarks[0]
-        coords = [(int(p.x * frame_w), int(p.y * frame_h)) for p in landmarks.landmark]
-
-        left_ear = calculate_ear(coords, [362, 385, 387, 263, 373, 380])
-        right_ear = calculate_ear(coords, [33, 160, 158, 133, 153, 144])
-        ear = (left_ear + right_ear) / 2
-        ear_value = ear
-
-        # Update status based on eye state
-        if ear < 0.23:
-            status_text = "Blink Detected"
-            status_color = (50, 150, 250)  # Blue for blink
-            blink_counter += 1
+
+class KeyboardInput(object):
+    """
+    Blink and gaze state machine of the keyboard: moves the focus when the
+    user looks left or right, types the focused key or suggestion on a blink,
+    and keeps the word suggestions up to date.
+    """
+
+    def __init__(self, predictor, speak=speak_async, click_sound=None):
+        self.predictor = predictor
+        self.speak = speak
+        self.click_sound = click_sound
+        self.suggestions = ["", "", ""]
+        self.last_spoken_suggestion = ""  # Track last spoken suggestion to avoid repetition
+        self.text = ""
+        # Text up to the last word recorded in the personal dictionary, so it is recorded once
+        self.last_committed = None
+        self.letter_index = 0
+        self.blink_counter = 0
+        self.last_action = time.monotonic()
+        self.cooldown = 0.4
+        self.suggest_active = False
+        self.force_suggest_mode = False  # New flag for direct word suggestion mode
+        self.gaze = "CENTER"
+
+    def commit_last_word(self):
+        """Record the last word of the text, and the word before it, in the personal dictionary,
+        unless it was recorded already, e.g. a picked suggestion followed by a space"""
+        text = self.text.rstrip()
+        if text == self.last_committed:
+            return
+        words = text.split()
+        if words:
+            self.predictor.add_to_dictionary(words[-1], words[-2] if len(words) >= 2 else None)
+            self.last_committed = text
+
+    def speak_suggestion(self):
+        """Speak the focused suggestion if it is new"""
+        if self.letter_index < len(self.suggestions) and self.suggestions[self.letter_index]:
+            current_suggestion = self.suggestions[self.letter_index]
+            if current_suggestion != self.last_spoken_suggestion:
+                self.speak(current_suggestion)
+                self.last_spoken_suggestion = current_suggestion
+
+    def update(self, ear, iris_ratio, current_time):
+        """Applies the eye features of a frame captured at current_time (time.monotonic).
+
+        Returns:
+            The status text and color to display
+        """
+        # Reset status each frame
+        status_text = "Ready"
+        status_color = (100, 180, 100)  # Green by default
+
+        if ear is not None:
+            # Update status based on eye state
+            if ear < 0.23:
+                status_text = "Blink Detected"
+                status_color = (50, 150, 250)  # Blue for blink
+                self.blink_counter += 1
+            else:
+                self.gaze = get_gaze(iris_ratio)
+                if self.gaze == "LEFT":
+                    status_text = "Looking Left"
+                    status_color = (180, 120, 200)  # Purple for left
+                elif self.gaze == "RIGHT":
+                    status_text = "Looking Right"
+                    status_color = (180, 120, 200)  # Purple for right
+
+                # Process blinks
+                if self.blink_counter >= 1 and current_time - self.last_action > self.cooldown:
+                    print("Blink Detected ✅")
+                    self.select()
+                    self.last_action = current_time
+                self.blink_counter = 0
+
+            # Process gaze direction for navigation
+            if current_time - self.last_action > 0.3:
+                if self.gaze == "LEFT":
+                    self.letter_index = max(self.letter_index - 1, 0)
+                    self.last_action = current_time
+
+                    # Speak the new suggestion when navigating in suggestion mode
+                    if self.suggest_active or self.force_suggest_mode:
+                        self.speak_suggestion()
+
+                elif self.gaze == "RIGHT":
+                    max_index = 2 if (self.suggest_active or self.force_suggest_mode) else len(keys_set) - 1
+                    self.letter_index = min(self.letter_index + 1, max_index)
+                    self.last_action = current_time
+
+                    # Speak the new suggestion when navigating in suggestion mode
+                    if self.suggest_active or self.force_suggest_mode:
+                        self.speak_suggestion()
+
+        # Check for regular suggestion mode (after space)
+        self.suggest_active = self.text.endswith(" ")
+
+        # Get word suggestions - either for space-triggered or forced suggestion mode
+        if self.suggest_active or self.force_suggest_mode:
+            self.suggest()
+            # Speak the currently focused suggestion if it's new
+            self.speak_suggestion()
         else:
-            gaze = get_gaze(coords)
-            if gaze == "LEFT":
-                status_text = "Looking Left"
-                status_color = (180, 120, 200)  # Purple for left
-            elif gaze == "RIGHT":
-                status_text = "Looking Right"
-                status_color = (180, 120, 200)  # Purple for right
-                
-            # Process blinks
-            if blink_counter >= 1 and current_time - last_action > cooldown:
-                print("Blink Detected ✅")
-                if suggest_active or force_suggest_mode:
-                    # Handle suggestion selection
-                    if letter_index < len(suggestions) and suggestions[letter_index]:
-                        # If in force suggest mode, replace the current word being typed
-                        if force_suggest_mode and text:
-                            # Split text into words
-                            words = text.split(' ')
-                            # If there's at least one word and it's not just a space
-                            if words and words[-1]:
-                                # Replace the last word with the suggestion
-                                words[-1] = suggestions[letter_index]
-                                text = ' '.join(words)
-                            else:
-                                # Just add the suggestion if there's no current word
-                                text += suggestions[letter_index]
-                        else:
-                            # Regular space-triggered suggestion mode
-                            text += " " + suggestions[letter_index % 3]
-                        
-                        # Disable force suggest mode after selection
-                        force_suggest_mode = False
-                else:
-                    key = keys_set[letter_index]
-                    if key == "←":
-                        text = text[:-1]
-                    elif key == "_":
-                        text += " "
-                    elif key == "🔊":
-                        speak_async(text.strip())
-                    elif key == "💬":  # New direct suggest button
-                        if text:  # Only activate if there's text
-                            force_suggest_mode = True
-                            print("Direct suggestion mode activated")
+            # Reset last spoken suggestion when not in suggestion mode
+            self.last_spoken_suggestion = ""
+        return status_text, status_color
+
+    def select(self):
+        """Types the focused key or suggestion"""
+        if self.suggest_active or self.force_suggest_mode:
+            # Handle suggestion selection
+            if self.letter_index < len(self.suggestions) and self.suggestions[self.letter_index]:
+                # If in force suggest mode, replace the current word being typed
+                if self.force_suggest_mode and self.text:
+                    # Split text into words
+                    words = self.text.split(' ')
+                    # If there's at least one word and it's not just a space
+                    if words and words[-1]:
+                        # Replace the last word with the suggestion
+                        words[-1] = self.suggestions[self.letter_index]
+                        self.text = ' '.join(words)
                     else:
-                        text += key
-                    if click_sound: click_sound.play()
-                last_action = current_time
-            blink_counter = 0
-
-        # Process gaze direction for navigation
-        if current_time - last_action > 0.3:
-            if gaze == "LEFT":
-                letter_index = max(letter_index - 1, 0)
-                last_action = current_time
-                
-                # Speak the new suggestion when navigating in suggestion mode
-                if (suggest_active or force_suggest_mode) and letter_index < len(suggestions) and suggestions[letter_index]:
-                    current_suggestion = suggestions[letter_index]
-                    if current_suggestion != last_spoken_suggestion:
-                        speak_async(current_suggestion)
-                        last_spoken_suggestion = current_suggestion
-                
-            elif gaze == "RIGHT":
-                max_index = 2 if (suggest_active or force_suggest_mode) else len(keys_set) - 1
-                letter_index = min(letter_index + 1, max_index)
-                last_action = current_time
-                
-                # Speak the new suggestion when navigating in suggestion mode
-                if (suggest_active or force_suggest_mode) and letter_index < len(suggestions) and suggestions[letter_index]:
-                    current_suggestion = suggestions[letter_index]
-                    if current_suggestion != last_spoken_suggestion:
-                        speak_async(current_suggestion)
-                        last_spoken_suggestion = current_suggestion
-
-    # Draw keyboard with enhanced UI - recreate for proper scaling
-    keyboard = np.zeros((KEYBOARD_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
-    keyboard[:] = BG_COLOR
-    
-    # Check for regular suggestion mode (after space)
-    suggest_active = text and text[-1] == " "
-    
-    # Add subtle background pattern - scale with screen size
-    pattern_spacing = max(int(SCREEN_WIDTH / 30), 1)  # Ensure pattern_spacing is at least 1
-    for i in range(0, SCREEN_WIDTH, pattern_spacing):
-        cv2.line(keyboard, (i, 0), (i, KEYBOARD_HEIGHT), (245, 240, 250), 1)
-    for i in range(0, KEYBOARD_HEIGHT, pattern_spacing):
-        cv2.line(keyboard, (0, i), (SCREEN_WIDTH, i), (245, 240, 250), 1)
-    
-    # Get word suggestions - either for space-triggered or forced suggestion mode
-    if suggest_active or force_suggest_mode:
+                        # Just add the suggestion if there's no current word
+                        self.text += self.suggestions[self.letter_index]
+                else:
+                    # Regular space-triggered suggestion mode
+                    self.text += " " + self.suggestions[self.letter_index % 3]
+                self.commit_last_word()
+
+                # Disable force suggest mode after selection
+                self.force_suggest_mode = False
+        else:
+            key = keys_set[self.letter_index]
+            if key == "←":
+                self.text = self.text[:-1]
+            elif key == "_":
+                self.commit_last_word()
+                self.text += " "
+            elif key == "🔊":
+                self.speak(self.text.strip())
+            elif key == "💬":  # New direct suggest button
+                if self.text:  # Only activate if there's text
+                    self.force_suggest_mode = True
+                    print("Direct suggestion mode activated")
+            else:
+                self.text += key
+            if self.click_sound: self.click_sound.play()
+
+    def suggest(self):
+        """Updates the three word suggestions for the text"""
         # Get the relevant words for suggestions
-        words = text.strip().split(" ")
-        
-        if force_suggest_mode and words:
+        words = self.text.strip().split(" ")
+
+        if self.force_suggest_mode and words:
             # In direct suggestion mode, get the current partial word being typed
             current_partial = words[-1] if words else ""
             context = words[-2] if len(words) >= 2 else ""
-            
+
             # Get suggestions for the current partial word
-            suggestions = predictor.suggest(current_partial, context)
+            suggestions = self.predictor.suggest(current_partial, context)
         else:
             # Regular space-triggered suggestion mode
             context = words[-2] if len(words) >= 2 else ""
             current_word = words[-1] if words else ""
-            suggestions = predictor.suggest(current_word, context)
-        
+            suggestions = self.predictor.suggest(current_word, context)
+
         # Ensure we have 3 suggestions
-        suggestions += [""] * (3 - len(suggestions))
-        
-        # Speak the currently focused suggestion if it's new
-        if letter_index < len(suggestions) and suggestions[letter_index] and suggestions[letter_index] != last_spoken_suggestion:
-            speak_async(suggestions[letter_index])
-            last_spoken_suggestion = suggestions[letter_index]
-        
+        self.suggestions = suggestions + [""] * (3 - len(suggestions))
+
+    def view(self, frame, timestamp, status_text, status_color, ear_value):
+        """Snapshot of the state for the compositor"""
+        return KeyboardView(frame, timestamp, self.text, self.letter_index, tuple(self.suggestions),
+                            self.suggest_active, self.force_suggest_mode, self.last_spoken_suggestion,
+                            status_text, status_color, ear_value)
+
+
+# Prebuilt parts of the screen for one screen size, camera frame size and theme:
+# the keyboard background, the keyboard with every key inactive and with every
+# key active (sprite sheets of the keys), the empty text area, the webcam panel
+# without the webcam, and where the webcam goes in it as (x, y, width, height)
+RenderLayers = namedtuple('RenderLayers', ['keyboard_grid', 'keys_inactive', 'keys_active', 'text_area',
+                                           'webcam', 'webcam_box'])
+
+
+@lru_cache(maxsize=8)
+def render_layers(screen_width, screen_height, frame_width, frame_height, theme=DEFAULT_THEME):
+    """Static layers and key sprites of the screen, drawn once per screen size, frame size and theme"""
+    return KeyboardRenderer(screen_width, screen_height, theme).draw_layers(frame_width, frame_height)
+
+
+class KeyboardRenderer(object):
+    """
+    Draws the webcam view, the keyboard and the text area for a screen size.
+
+    Everything that does not change between frames comes from the cached
+    render_layers. Each frame only the webcam image is drawn; the keys whose
+    highlight changed are copied from the key sprites, and the text and the
+    status line are drawn again only when they change.
+
+    The screen is one preallocated canvas and the three parts are views of
+    it, so once the first frame is drawn, frames allocate no image memory.
+    """
+
+    def __init__(self, screen_width, screen_height, theme=DEFAULT_THEME):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.theme = theme
+
+        # Calculate component heights
+        self.keyboard_height = int(screen_height * KEYBOARD_HEIGHT_RATIO)
+        self.text_area_height = int(screen_height * TEXT_AREA_HEIGHT_RATIO)
+        self.webcam_height = int(screen_height * WEBCAM_HEIGHT_RATIO)
+
+        # Key dimensions based on screen width and keyboard height
+        self.key_width = screen_width // 10
+        self.key_height = self.keyboard_height // 4
+        # The text area is redrawn in two parts: the text field above this row and the status line below it
+        self.status_row = (int(self.text_area_height * 0.6) + int(self.text_area_height * 0.7)) // 2
+
+        # The screen, with the webcam panel, the keyboard and the text area stacked as views of it
+        self.canvas = np.empty((self.webcam_height + self.keyboard_height + self.text_area_height,
+                                screen_width, 3), np.uint8)
+        self.frame_bg = self.canvas[:self.webcam_height]
+        self.keyboard = self.canvas[self.webcam_height:self.webcam_height + self.keyboard_height]
+        self.text_area = self.canvas[self.webcam_height + self.keyboard_height:]
+
+        # Layers the parts were drawn from and what they show
+        self.layers = None
+        self.keyboard_state = self.text_state = self.status_state = None
+        self.caption = ""
+        self.caption_box = None
+
+    def draw_key(self, keyboard, index, text, is_active):
+        key_width = self.key_width
+        key_height = self.key_height
+
+        x = (index % 10) * key_width
+        y = (index // 10) * key_height
+
+        padding = int(key_width * 0.08)  # 8% padding
+
+        # Draw key with rounded corners
+        color = self.theme.key_active if is_active else self.theme.key_inactive
+
+        # Main key rectangle
+        cv2.rectangle(keyboard,
+                     (x+padding, y+padding),
+                     (x+key_width-padding, y+key_height-padding),
+                     color, -1)
+
+        # Add subtle shadow effect
+        if not is_active:
+            cv2.rectangle(keyboard,
+                         (x+padding, y+padding),
+                         (x+key_width-padding, y+key_height-padding),
+                         self.theme.key_border, 2)
+        else:
+            # Highlight effect for active key
+            cv2.rectangle(keyboard,
+                         (x+padding-2, y+padding-2),
+                         (x+key_width-padding+2, y+key_height-padding+2),
+                         (150, 120, 200), 2)
+
+        # Text with better positioning
+        font = cv2.FONT_HERSHEY_DUPLEX  # More modern font
+
+        # Scale font based on key size
+        font_scale = min(key_width, key_height) / 100.0
+        scale = font_scale * (1.2 if len(text) == 1 else 0.9)
+
+        text_size = cv2.getTextSize(text, font, scale, 1)[0]
+        text_x = x + (key_width - text_size[0]) // 2
+        text_y = y + (key_height + text_size[1]) // 2
+
+        # Text with subtle shadow for depth
+        if is_active:
+            cv2.putText(keyboard, text, (text_x+1, text_y+1), font, scale, (120, 100, 160), 1)
+        cv2.putText(keyboard, text, (text_x, text_y), font, scale, self.theme.text, 1)
+
+    def key_cell(self, index):
+        """Slice of the keyboard image covering a key"""
+        x = (index % 10) * self.key_width
+        y = (index // 10) * self.key_height
+        return slice(y, y + self.key_height), slice(x, x + self.key_width)
+
+    def webcam_box(self, frame_w, frame_h):
+        """Position and size (x, y, width, height) of the webcam image in its panel"""
+        SCREEN_WIDTH, WEBCAM_HEIGHT = self.screen_width, self.webcam_height
+
+        # Calculate webcam size while maintaining aspect ratio
+        webcam_max_height = int(WEBCAM_HEIGHT * 0.9)
+        webcam_max_width = int(SCREEN_WIDTH * 0.6)
+
+        # Calculate dimensions while maintaining aspect ratio
+        frame_aspect = frame_w / frame_h
+        if webcam_max_width / webcam_max_height > frame_aspect:
+            # Height is the limiting factor
+            disp_height = webcam_max_height
+            disp_width = int(disp_height * frame_aspect)
+        else:
+            # Width is the limiting factor
+            disp_width = webcam_max_width
+            disp_height = int(disp_width / frame_aspect)
+
+        # Center the frame
+        x_offset = (SCREEN_WIDTH - disp_width) // 2
+        y_offset = (WEBCAM_HEIGHT - disp_height) // 2
+        return x_offset, y_offset, disp_width, disp_height
+
+    def draw_layers(self, frame_w, frame_h):
+        """Draws the RenderLayers of this screen; use render_layers to get them cached"""
+        SCREEN_WIDTH, SCREEN_HEIGHT, KEYBOARD_HEIGHT = self.screen_width, self.screen_height, self.keyboard_height
+        TEXT_AREA_HEIGHT, WEBCAM_HEIGHT = self.text_area_height, self.webcam_height
+        theme = self.theme
+
+        # Keyboard background with a subtle pattern - scale with screen size
+        keyboard_grid = np.zeros((KEYBOARD_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
+        keyboard_grid[:] = theme.background
+        pattern_spacing = max(int(SCREEN_WIDTH / 30), 1)  # Ensure pattern_spacing is at least 1
+        for i in range(0, SCREEN_WIDTH, pattern_spacing):
+            cv2.line(keyboard_grid, (i, 0), (i, KEYBOARD_HEIGHT), (245, 240, 250), 1)
+        for i in range(0, KEYBOARD_HEIGHT, pattern_spacing):
+            cv2.line(keyboard_grid, (0, i), (SCREEN_WIDTH, i), (245, 240, 250), 1)
+
+        # All keys in one state, with the instruction header drawn over the first row
+        keys = []
+        for is_active in (False, True):
+            keyboard = keyboard_grid.copy()
+            for i in range(len(keys_set)):
+                self.draw_key(keyboard, i, keys_set[i], is_active)
+
+            # Instruction header with nicer styling - scale with screen
+            header_height = int(KEYBOARD_HEIGHT * 0.1)
+            cv2.rectangle(keyboard, (0, 0), (SCREEN_WIDTH, header_height), (180, 155, 220), -1)
+            font_scale = max(SCREEN_HEIGHT / 1080 * 0.8, 0.5)  # Minimum scale of 0.5
+            instruction = "Look left/right to move, blink to select"
+            text_size = cv2.getTextSize(instruction, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)[0]
+            text_x = (SCREEN_WIDTH - text_size[0]) // 2  # Center text
+            cv2.putText(keyboard, instruction,
+                       (text_x, int(header_height * 0.7)),
+                       cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), 1)
+            keys.append(keyboard)
+
+        # Empty text area with the text input field
+        text_area = np.zeros((TEXT_AREA_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
+        text_area[:] = theme.text_area_background
+        padding_x = int(SCREEN_WIDTH * 0.02)
+        padding_y = int(TEXT_AREA_HEIGHT * 0.15)
+        create_rounded_rectangle(text_area,
+                                (padding_x, padding_y),
+                                (SCREEN_WIDTH - padding_x, int(TEXT_AREA_HEIGHT * 0.6)),
+                                (255, 255, 255), -1)
+        create_rounded_rectangle(text_area,
+                                (padding_x, padding_y),
+                                (SCREEN_WIDTH - padding_x, int(TEXT_AREA_HEIGHT * 0.6)),
+                                theme.key_border, 2)
+
+        # Webcam panel with its border, title and exit hint
+        webcam = np.zeros((WEBCAM_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
+        webcam[:] = theme.background
+        x_offset, y_offset, disp_width, disp_height = self.webcam_box(frame_w, frame_h)
+        cv2.rectangle(webcam,
+                     (x_offset-2, y_offset-2),
+                     (x_offset+disp_width+2, y_offset+disp_height+2),
+                     theme.header, 2)
+
+        title_font_scale = max(SCREEN_HEIGHT / 1080 * 0.8, 0.5)  # Minimum scale of 0.5
+        cv2.putText(webcam, "Gaze Keyboard",
+                   (int(SCREEN_WIDTH * 0.02), int(WEBCAM_HEIGHT * 0.08)),
+                   cv2.FONT_HERSHEY_DUPLEX, title_font_scale, theme.header, 1)
+
+        exit_font_scale = max(SCREEN_HEIGHT / 1080 * 0.6, 0.4)  # Minimum scale of 0.4
+        exit_text = "Press 'Q' to exit"
+        exit_text_size = cv2.getTextSize(exit_text, cv2.FONT_HERSHEY_DUPLEX, exit_font_scale, 1)[0]
+        cv2.putText(webcam, exit_text,
+                   (SCREEN_WIDTH - exit_text_size[0] - int(SCREEN_WIDTH * 0.02), int(WEBCAM_HEIGHT * 0.08)),
+                   cv2.FONT_HERSHEY_DUPLEX, exit_font_scale, theme.header, 1)
+
+        for layer in (keyboard_grid, keys[0], keys[1], text_area, webcam):
+            layer.flags.writeable = False
+        return RenderLayers(keyboard_grid, keys[0], keys[1], text_area, webcam,
+                            (x_offset, y_offset, disp_width, disp_height))
+
+    def draw_suggestions(self, keyboard, view):
+        SCREEN_WIDTH, SCREEN_HEIGHT, KEYBOARD_HEIGHT = self.screen_width, self.screen_height, self.keyboard_height
+
         # Draw suggestion section with better styling
         cv2.rectangle(keyboard, (0, 0), (SCREEN_WIDTH, KEYBOARD_HEIGHT // 4), (240, 235, 250), -1)
         for i in range(3):
@@ -363,188 +511,370 @@ while True:
             suggestion_width = SCREEN_WIDTH // 3
             x = i * suggestion_width
             # Draw rounded rectangle for suggestions
-            create_rounded_rectangle(keyboard, 
-                                    (x + int(suggestion_width*0.05), int(KEYBOARD_HEIGHT*0.05)), 
-                                    (x + int(suggestion_width*0.95), int(KEYBOARD_HEIGHT*0.20)), 
-                                    KEY_ACTIVE if i == letter_index % 3 else KEY_INACTIVE, -1)
-            create_rounded_rectangle(keyboard, 
-                                    (x + int(suggestion_width*0.05), int(KEYBOARD_HEIGHT*0.05)), 
-                                    (x + int(suggestion_width*0.95), int(KEYBOARD_HEIGHT*0.20)), 
-                                    KEY_BORDER, 2)
-            
+            create_rounded_rectangle(keyboard,
+                                    (x + int(suggestion_width*0.05), int(KEYBOARD_HEIGHT*0.05)),
+                                    (x + int(suggestion_width*0.95), int(KEYBOARD_HEIGHT*0.20)),
+                                    self.theme.key_active if i == view.letter_index % 3 else self.theme.key_inactive, -1)
+            create_rounded_rectangle(keyboard,
+                                    (x + int(suggestion_width*0.05), int(KEYBOARD_HEIGHT*0.05)),
+                                    (x + int(suggestion_width*0.95), int(KEYBOARD_HEIGHT*0.20)),
+                                    self.theme.key_border, 2)
+
             # Add text with shadow effect - scale font to screen size
             font = cv2.FONT_HERSHEY_DUPLEX
             font_scale = max(SCREEN_HEIGHT / 1080 * 0.9, 0.6)  # Scale based on screen height
-            text_size = cv2.getTextSize(suggestions[i], font, font_scale, 1)[0]
+            text_size = cv2.getTextSize(view.suggestions[i], font, font_scale, 1)[0]
             text_x = x + (suggestion_width - text_size[0]) // 2
             text_y = int(KEYBOARD_HEIGHT * 0.15)
-            cv2.putText(keyboard, suggestions[i], (text_x, text_y), font, font_scale, TEXT_COLOR, 1)
-        
+            cv2.putText(keyboard, view.suggestions[i], (text_x, text_y), font, font_scale, self.theme.text, 1)
+
         # Instruction header with nicer styling
         cv2.rectangle(keyboard, (0, KEYBOARD_HEIGHT // 4), (SCREEN_WIDTH, int(KEYBOARD_HEIGHT * 0.35)), (180, 155, 220), -1)
         font_scale = max(SCREEN_HEIGHT / 1080 * 0.8, 0.5)
-        instruction_text = "Blink to select word suggestion" if suggest_active else "Blink to autocomplete current word"
-        cv2.putText(keyboard, instruction_text, 
-                   (SCREEN_WIDTH // 3, int(KEYBOARD_HEIGHT * 0.32)), 
-                   cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), 1)
-    else:
-        # Reset last spoken suggestion when not in suggestion mode
-        last_spoken_suggestion = ""
-        
-        for i in range(len(keys_set)):
-            draw_key(i, keys_set[i], i == letter_index)
-        
-        # Instruction header with nicer styling - scale with screen
-        header_height = int(KEYBOARD_HEIGHT * 0.1)
-        cv2.rectangle(keyboard, (0, 0), (SCREEN_WIDTH, header_height), (180, 155, 220), -1)
-        font_scale = max(SCREEN_HEIGHT / 1080 * 0.8, 0.5)  # Minimum scale of 0.5
-        instruction = "Look left/right to move, blink to select"
-        text_size = cv2.getTextSize(instruction, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)[0]
-        text_x = (SCREEN_WIDTH - text_size[0]) // 2  # Center text
-        cv2.putText(keyboard, instruction, 
-                   (text_x, int(header_height * 0.7)), 
+        instruction_text = "Blink to select word suggestion" if view.suggest_active else "Blink to autocomplete current word"
+        cv2.putText(keyboard, instruction_text,
+                   (SCREEN_WIDTH // 3, int(KEYBOARD_HEIGHT * 0.32)),
                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), 1)
 
-    # Create an improved text area with better styling - recreate for proper scaling
-    text_area = np.zeros((TEXT_AREA_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
-    text_area[:] = TEXT_AREA_BG
-    
-    # Calculate padding based on screen size
-    padding_x = int(SCREEN_WIDTH * 0.02)
-    padding_y = int(TEXT_AREA_HEIGHT * 0.15)
-    
-    # Draw text input field with rounded corners
-    create_rounded_rectangle(text_area, 
-                            (padding_x, padding_y), 
-                            (SCREEN_WIDTH - padding_x, int(TEXT_AREA_HEIGHT * 0.6)), 
-                            (255, 255, 255), -1)
-    create_rounded_rectangle(text_area, 
-                            (padding_x, padding_y), 
-                            (SCREEN_WIDTH - padding_x, int(TEXT_AREA_HEIGHT * 0.6)), 
-                            KEY_BORDER, 2)
-    
-    # Display text with better font - scale with screen
-    font_scale = max(SCREEN_HEIGHT / 1080 * 1.2, 0.7)  # Minimum scale of 0.7
-    
-    # If in force suggest mode, highlight the word being completed
-    if force_suggest_mode and text:
-        # Split text to highlight the last word
-        words = text.split(' ')
-        highlighted_text = ' '.join(words[:-1])
-        last_word = words[-1] if words else ""
-        
-        # Calculate positions
-        full_text = text.strip()
-        regular_text = highlighted_text + (" " if highlighted_text else "")
-        
-        # Calculate text widths
-        regular_text_size = cv2.getTextSize(regular_text, cv2.FONT_HERSHEY_DUPLEX, font_scale, 1)[0]
-        
-        # Draw regular text first
-        cv2.putText(text_area, regular_text, 
-                   (padding_x + 10, int(TEXT_AREA_HEIGHT * 0.4)), 
-                   cv2.FONT_HERSHEY_DUPLEX, font_scale, TEXT_COLOR, 1)
-        
-        # Draw highlighted word with different color
-        highlight_x = padding_x + 10 + regular_text_size[0]
-        cv2.putText(text_area, last_word, 
-                   (highlight_x, int(TEXT_AREA_HEIGHT * 0.4)), 
-                   cv2.FONT_HERSHEY_DUPLEX, font_scale, HEADER_COLOR, 2)  # Thicker and different color
-    else:
-        # Normal text display
-        cv2.putText(text_area, text.strip(), 
-                   (padding_x + 10, int(TEXT_AREA_HEIGHT * 0.4)), 
-                   cv2.FONT_HERSHEY_DUPLEX, font_scale, TEXT_COLOR, 1)
-    
-    # Add status section - scale with screen
-    status_y1 = int(TEXT_AREA_HEIGHT * 0.7)
-    status_y2 = int(TEXT_AREA_HEIGHT * 0.9)
-    cv2.rectangle(text_area, 
-                 (padding_x, status_y1), 
-                 (SCREEN_WIDTH - padding_x, status_y2), 
-                 status_color, -1)
-    
-    status_font_scale = max(SCREEN_HEIGHT / 1080 * 0.8, 0.5)  # Minimum scale of 0.5
-    status_prefix = "Direct Autocomplete Active: " if force_suggest_mode else "Status: "
-    cv2.putText(text_area, f"{status_prefix}{status_text}", 
-               (padding_x + 10, int((status_y1 + status_y2) / 2) + 5), 
-               cv2.FONT_HERSHEY_SIMPLEX, status_font_scale, (255, 255, 255), 1)
-    
-    if ear_value > 0:
-        ear_text = f"EAR: {ear_value:.3f}"
-        ear_text_size = cv2.getTextSize(ear_text, cv2.FONT_HERSHEY_SIMPLEX, status_font_scale, 1)[0]
-        cv2.putText(text_area, ear_text, 
-                   (SCREEN_WIDTH - padding_x - ear_text_size[0] - 10, int((status_y1 + status_y2) / 2) + 5), 
+    def draw_text(self, text_area, view):
+        SCREEN_WIDTH, SCREEN_HEIGHT, TEXT_AREA_HEIGHT = self.screen_width, self.screen_height, self.text_area_height
+        text = view.text
+        padding_x = int(SCREEN_WIDTH * 0.02)
+
+        # Display text with better font - scale with screen
+        font_scale = max(SCREEN_HEIGHT / 1080 * 1.2, 0.7)  # Minimum scale of 0.7
+
+        # If in force suggest mode, highlight the word being completed
+        if view.force_suggest_mode and text:
+            # Split text to highlight the last word
+            words = text.split(' ')
+            highlighted_text = ' '.join(words[:-1])
+            last_word = words[-1] if words else ""
+
+            # Calculate positions
+            regular_text = highlighted_text + (" " if highlighted_text else "")
+
+            # Calculate text widths
+            regular_text_size = cv2.getTextSize(regular_text, cv2.FONT_HERSHEY_DUPLEX, font_scale, 1)[0]
+
+            # Draw regular text first
+            cv2.putText(text_area, regular_text,
+                       (padding_x + 10, int(TEXT_AREA_HEIGHT * 0.4)),
+                       cv2.FONT_HERSHEY_DUPLEX, font_scale, self.theme.text, 1)
+
+            # Draw highlighted word with different color
+            highlight_x = padding_x + 10 + regular_text_size[0]
+            cv2.putText(text_area, last_word,
+                       (highlight_x, int(TEXT_AREA_HEIGHT * 0.4)),
+                       cv2.FONT_HERSHEY_DUPLEX, font_scale, self.theme.header, 2)  # Thicker and different color
+        else:
+            # Normal text display
+            cv2.putText(text_area, text.strip(),
+                       (padding_x + 10, int(TEXT_AREA_HEIGHT * 0.4)),
+                       cv2.FONT_HERSHEY_DUPLEX, font_scale, self.theme.text, 1)
+
+    def draw_status(self, text_area, view, ear_text):
+        SCREEN_WIDTH, SCREEN_HEIGHT, TEXT_AREA_HEIGHT = self.screen_width, self.screen_height, self.text_area_height
+        padding_x = int(SCREEN_WIDTH * 0.02)
+
+        # Add status section - scale with screen
+        status_y1 = int(TEXT_AREA_HEIGHT * 0.7)
+        status_y2 = int(TEXT_AREA_HEIGHT * 0.9)
+        cv2.rectangle(text_area,
+                     (padding_x, status_y1),
+                     (SCREEN_WIDTH - padding_x, status_y2),
+                     view.status_color, -1)
+
+        status_font_scale = max(SCREEN_HEIGHT / 1080 * 0.8, 0.5)  # Minimum scale of 0.5
+        status_prefix = "Direct Autocomplete Active: " if view.force_suggest_mode else "Status: "
+        cv2.putText(text_area, f"{status_prefix}{view.status_text}",
+                   (padding_x + 10, int((status_y1 + status_y2) / 2) + 5),
                    cv2.FONT_HERSHEY_SIMPLEX, status_font_scale, (255, 255, 255), 1)
 
-    # Show webcam frame with better layout - recreate for proper scaling
-    frame_bg = np.zeros((WEBCAM_HEIGHT, SCREEN_WIDTH, 3), np.uint8)
-    frame_bg[:] = BG_COLOR
-    
-    # Calculate webcam size while maintaining aspect ratio
-    webcam_max_height = int(WEBCAM_HEIGHT * 0.9)
-    webcam_max_width = int(SCREEN_WIDTH * 0.6)
-    
-    # Calculate dimensions while maintaining aspect ratio
-    frame_aspect = frame_w / frame_h
-    if webcam_max_width / webcam_max_height > frame_aspect:
-        # Height is the limiting factor
-        disp_height = webcam_max_height
-        disp_width = int(disp_height * frame_aspect)
-    else:
-        # Width is the limiting factor
-        disp_width = webcam_max_width
-        disp_height = int(disp_width / frame_aspect)
-    
-    # Resize frame
-    frame_resized = cv2.resize(frame, (disp_width, disp_height))
-    
-    # Center the frame
-    x_offset = (SCREEN_WIDTH - disp_width) // 2
-    y_offset = (WEBCAM_HEIGHT - disp_height) // 2
-    
-    # Place the frame in the background
-    frame_bg[y_offset:y_offset+disp_height, x_offset:x_offset+disp_width] = frame_resized
-    
-    # Add border around webcam
-    cv2.rectangle(frame_bg, 
-                 (x_offset-2, y_offset-2), 
-                 (x_offset+disp_width+2, y_offset+disp_height+2), 
-                 HEADER_COLOR, 2)
-    
-    # Add decorative elements - scale with screen
-    title_font_scale = max(SCREEN_HEIGHT / 1080 * 0.8, 0.5)  # Minimum scale of 0.5
-    cv2.putText(frame_bg, "Gaze Keyboard", 
-               (int(SCREEN_WIDTH * 0.02), int(WEBCAM_HEIGHT * 0.08)), 
-               cv2.FONT_HERSHEY_DUPLEX, title_font_scale, HEADER_COLOR, 1)
-    
-    exit_font_scale = max(SCREEN_HEIGHT / 1080 * 0.6, 0.4)  # Minimum scale of 0.4
-    exit_text = "Press 'Q' to exit"
-    exit_text_size = cv2.getTextSize(exit_text, cv2.FONT_HERSHEY_DUPLEX, exit_font_scale, 1)[0]
-    cv2.putText(frame_bg, exit_text, 
-               (SCREEN_WIDTH - exit_text_size[0] - int(SCREEN_WIDTH * 0.02), int(WEBCAM_HEIGHT * 0.08)), 
-               cv2.FONT_HERSHEY_DUPLEX, exit_font_scale, HEADER_COLOR, 1)
-
-    # Display currently spoken suggestion if in any suggestion mode
-    if (suggest_active or force_suggest_mode) and last_spoken_suggestion:
-        speak_text = f"Suggestion: {last_spoken_suggestion}"
-        speak_text_size = cv2.getTextSize(speak_text, cv2.FONT_HERSHEY_DUPLEX, exit_font_scale, 1)[0]
+        if ear_text:
+            ear_text_size = cv2.getTextSize(ear_text, cv2.FONT_HERSHEY_SIMPLEX, status_font_scale, 1)[0]
+            cv2.putText(text_area, ear_text,
+                       (SCREEN_WIDTH - padding_x - ear_text_size[0] - 10, int((status_y1 + status_y2) / 2) + 5),
+                       cv2.FONT_HERSHEY_SIMPLEX, status_font_scale, (255, 255, 255), 1)
+
+    def caption_layout(self, caption):
+        """Font scale, baseline origin and the (x0, y0, x1, y1) pixels covered by the suggestion caption"""
+        exit_font_scale = max(self.screen_height / 1080 * 0.6, 0.4)  # Minimum scale of 0.4
+        (width, height), baseline = cv2.getTextSize(caption, cv2.FONT_HERSHEY_DUPLEX, exit_font_scale, 1)
+        x, y = int(self.screen_width * 0.02), int(self.webcam_height * 0.92)
+        box = (max(x - 1, 0), max(y - height - 1, 0), x + width + 2, y + max(baseline, 5) + 2)
+        return exit_font_scale, (x, y), box
+
+    def draw_caption(self, frame_bg, caption):
+        """Display currently spoken suggestion"""
+        font_scale, (x, y), _ = self.caption_layout(caption)
+        caption_size = cv2.getTextSize(caption, cv2.FONT_HERSHEY_DUPLEX, font_scale, 1)[0]
         # Create a background for the text
         cv2.rectangle(frame_bg,
-                     (int(SCREEN_WIDTH * 0.02), int(WEBCAM_HEIGHT * 0.92) - speak_text_size[1]),
-                     (int(SCREEN_WIDTH * 0.02) + speak_text_size[0], int(WEBCAM_HEIGHT * 0.92) + 5),
+                     (x, y - caption_size[1]),
+                     (x + caption_size[0], y + 5),
                      (240, 235, 250), -1)
-        cv2.putText(frame_bg, speak_text,
-                   (int(SCREEN_WIDTH * 0.02), int(WEBCAM_HEIGHT * 0.92)),
-                   cv2.FONT_HERSHEY_DUPLEX, exit_font_scale, HEADER_COLOR, 1)
-
-    # Combine all elements
-    combined = np.vstack((frame_bg, keyboard, text_area))
-    
-    # Display the UI
-    cv2.imshow("Gaze Keyboard", combined)
+        cv2.putText(frame_bg, caption, (x, y), cv2.FONT_HERSHEY_DUPLEX, font_scale, self.theme.header, 1)
+
+    def update_keyboard(self, view):
+        layers = self.layers
+        if view.suggest_active or view.force_suggest_mode:
+            state = ('suggestions', view.suggestions, view.letter_index % 3, view.suggest_active)
+            if state != self.keyboard_state:
+                self.keyboard[:] = layers.keyboard_grid
+                self.draw_suggestions(self.keyboard, view)
+        else:
+            state = ('keys', view.letter_index)
+            if self.keyboard_state is None or self.keyboard_state[0] != 'keys':
+                self.keyboard[:] = layers.keys_inactive
+                self.blit_key(layers.keys_active, view.letter_index)
+            elif self.keyboard_state != state:
+                # Only the keys whose highlight changed
+                self.blit_key(layers.keys_inactive, self.keyboard_state[1])
+                self.blit_key(layers.keys_active, view.letter_index)
+        self.keyboard_state = state
+
+    def blit_key(self, sprites, index):
+        if 0 <= index < len(keys_set):
+            cell = self.key_cell(index)
+            self.keyboard[cell] = sprites[cell]
+
+    def update_text_area(self, view):
+        text_state = (view.text, view.force_suggest_mode)
+        if text_state != self.text_state:
+            self.text_area[:self.status_row] = self.layers.text_area[:self.status_row]
+            self.draw_text(self.text_area[:self.status_row], view)
+            self.text_state = text_state
+
+        ear_text = f"EAR: {view.ear_value:.3f}" if view.ear_value > 0 else ""
+        status_state = (view.status_text, view.status_color, view.force_suggest_mode, ear_text)
+        if status_state != self.status_state:
+            self.text_area[self.status_row:] = self.layers.text_area[self.status_row:]
+            # Drawn on the whole area so the coordinates stay those of the text area
+            self.draw_status(self.text_area, view, ear_text)
+            self.status_state = status_state
+
+    def update_webcam(self, view):
+        x, y, width, height = self.layers.webcam_box
+        caption = ""
+        if (view.suggest_active or view.force_suggest_mode) and view.last_spoken_suggestion:
+            caption = f"Suggestion: {view.last_spoken_suggestion}"
+        changed = caption != self.caption
+        if changed:
+            if self.caption_box is not None:
+                x0, y0, x1, y1 = self.caption_box
+                self.frame_bg[y0:y1, x0:x1] = self.layers.webcam[y0:y1, x0:x1]
+            self.caption = caption
+            self.caption_box = self.caption_layout(caption)[2] if caption else None
+
+        # Resize the frame straight into its place in the background
+        cv2.resize(view.frame, (width, height), dst=self.frame_bg[y:y+height, x:x+width])
+
+        if caption:
+            x0, y0, x1, y1 = self.caption_box
+            # The caption is drawn over the webcam image where they overlap
+            if changed or (x0 < x + width and x < x1 and y0 < y + height and y < y1):
+                self.draw_caption(self.frame_bg, caption)
+
+    def render(self, view):
+        """The full screen image of a view.
+
+        Returns:
+            The canvas, which the next call draws over
+        """
+        frame_h, frame_w = view.frame.shape[:2]
+        layers = render_layers(self.screen_width, self.screen_height, frame_w, frame_h, self.theme)
+        if layers is not self.layers:
+            # New screen or frame size: start over from the layers
+            self.layers = layers
+            self.keyboard[:] = layers.keys_inactive
+            self.text_area[:] = layers.text_area
+            self.frame_bg[:] = layers.webcam
+            self.keyboard_state = self.text_state = self.status_state = None
+            self.caption, self.caption_box = "", None
+
+        self.update_webcam(view)
+        self.update_keyboard(view)
+        self.update_text_area(view)
+        return self.canvas
+
+
+def run(source, face_tracker, predictor, screen_size, headless=False, max_frames=None, layout=MESH_LAYOUT):
+    """
+    Runs the keyboard on the frames of source until 'q' is pressed, the source
+    ends or max_frames frames were displayed.
+
+    The work is split into stages that run concurrently, each on the newest
+    output of the one before: the capture thread, face mesh inference and
+    eye features, the input state machine, and the compositor, which draws
+    and displays the screen in the calling thread. Queues between the stages
+    hold one item and drop the older one when a stage falls behind, so the
+    display never lags behind the camera by more than the frames in flight.
+
+    Arguments:
+        source: Frame source (see gaze_tracking.capture)
+        face_tracker: Object whose process(rgb) returns the (N, 3) normalized landmarks or None
+        predictor (WordPredictor): Word suggestions
+        screen_size (tuple): Width and height of the screen
+        headless (bool): Draw the screen without displaying it, e.g. for benchmarks
+        max_frames (int): Number of frames to display before stopping
+        layout (LandmarkLayout): Eye points in the landmarks of face_tracker
+
+    Returns:
+        A dict of statistics: frames displayed, loop rate, capture-to-display
+        latency, TimingHistogram of each stage and frames dropped at each step
+    """
+    renderer = KeyboardRenderer(*screen_size)
+    keyboard_input = KeyboardInput(predictor, click_sound=click_sound)
+    capture = FrameCapture(source)
+    frames = BufferPool(source.shape, FRAMES_IN_FLIGHT)
+    recycle = lambda item: frames.release(item.frame)
+    observations = DropQueue(1, on_drop=recycle)
+    views = DropQueue(1, on_drop=recycle)
+    rgb = np.empty(source.shape, np.uint8)  # Only used by the inference stage
+
+    def analyze(captured):
+        frame = frames.acquire()
+        cv2.flip(captured.frame, 1, dst=frame)
+        capture.ring.release()
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        landmarks = face_tracker.process(rgb)
+        if landmarks is None:
+            return Observation(frame, captured.timestamp, None, None)
+        frame_h, frame_w = frame.shape[:2]
+        points = pixel_landmarks(landmarks, frame_w, frame_h)
+        ear, iris_ratio = eye_features(points, layout)
+        return Observation(frame, captured.timestamp, ear, iris_ratio)
+
+    def update(observation):
+        status_text, status_color = keyboard_input.update(observation.ear, observation.iris_ratio,
+                                                          observation.timestamp)
+        return keyboard_input.view(observation.frame, observation.timestamp, status_text, status_color,
+                                   observation.ear or 0)
+
+    stages = [Stage("inference", analyze, capture.ring.latest, observations),
+              Stage("input", update, observations.get, views)]
+    compositor = TimingHistogram()
+    latencies = TimingHistogram()
+    shown = 0
+
+    capture.start()
+    for stage in stages:
+        stage.start()
+    start = time.monotonic()
+    while True:
+        view = views.get()
+        if view is None:
+            break
+        render_start = time.perf_counter()
+        combined = renderer.render(view)
+        compositor.add(time.perf_counter() - render_start)
+        frames.release(view.frame)
+
+        pressed_quit = False
+        if not headless:
+            # Display the UI
+            cv2.imshow("Gaze Keyboard", combined)
+            pressed_quit = cv2.waitKey(1) & 0xFF == ord('q')
+        latencies.add(time.monotonic() - view.timestamp)
+        shown += 1
+        if pressed_quit or shown == max_frames:
+            break
+    elapsed = time.monotonic() - start
+
+    # Stopping the capture closes the ring, which ends the stages one after the other
+    capture.stop()
+    for stage in stages:
+        stage.join(timeout=1.0)
+    return {
+        'frames': shown,
+        'fps': shown / elapsed if elapsed else 0.0,
+        'latency': latencies,
+        'stages': {'capture': capture.timings, 'inference': stages[0].timings,
+                   'input': stages[1].timings, 'compositor': compositor},
+        'dropped': {'capture': capture.ring.skipped, 'inference': observations.dropped, 'input': views.dropped},
+    }
+
+
+def main():
+    global engine, click_sound
+
+    # Frames come from the camera, or from a video file or generated frames to
+    # try the keyboard without one: python ppp.py --source session.mp4
+    parser = argparse.ArgumentParser(description="Gaze controlled virtual keyboard")
+    parser.add_argument("--source", default="0", help="camera index, video file or 'synthetic' (default: camera 0)")
+    parser.add_argument("--headless", action="store_true", help="draw without a window, speech or sound")
+    parser.add_argument("--frames", type=int, help="stop after displaying this many frames")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="mediapipe",
+                        help="face landmark backend (default: mediapipe)")
+    args = parser.parse_args()
+
+    # Initialize TTS and sound
+    if not args.headless:
+        if PYTTSX3_AVAILABLE:
+            engine = pyttsx3.init()
+        if PYGAME_AVAILABLE:
+            pygame.init()
+            try:
+                click_sound = pygame.mixer.Sound("click.wav")
+            except:
+                click_sound = None
+
+    # Face landmarks, found in a crop around the face of the previous frame
+    backend = BACKENDS[args.backend]
+    try:
+        face_tracker = RoiTracker(backend())
+    except (ImportError, RuntimeError) as error:
+        print(f"Error: cannot start the {args.backend} backend: {error}.")
+        return
 
-    if cv2.waitKey(1) & 0xFF == ord('q'): break
+    # Open the frame source first to help with resolution detection
+    try:
+        source = open_source(args.source)
+    except IOError as error:
+        print(f"Error: {error}.")
+        return
 
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+    # Get camera resolution to help determine screen size
+    cam_height, cam_width = source.shape[:2]
+    print(f"Camera resolution: {cam_width}x{cam_height}")
+    # Use camera resolution as minimum screen size
+    screen_width = default_width = max(DEFAULT_SCREEN_WIDTH, cam_width)
+    screen_height = default_height = max(DEFAULT_SCREEN_HEIGHT, cam_height)
+
+    if not args.headless:
+        # Create main window
+        cv2.namedWindow("Gaze Keyboard", cv2.WINDOW_NORMAL)
+        cv2.setWindowProperty("Gaze Keyboard", cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+
+        # Try to get screen dimensions from pygame as a more reliable source
+        if PYGAME_AVAILABLE:
+            pygame.display.init()
+            info = pygame.display.Info()
+            screen_width = info.current_w
+            screen_height = info.current_h
+
+        # Fallback if pygame doesn't work
+        if screen_width <= 0 or screen_height <= 0:
+            print("Using default dimensions")
+            screen_width = default_width
+            screen_height = default_height
+
+    print(f"Screen dimensions: {screen_width}x{screen_height}")
+
+    stats = run(source, face_tracker, WordPredictor(), (screen_width, screen_height),
+                headless=args.headless, max_frames=args.frames, layout=backend.layout)
+
+    latency = stats['latency']
+    print(f"Frames displayed: {stats['frames']} at {stats['fps']:.1f} fps, capture-to-display latency "
+          f"p50 {latency.percentile(50) * 1e3:.1f} ms, p99 {latency.percentile(99) * 1e3:.1f} ms")
+    for name, timings in stats['stages'].items():
+        print(f"  {name:10s} {timings.summary()}, dropped {stats['dropped'].get(name, 0)}")
+    print(f"Full frame face searches: {face_tracker.detections} of {face_tracker.frames} frames")
+    source.release()
+    if not args.headless:
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()